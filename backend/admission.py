@@ -0,0 +1,293 @@
+import asyncio
+import math
+import threading
+import time
+
+from common import metrics
+
+ADMISSION_REJECTED = metrics.Counter(
+    "gateway_admission_rejected_total", "Requests die de gateway geweigerd heeft voordat ze een model bereikten",
+    ("model", "reason"),
+)
+
+
+class AdmissionDenied(Exception):
+    """Het request wordt niet toegelaten; `status` en `retry_after` gaan naar de client."""
+
+    def __init__(self, message, status=429, retry_after=None, **details):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.details = details
+
+    def to_dict(self):
+        data = dict(self.details, error=str(self))
+        if self.retry_after is not None:
+            data["retryAfter"] = self.retry_after
+        return data
+
+
+class TokenBucket:
+    """`rate` tokens per seconde, hoogstens `burst` op voorraad."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, now):
+        """Seconden tot er een token is (0 als er nu een is); neemt er geen."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """Neem een token; geeft 0 of het aantal seconden tot er weer een is."""
+        wait = self.wait(now)
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+
+class Admission:
+    """Toelating van generatie-requests in de gateway.
+
+    Drie controles, allemaal voordat een job de wachtrij in gaat:
+
+    - rate limit per client: een token bucket van `rate_per_minute`
+      requests per minuut (security.rate_limit) met `burst` op voorraad.
+      Alleen requests die echt een model nodig hebben kosten een token;
+      een hit in de generatie-cache niet;
+    - een plafond op het aantal jobs per model service dat nog op zijn
+      beurt wacht (`max_queued_per_model`). De Retry-After is de tijd die
+      de jobs die er al staan nodig hebben: wachtend plus lopend, gedeeld
+      door het aantal dat tegelijk mag lopen, maal de gemiddelde duur van
+      een job bij die service;
+    - een kostenbudget: een gevraagde duur boven `max_duration` seconden
+      audio, of een geschatte rekentijd (duur maal de gemeten rekentijd
+      per seconde audio van het model) boven `max_job_seconds`, wordt
+      meteen geweigerd.
+
+    Los daarvan begrenst `max_running_per_model` hoeveel jobs tegelijk
+    naar een service gaan: `start()` (in de worker, vlak voor de model
+    call) wacht op een vrije plek; in async mode wacht `start_async()` op
+    de event loop, zodat wachtende jobs geen threads bezet houden die de
+    lopende jobs nodig hebben om klaar te komen. Beide standaardwaarden zijn minstens
+    de batchgrootte van MusicGen, zodat de micro-batcher vol kan raken.
+
+    `admit()` reserveert een plek in de wachtrij; `release()` (als
+    done-callback van de job) geeft de plek vrij en werkt de gemiddelden
+    bij. Modellen in dezelfde `groups` (de MusicGen-persona's) delen één
+    service en dus één plafond. `model_limits` overschrijft per service
+    {"queued": ..., "running": ...}.
+    """
+
+    def __init__(self, rate_per_minute=10, burst=None, max_queued_per_model=64, max_running_per_model=8,
+                 model_limits=None, max_duration=300, max_job_seconds=0, default_job_seconds=30, groups=None,
+                 bucket_idle=600):
+        self._rate = rate_per_minute / 60.0 if rate_per_minute else 0.0
+        self._burst = max(1, burst or rate_per_minute or 1)
+        self._max_queued = max_queued_per_model
+        self._max_running = max_running_per_model
+        self._model_limits = dict(model_limits or {})
+        self._max_duration = max_duration
+        self._max_job_seconds = max_job_seconds
+        self._default_job_seconds = default_job_seconds
+        self._groups = dict(groups or {})
+        self._bucket_idle = bucket_idle
+        self._lock = threading.Condition()
+        self._buckets = {}
+        self._last_prune = time.monotonic()
+        self._queued = {}
+        self._running = {}
+        # Jobs met een plek uit start(), met het moment waarop ze die kregen
+        self._started = {}
+        # (loop, future) van coroutines in start_async(); release() maakt ze wakker
+        self._async_waiters = []
+        # Voortschrijdende gemiddelden: seconden per job (per service) en rekentijd per seconde audio (per model)
+        self._job_seconds = {}
+        self._compute_ratio = {}
+
+    def _service(self, model):
+        return self._groups.get(model, model)
+
+    def queue_limit(self, service):
+        return self._model_limits.get(service, {}).get("queued", self._max_queued)
+
+    def running_limit(self, service):
+        return self._model_limits.get(service, {}).get("running", self._max_running)
+
+    def check_rate(self, client, consume=True):
+        """Gooi AdmissionDenied als `client` geen token meer heeft.
+
+        Met `consume=False` wordt alleen gekeken, bv. voordat een upload
+        ontvangen wordt; het token gaat pas op als het request het model
+        echt nodig heeft.
+        """
+        if not self._rate:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._prune_buckets(now)
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self._rate, self._burst)
+            wait = bucket.take(now) if consume else bucket.wait(now)
+        if wait:
+            ADMISSION_REJECTED.inc(model="", reason="rate_limit")
+            raise AdmissionDenied(
+                f"Te veel requests (maximaal {self._rate * 60:g} per minuut)", retry_after=math.ceil(wait),
+            )
+
+    def _prune_buckets(self, now):
+        # Aanroepen met self._lock vast; volle buckets van stille clients zijn overbodig
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        idle = [c for c, b in self._buckets.items() if now - b.updated > self._bucket_idle]
+        for client in idle:
+            del self._buckets[client]
+
+    def admit(self, model, duration=None):
+        """Reserveer een plek in de wachtrij van `model` of gooi AdmissionDenied."""
+        service = self._service(model)
+        with self._lock:
+            self._check_cost(model, duration)
+            queued = self._queued.get(service, 0)
+            limit = self.queue_limit(service)
+            if limit and queued >= limit:
+                # Alles wat er al staat en loopt moet eerst door de service
+                ahead = queued + self._running.get(service, 0)
+                per_job = self._job_seconds.get(service, self._default_job_seconds)
+                retry_after = max(1, math.ceil(ahead / max(1, self.running_limit(service)) * per_job))
+                ADMISSION_REJECTED.inc(model=model, reason="busy")
+                raise AdmissionDenied(
+                    f"{model} heeft al {queued} wachtende jobs, probeer het over {retry_after}s opnieuw",
+                    retry_after=retry_after, queued=queued, maxQueued=limit,
+                )
+            self._queued[service] = queued + 1
+
+    def cancel(self, model):
+        """Geef een plek uit `admit()` terug als de job toch niet gestart is."""
+        service = self._service(model)
+        with self._lock:
+            self._queued[service] = max(0, self._queued.get(service, 0) - 1)
+
+    def try_start(self, job):
+        """Als `start()`, maar blokkeert nooit; False als de service vol zit."""
+        service = self._service(job.model)
+        with self._lock:
+            limit = self.running_limit(service)
+            if limit and self._running.get(service, 0) >= limit:
+                return False
+            self._queued[service] = max(0, self._queued.get(service, 0) - 1)
+            self._running[service] = self._running.get(service, 0) + 1
+            self._started[job.id] = time.monotonic()
+            return True
+
+    def start(self, job):
+        """Wacht tot de service van `job` een job meer mag uitvoeren en neem die plek."""
+        with self._lock:
+            self._lock.wait_for(lambda: self.try_start(job))
+
+    async def start_async(self, job):
+        """`start()` voor de async gateway: wacht op de event loop in plaats van in een thread."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.try_start(job):
+                    return
+                freed = loop.create_future()
+                self._async_waiters.append((loop, freed))
+            await freed
+
+    def _wake_async(self):
+        # Aanroepen met self._lock vast; elke wachtende coroutine probeert opnieuw
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, freed in waiters:
+            loop.call_soon_threadsafe(_resolve, freed)
+
+    def _check_cost(self, model, duration):
+        # Aanroepen met self._lock vast
+        if duration is None:
+            return
+        if self._max_duration and duration > self._max_duration:
+            ADMISSION_REJECTED.inc(model=model, reason="duration")
+            raise AdmissionDenied(
+                f"Duur {duration:g}s is langer dan het maximum van {self._max_duration:g}s",
+                status=400, maxDuration=self._max_duration,
+            )
+        ratio = self._compute_ratio.get(model)
+        if self._max_job_seconds and ratio is not None and duration * ratio > self._max_job_seconds:
+            ADMISSION_REJECTED.inc(model=model, reason="cost")
+            raise AdmissionDenied(
+                f"{model} heeft naar schatting {duration * ratio:.0f}s nodig voor {duration:g}s audio "
+                f"(maximaal {self._max_job_seconds:g}s)",
+                status=400, estimatedSeconds=round(duration * ratio, 1), maxJobSeconds=self._max_job_seconds,
+            )
+
+    def release(self, job):
+        """Done-callback: geef de plek van `job` vrij en leer van zijn duur."""
+        service = self._service(job.model)
+        with self._lock:
+            started = self._started.pop(job.id, None)
+            if started is not None:
+                self._running[service] = max(0, self._running.get(service, 0) - 1)
+                self._lock.notify_all()
+                self._wake_async()
+            else:
+                self._queued[service] = max(0, self._queued.get(service, 0) - 1)
+            if started is None or job.error:
+                return
+            # Vanaf start(): de wachttijd op een plek telt niet mee als rekentijd
+            seconds = time.monotonic() - started
+            self._job_seconds[service] = _ema(self._job_seconds.get(service), seconds)
+            audio = (job.result or {}).get("duration")
+            if audio and not (job.result or {}).get("cached"):
+                self._compute_ratio[job.model] = _ema(self._compute_ratio.get(job.model), seconds / float(audio))
+
+    def stats(self):
+        with self._lock:
+            services = set(self._queued) | set(self._running) | set(self._job_seconds)
+            return {
+                "services": {
+                    service: {
+                        "queued": self._queued.get(service, 0),
+                        "running": self._running.get(service, 0),
+                        "maxQueued": self.queue_limit(service),
+                        "maxRunning": self.running_limit(service),
+                        "avgJobSeconds": self._job_seconds.get(service),
+                    }
+                    for service in services
+                },
+                "models": {
+                    model: {"secondsPerAudioSecond": ratio}
+                    for model, ratio in self._compute_ratio.items()
+                },
+            }
+
+
+def _resolve(future):
+    # Een geannuleerde wachter heeft zijn future al afgerond
+    if not future.done():
+        future.set_result(None)
+
+
+def _ema(current, value, weight=0.2):
+    return value if current is None else (1 - weight) * current + weight * value
+
+
+def requested_duration(payload):
+    """De gevraagde duur in seconden uit een request, of None."""
+    for field in ("duration", "extendDuration"):
+        try:
+            value = float(payload.get(field))
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            return value
+    return None
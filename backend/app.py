@@ -1,13 +1,37 @@
-from flask import Flask, request, jsonify, send_from_directory, abort
+from flask import Flask, Request, Response, request, jsonify, send_file, abort
+import asyncio
 import os
-import requests
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import Admission, AdmissionDenied, requested_duration
+from common import metrics
+from config import get_setting
+from gen_cache import GenerationCache
+from jobs import JOB_DONE, JobQueue, QueueFullError
+from library import TrackLibrary
+from memory_governor import MemoryGovernor, MemoryPressure
+from model_client import ModelClient
+from outputs import OutputIndex
+from residency import ModelResidency
+from state import SharedState
+from uploads import UploadStore
 
 # Configureer logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+class GatewayRequest(Request):
+    # Uploads gaan tijdens het parsen blok voor blok naar de upload store
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        writer = upload_store.writer()
+        self.__dict__.setdefault("upload_writers", []).append(writer)
+        return writer
+
+
 app = Flask(__name__)
+app.request_class = GatewayRequest
 
 MODEL_PORTS = {
     "musicgen": 5000,
@@ -22,118 +46,556 @@ MODEL_PORTS = {
     "dance_diffusion": 5000,
 }
 
-current_model = None
+UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "/app/uploads")
+# Remix-bronnen; de model services hebben dezelfde map op hetzelfde pad gemount
+REMIX_UPLOAD_FOLDER = os.path.join(UPLOAD_FOLDER, "remix")
+OUTPUT_FOLDER = os.environ.get("OUTPUT_FOLDER", "/opt/ai-music-studio/output")
+
+# "sync": Flask met worker-threads; "async": aiohttp met coroutines (zie async_gateway.py)
+GATEWAY_MODE = os.environ.get("GATEWAY_MODE") or get_setting("gateway.mode", "sync")
+ASYNC_MODE = GATEWAY_MODE == "async"
+# Maximale wachttijd voor GET /api/jobs/<id>?wait=<seconden>
+MAX_JOB_WAIT = get_setting("gateway.jobs.max_wait", 60)
+
+# Deze modellen zijn persona's van de gedeelde MusicGen engine in de musicgen
+# service (models/musicgen/personas.py) en delen daar de gewichten
+MUSICGEN_PERSONAS = ("musicgen", "musicgpt", "musiclm", "mousai", "stable_audio")
+
+# Standaard draait elke model service als eigen container op het Docker-netwerk;
+# gateway.model_urls kan dat per model overschrijven (bv. voor benchmarks)
+MODEL_URLS = {model: f"http://{model}:{port}" for model, port in MODEL_PORTS.items()}
+MODEL_URLS.update({
+    persona: f"http://musicgen:{MODEL_PORTS['musicgen']}/personas/{persona}"
+    for persona in MUSICGEN_PERSONAS
+})
+MODEL_URLS.update(get_setting("gateway.model_urls", {}))
+
+model_client = ModelClient(
+    MODEL_URLS,
+    pool_size=get_setting("gateway.http.pool_size", 8),
+    connect_timeout=get_setting("gateway.http.connect_timeout", 5),
+    read_timeout=get_setting("gateway.http.read_timeout", 180),
+    retries=get_setting("gateway.http.retries", 3),
+    backoff=get_setting("gateway.http.backoff", 0.5),
+    backoff_max=get_setting("gateway.http.backoff_max", 8),
+)
+
+# Het model dat gebruikt wordt als een request zelf geen model opgeeft. Het staat
+# op schijf, zodat het een herstart overleeft. De gateway draait als één proces
+# (residency, admission en de job queue zijn per proces), in beide modes.
+gateway_state = SharedState(
+    get_setting("gateway.state_path", "/tmp/ai-music-studio/gateway-state.json"),
+    defaults={"currentModel": get_setting("models.default_model") or None},
+)
+
+# Houdt het geheugen van de model services onder gpu.unload_threshold (zie memory_governor.py)
+memory_governor = MemoryGovernor(
+    model_client,
+    threshold=get_setting("gpu.unload_threshold", 85),
+    auto_unload=get_setting("gpu.auto_unload", True),
+    footprints=get_setting("gpu.model_footprints", {}),
+    groups={persona: "musicgen" for persona in MUSICGEN_PERSONAS},
+    state=gateway_state,
+    interval=get_setting("gpu.monitor_interval", 15) if get_setting("gpu.enable_monitoring", True) else 0,
+)
+
+residency = ModelResidency(
+    model_client,
+    MODEL_PORTS.keys(),
+    max_loaded=get_setting("models.max_loaded_models", 2),
+    idle_timeout=get_setting("models.unload_timeout", 300),
+    load_timeout=get_setting("models.loading_timeout", 120),
+    ready_interval=get_setting("gateway.readiness_interval", 15),
+    groups={persona: "musicgen" for persona in MUSICGEN_PERSONAS},
+    governor=memory_governor,
+)
+
+# Rate limit per client, plafond per model service en kostenbudget (zie admission.py)
+admission = Admission(
+    rate_per_minute=get_setting("security.rate_limit", 10),
+    burst=get_setting("admission.burst", None),
+    max_queued_per_model=get_setting("admission.max_queued_per_model", 64),
+    max_running_per_model=get_setting("admission.max_running_per_model", 8),
+    model_limits=get_setting("admission.model_limits", {}),
+    max_duration=get_setting("admission.max_duration", 300),
+    max_job_seconds=get_setting("admission.max_job_seconds", 0),
+    default_job_seconds=get_setting("admission.default_job_seconds", 30),
+    groups={persona: "musicgen" for persona in MUSICGEN_PERSONAS},
+)
+# Achter nginx is X-Real-IP het adres van de client
+TRUST_PROXY = get_setting("admission.trust_proxy", True)
+
+upload_store = UploadStore(
+    REMIX_UPLOAD_FOLDER,
+    max_bytes=get_setting("system.max_upload_size", 50) * 1024 * 1024,
+    retention=get_setting("gateway.jobs.retention", 3600),
+)
+# Werkzeug weigert grotere requests al op basis van Content-Length (413)
+app.config["MAX_CONTENT_LENGTH"] = upload_store.max_bytes + 1024 * 1024
+
+gen_cache = None
+if get_setting("cache.enabled", True):
+    gen_cache = GenerationCache(
+        get_setting("cache.path", os.path.join(OUTPUT_FOLDER, ".cache")),
+        max_bytes=get_setting("cache.max_size", 2048) * 1024 * 1024,
+        encode_timeout=get_setting("cache.encode_timeout", 300),
+    )
+
+# Bestanden in de output directory, bijgewerkt als een job een output oplevert
+output_index = OutputIndex(OUTPUT_FOLDER, max_entries=get_setting("gateway.output.index_size", 10000))
+OUTPUT_MAX_AGE = get_setting("gateway.output.cache_max_age", 3600)
+# Prefix van een interne nginx-location; nginx serveert dan de bytes (leeg = Flask zelf)
+OUTPUT_ACCEL_PREFIX = get_setting("gateway.output.accel_redirect", "")
+
+# Job- en trackhistorie in MongoDB (de mongodb service uit docker-compose); leeg = uit
+MONGO_URI = os.environ.get("MONGO_URI") or get_setting("history.mongo_uri", "")
+history = None
+if MONGO_URI:
+    # pymongo is alleen nodig als er een MongoDB geconfigureerd is
+    from history import MongoHistory
+    from pymongo.errors import PyMongoError
+
+    history = MongoHistory(
+        MONGO_URI,
+        batch_size=get_setting("history.batch_size", 100),
+        flush_interval=get_setting("history.flush_interval", 1.0),
+        max_pending=get_setting("history.max_pending", 10000),
+    )
+
+# Tracks in de output directory met hun metadata; ruimt op boven system.history_size
+library = None
+if get_setting("library.enabled", True):
+    library = TrackLibrary(
+        get_setting("library.path", os.path.join(OUTPUT_FOLDER, ".library", "library.db")),
+        OUTPUT_FOLDER,
+        history_size=get_setting("system.history_size", 50),
+        max_bytes=get_setting("library.max_size", 0) * 1024 * 1024,
+        interval=get_setting("library.retention_interval", 300),
+        orphan_grace=get_setting("library.orphan_grace", 3600),
+        delete_orphans=get_setting("library.delete_orphans", True),
+        on_remove=history.mark_removed if history is not None else None,
+    )
+
+
+def _record_output(kind, model, payload, result, job_id=None):
+    output_index.add(result.get("outputPath"))
+    if library is not None:
+        try:
+            library.record(kind, model, payload, result, job_id)
+        except Exception:
+            logger.error("Track niet vastgelegd in de library:", exc_info=True)
+
+def _session():
+    """Sessie of gebruiker van het request, voor de historie (X-Session-Id of sessionId)."""
+    if request.headers.get("X-Session-Id"):
+        return request.headers["X-Session-Id"]
+    if request.is_json:
+        return (request.get_json(silent=True) or {}).get("sessionId")
+    return request.form.get("sessionId")
+
+
+def _record_job(job, payload, session):
+    # Alleen naar de rij van de history writer; schrijven gebeurt op de achtergrond
+    if history is None:
+        return
+    if not job.wait(0):
+        history.record_job(job, session)
+
+    def done(job):
+        history.record_job(job, session)
+        if job.status == JOB_DONE and job.result:
+            history.record_track(job.kind, job.model, payload, job.result, job.id, session)
+
+    job.add_done_callback(done)
+
+
+def current_model():
+    return gateway_state.get("currentModel")
+
+
+if current_model() in MODEL_PORTS:
+    residency.preload(current_model())
+
+MODELS_LOADED = metrics.Gauge("gateway_models_loaded", "Modellen die nu geladen zijn")
+MODELS_LOADED.set_function(lambda: len(residency.loaded_models()))
+CACHE_EVENTS = metrics.Gauge("gateway_cache_events", "Hits, misses en evictions van de generatie-cache", ("event",))
+if gen_cache is not None:
+    for event in ("hits", "misses", "evictions"):
+        CACHE_EVENTS.set_function(lambda event=event: gen_cache.stats()[event], event=event)
 
 @app.route('/api/models', methods=['GET'])
 def get_models():
     return jsonify(list(MODEL_PORTS.keys()))
 
+@app.route('/api/models/status', methods=['GET'])
+def get_models_status():
+    return jsonify({"current": current_model(), "models": residency.status(), "memory": memory_governor.status()})
+
 @app.route('/api/models/load', methods=['POST'])
 def load_model():
-    global current_model
     model = request.json.get('id')
     if model not in MODEL_PORTS:
         return jsonify({"error": "Model niet gevonden"}), 400
     try:
-        r = requests.post(f'http://{model}:{MODEL_PORTS[model]}/load', timeout=60)
-        r.raise_for_status()
-        current_model = model
+        residency.ensure_loaded(model)
+        gateway_state.set("currentModel", model)
         return jsonify({"status": "geladen", "model": model})
+    except MemoryPressure:
+        raise
     except Exception as e:
         logger.error(f"Laden van model {model} gefaald:", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/models/unload', methods=['POST'])
 def unload_model():
-    global current_model
     model = request.json.get('id')
     if model not in MODEL_PORTS:
         return jsonify({"error": "Model niet gevonden"}), 400
     try:
-        r = requests.post(f'http://{model}:{MODEL_PORTS[model]}/unload', timeout=30)
-        r.raise_for_status()
-        current_model = None
+        residency.unload(model)
+        gateway_state.clear_if("currentModel", model)
         return jsonify({"status": "unloaded", "model": model})
     except Exception as e:
         logger.error(f"Unload van model {model} gefaald:", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+def _dispatch_generate(job):
+    admission.start(job)
+    with residency.use(job.model):
+        r = model_client.post(job.model, '/generate', json=job.payload)
+    r.raise_for_status()
+    return _generate_result(job, r.json())
+
+def _generate_result(job, response_data):
+    # Log de response van de model service
+    logger.debug(f"Response from model service: {response_data}")
+
+    # Voeg outputPath toe als deze niet aanwezig is in de response
+    if "outputPath" not in response_data and "outputPath" in job.payload:
+        logger.warning("Adding missing outputPath to response")
+        response_data["outputPath"] = job.payload["outputPath"]
+
+    if gen_cache is not None and not job.payload.get("noCache"):
+        key = gen_cache.key("generate", job.model, job.payload)
+        gen_cache.store(key, OUTPUT_FOLDER, response_data["outputPath"], response_data)
+
+    _record_output("generate", job.model, job.payload, response_data, job.id)
+    return response_data
+
+def _dispatch_remix(job):
+    # De service leest de bron zelf uit de gedeelde uploads-map
+    admission.start(job)
+    with residency.use(job.model):
+        r = model_client.post(job.model, '/generate/remix', json=job.payload["request"])
+    r.raise_for_status()
+    return _remix_result(job, r.json())
+
+def _remix_result(job, response_data):
+    logger.debug(f"Response from remix service: {response_data}")
+    cache_key = job.payload.get("cacheKey")
+    if gen_cache is not None and cache_key and response_data.get("outputPath"):
+        gen_cache.store(cache_key, OUTPUT_FOLDER, response_data["outputPath"], response_data)
+    _record_output("remix", job.model, job.payload["request"], response_data, job.id)
+    return response_data
+
+async def _start_async(job):
+    # Wacht op de event loop: een thread die op een plek wacht zou de threads
+    # bezetten die lopende jobs nodig hebben om hun plek vrij te geven
+    await admission.start_async(job)
+
+async def _hold_async(model):
+    # Laden kan minuten duren en blokkeert; dat gebeurt in een eigen pool, los
+    # van de default executor waarin lopende jobs hun resultaat afronden
+    if not residency.try_hold(model):
+        await asyncio.get_running_loop().run_in_executor(hold_pool, residency.hold, model)
+
+async def _dispatch_generate_async(job):
+    await _start_async(job)
+    await _hold_async(job.model)
+    try:
+        response_data = await async_client.post(job.model, '/generate', json=job.payload)
+    finally:
+        residency.release(job.model)
+    # De cache kopieert bestanden; niet op de event loop
+    return await asyncio.get_running_loop().run_in_executor(None, _generate_result, job, response_data)
+
+async def _dispatch_remix_async(job):
+    await _start_async(job)
+    await _hold_async(job.model)
+    try:
+        response_data = await async_client.post(job.model, '/generate/remix', json=job.payload["request"])
+    finally:
+        residency.release(job.model)
+    return await asyncio.get_running_loop().run_in_executor(None, _remix_result, job, response_data)
+
+if ASYNC_MODE:
+    # aiohttp is alleen nodig in async mode
+    from async_gateway import AsyncDispatcher, AsyncModelClient
+
+    async_client = AsyncModelClient(
+        MODEL_URLS,
+        pool_size=get_setting("gateway.http.pool_size", 8),
+        connect_timeout=get_setting("gateway.http.connect_timeout", 5),
+        read_timeout=get_setting("gateway.http.read_timeout", 180),
+        retries=get_setting("gateway.http.retries", 3),
+        backoff=get_setting("gateway.http.backoff", 0.5),
+        backoff_max=get_setting("gateway.http.backoff_max", 8),
+    )
+    dispatcher = AsyncDispatcher(concurrency=get_setting("gateway.jobs.async_concurrency", 256))
+    hold_pool = ThreadPoolExecutor(
+        max_workers=get_setting("gateway.jobs.hold_threads", 16), thread_name_prefix="residency-hold",
+    )
+    jobs = JobQueue(
+        {"generate": _dispatch_generate_async, "remix": _dispatch_remix_async},
+        max_queued=get_setting("gateway.jobs.max_queued", 500),
+        retention=get_setting("gateway.jobs.retention", 3600),
+        dispatcher=dispatcher.submit,
+    )
+else:
+    jobs = JobQueue(
+        {"generate": _dispatch_generate, "remix": _dispatch_remix},
+        workers=get_setting("gateway.jobs.workers", 4),
+        max_queued=get_setting("gateway.jobs.max_queued", 500),
+        retention=get_setting("gateway.jobs.retention", 3600),
+    )
+
+def _client():
+    if TRUST_PROXY and request.headers.get("X-Real-IP"):
+        return request.headers["X-Real-IP"]
+    return request.remote_addr or "unknown"
+
+def _submit(kind, model, payload, duration, output_path):
+    admission.admit(model, duration)
+    try:
+        job = jobs.submit(kind, model, payload)
+    except BaseException:
+        admission.cancel(model)
+        raise
+    job.add_done_callback(admission.release)
+    if library is not None:
+        # Alleen namen die de gateway zelf uitgeeft mag de retentie als wees opruimen
+        library.issue(output_path)
+    return job
+
+def _job_accepted(job):
+    return jsonify({
+        "jobId": job.id,
+        "status": job.status,
+        "position": jobs.position(job),
+        "result": job.result,
+        "statusUrl": f"/api/jobs/{job.id}",
+    }), 202
+
 @app.route('/api/generate', methods=['POST'])
 def generate():
-    if current_model not in MODEL_PORTS:
-        return jsonify({"error": "Geen model geladen"}), 400
-    
     data = request.json or {}
     logger.debug(f"Generate request data: {data}")
+
+    model = data.get("model") or current_model()
+    if model not in MODEL_PORTS:
+        return jsonify({"error": "Geen model geladen"}), 400
     
     if "outputPath" not in data:
         return jsonify({"error": "outputPath required"}), 400
-    
+
+    if gen_cache is not None and not data.get("noCache"):
+        key = gen_cache.key("generate", model, data)
+        cached = gen_cache.fetch(key, OUTPUT_FOLDER, data["outputPath"])
+        if cached is not None:
+            logger.debug(f"Cache hit voor {model}: {key}")
+            _record_output("generate", model, data, cached)
+            job = jobs.add_completed("generate", model, cached)
+            _record_job(job, data, _session())
+            return _job_accepted(job)
+
+    # Pas na de cache: een cache-hit kost geen token
+    admission.check_rate(_client())
     try:
-        r = requests.post(
-            f'http://{current_model}:{MODEL_PORTS[current_model]}/generate',
-            json=data,
-            timeout=180
-        )
-        r.raise_for_status()
-        
-        # Log de response van de model service
-        response_data = r.json()
-        logger.debug(f"Response from model service: {response_data}")
-        
-        # Voeg outputPath toe als deze niet aanwezig is in de response
-        if "outputPath" not in response_data and "outputPath" in data:
-            logger.warning("Adding missing outputPath to response")
-            response_data["outputPath"] = data["outputPath"]
-        
-        return jsonify(response_data)
-    except Exception as e:
-        logger.error(f"Generatie gefaald voor {current_model}:", exc_info=True)
-        return jsonify({"error": str(e)}), 500
+        job = _submit("generate", model, data, requested_duration(data), data["outputPath"])
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    _record_job(job, data, _session())
+    return _job_accepted(job)
 
 @app.route('/api/remix', methods=['POST'])
 def remix():
-    if current_model not in MODEL_PORTS:
+    # Voor het parsen van het formulier, zodat een geweigerde upload niet eerst opgeslagen wordt;
+    # het token gaat pas op als de remix geen cache-hit is
+    admission.check_rate(_client(), consume=False)
+    model = request.form.get("model") or current_model()
+    if model not in MODEL_PORTS:
         return jsonify({"error": "Geen model geladen"}), 400
-    files = {'file': request.files.get('file')}
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({"error": "Geen bestand ontvangen"}), 400
     form = {
         "prompt": request.form.get("prompt", ""),
         "duration": request.form.get("duration", ""),
         "vocals": request.form.get("vocals", ""),
     }
+    # De upload staat al in de upload store (gehasht tijdens het ontvangen)
+    stored = upload_store.commit(upload.stream, upload.filename)
+    output_path = f"{model}-remix-{int(time.time() * 1000)}.wav"
+    # Alleen een referentie naar de bron gaat naar de model service
+    remix_request = {
+        "contentPrompt": form["prompt"],
+        "hasVocals": form["vocals"].lower() != "false",
+        "isRemix": True,
+        "sourceTrackPath": stored.path,
+        "sourcePath": stored.path,
+        "outputPath": output_path,
+    }
+    if form["duration"]:
+        remix_request["duration"] = form["duration"]
+    payload = {"request": remix_request, "sha256": stored.sha256, "filename": stored.filename}
+
+    if gen_cache is not None and not request.form.get("noCache"):
+        key = gen_cache.key("remix", model, form, extra=stored.sha256)
+        cached = gen_cache.fetch(key, OUTPUT_FOLDER, output_path)
+        if cached is not None:
+            logger.debug(f"Cache hit voor remix met {model}: {key}")
+            _record_output("remix", model, remix_request, cached)
+            job = jobs.add_completed("remix", model, cached)
+            _record_job(job, remix_request, _session())
+            return _job_accepted(job)
+        payload["cacheKey"] = key
+    admission.check_rate(_client())
     try:
-        r = requests.post(
-            f'http://{current_model}:{MODEL_PORTS[current_model]}/remix',
-            files=files,
-            data=form,
-            timeout=180
-        )
-        r.raise_for_status()
-        response_data = r.json()
-        logger.debug(f"Response from remix service: {response_data}")
-        return jsonify(response_data)
-    except Exception as e:
-        logger.error(f"Remix gefaald voor {current_model}:", exc_info=True)
-        return jsonify({"error": str(e)}), 500
+        job = _submit("remix", model, payload, requested_duration(form), output_path)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    _record_job(job, remix_request, _session())
+    return _job_accepted(job)
 
-@app.route('/api/output/<filename>')
-def api_output(filename):
-    # Dit is het absolute pad naar de output directory
-    output_dir = "/opt/ai-music-studio/output"
-    logger.debug(f"Trying to serve file {filename} from {output_dir}")
-    
-    # Lijst alle bestanden in de output directory voor debugging
+@app.teardown_request
+def _discard_uploads(exc):
+    # Uploads die niet via upload_store.commit() bewaard zijn (fout, ander veld) opruimen
+    for writer in request.__dict__.get("upload_writers", ()):
+        writer.discard()
+
+@app.errorhandler(AdmissionDenied)
+def admission_denied(e):
+    response = jsonify(e.to_dict())
+    response.status_code = e.status
+    if e.retry_after is not None:
+        response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+@app.errorhandler(MemoryPressure)
+def memory_pressure(e):
+    response = jsonify(e.to_dict())
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"error": f"Bestand te groot (maximaal {upload_store.max_bytes // (1024 * 1024)} MB)"}), 413
+
+def job_status(job):
+    data = job.to_dict()
+    data["position"] = jobs.position(job)
+    return data
+
+def parse_wait(value):
+    """Seconden voor ?wait=, begrensd op gateway.jobs.max_wait; 0 bij een ongeldige waarde."""
     try:
-        files_in_dir = os.listdir(output_dir)
-        logger.debug(f"Files in output directory: {files_in_dir}")
-    except Exception as e:
-        logger.error(f"Error listing output directory: {e}")
-    
+        return max(0.0, min(float(value or 0), MAX_JOB_WAIT))
+    except ValueError:
+        return 0.0
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job niet gevonden"}), 404
+    # Long-poll: wacht maximaal ?wait= seconden tot de job klaar is. In sync mode
+    # kost een wachtende client een thread; async mode handelt dit zelf af.
+    wait = parse_wait(request.args.get("wait"))
+    if wait:
+        job.wait(wait)
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs', methods=['GET'])
+def get_job_stats():
+    return jsonify(dict(jobs.stats(), admission=admission.stats()))
+
+@app.route('/api/cache', methods=['GET'])
+def get_cache_stats():
+    if gen_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(gen_cache.stats(), enabled=True))
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    try:
+        limit = max(1, min(int(request.args.get("limit", 20)), 200))
+        before = request.args.get("before")
+        before = float(before) if before else None
+    except ValueError:
+        return jsonify({"error": "limit en before moeten getallen zijn"}), 400
+    model = request.args.get("model")
+    if history is not None:
+        try:
+            return jsonify(history.history(limit, before, model, request.args.get("session")))
+        except PyMongoError as e:
+            logger.error(f"Historie niet leesbaar uit MongoDB: {e}")
+            return jsonify({"error": "Historie tijdelijk niet beschikbaar"}), 503
+    if library is None:
+        return jsonify({"error": "Geen historie geconfigureerd"}), 404
+    return jsonify(library.history(limit, before, model))
+
+@app.route('/api/history/stats', methods=['GET'])
+def get_history_stats():
+    if history is None:
+        return jsonify({"error": "Geen MongoDB geconfigureerd (MONGO_URI)"}), 404
     try:
-        return send_from_directory(output_dir, filename, conditional=True)
-    except FileNotFoundError:
-        logger.error(f"File {filename} not found in {output_dir}")
+        return jsonify(history.stats(request.args.get("session")))
+    except PyMongoError as e:
+        logger.error(f"Historie niet leesbaar uit MongoDB: {e}")
+        return jsonify({"error": "Historie tijdelijk niet beschikbaar"}), 503
+
+@app.route('/api/library', methods=['GET'])
+def get_library_stats():
+    if library is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(library.stats(), enabled=True))
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/output/<filename>')
+def api_output(filename):
+    entry = output_index.lookup(filename)
+    if entry is None:
+        logger.debug(f"Output {filename} niet gevonden in {OUTPUT_FOLDER}")
         abort(404)
+    if OUTPUT_ACCEL_PREFIX:
+        # nginx serveert het bestand zelf (ook Range); Python stuurt alleen headers
+        response = Response(mimetype=entry.mimetype)
+        response.headers["X-Accel-Redirect"] = OUTPUT_ACCEL_PREFIX.rstrip("/") + "/" + entry.name
+        response.set_etag(entry.etag)
+        response.last_modified = entry.mtime
+        response.cache_control.public = True
+        response.cache_control.max_age = OUTPUT_MAX_AGE
+        return response.make_conditional(request)
+    # send_file handelt If-None-Match, If-Range en Range (206) af
+    return send_file(
+        entry.path, mimetype=entry.mimetype, conditional=True, etag=entry.etag,
+        last_modified=entry.mtime, max_age=OUTPUT_MAX_AGE,
+    )
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if ASYNC_MODE:
+        from async_gateway import serve
+        serve(
+            app, jobs, dispatcher, async_client, job_status, parse_wait,
+            host='0.0.0.0', port=5000, bridge_threads=get_setting("gateway.bridge_threads", 16),
+        )
+    else:
+        app.run(host='0.0.0.0', port=5000, debug=True)
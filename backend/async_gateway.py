@@ -0,0 +1,305 @@
+"""Async mode van de gateway (gateway.mode: async, of GATEWAY_MODE=async).
+
+In sync mode houdt elke lopende generatie een worker-thread bezet voor de
+hele model-call, en een client die op zijn job wacht een request-thread.
+In async mode draait de gateway op aiohttp:
+
+- jobs naar de model services lopen als coroutines via AsyncModelClient;
+  `gateway.jobs.async_concurrency` begrenst hoeveel er tegelijk uitstaan,
+  de model services begrenzen zelf met een 429 (zie common.executor);
+- `GET /api/jobs/<id>?wait=<s>` wacht op de event loop, dus duizenden
+  wachtende clients kosten alleen coroutines;
+- alle andere routes zijn kort en worden door de Flask-app uit app.py
+  afgehandeld via een WSGI-brug met een begrensde threadpool. Zo is er
+  maar één definitie van de API, en request- en response-bodies worden
+  gestreamd in plaats van in het geheugen gebufferd.
+"""
+import asyncio
+import io
+import logging
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+import aiohttp
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, web
+
+from model_client import BUSY_STATUS, RETRY_STATUSES, UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Timeout bij het verbinden (aiohttp >= 3.10); oudere versies onderscheiden die niet van een read-timeout
+CONNECT_TIMEOUT = getattr(aiohttp, "ConnectionTimeoutError", ())
+
+
+class ModelServiceError(Exception):
+    """De model service gaf een foutstatus terug."""
+
+    def __init__(self, status, url, body):
+        super().__init__(f"{status} van {url}: {body[:200]}")
+        self.status = status
+
+
+class AsyncModelClient:
+    """Async tegenhanger van ModelClient, met dezelfde retry-regels.
+
+    Eén aiohttp-sessie met per service hoogstens `pool_size` keep-alive
+    verbindingen. Idempotente calls worden bij verbindingsfouten en
+    502/503/504 opnieuw geprobeerd, niet na een read-timeout; een 429
+    (wachtrij van de service vol) voor elke call, na de Retry-After van de
+    service.
+    """
+
+    def __init__(self, base_urls, pool_size=8, connect_timeout=5.0, read_timeout=180.0,
+                 retries=3, backoff=0.5, backoff_max=8.0, busy_wait_max=30.0):
+        self._base_urls = base_urls
+        self._pool_size = pool_size
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._backoff_max = backoff_max
+        self._busy_wait_max = busy_wait_max
+        self._session = None
+
+    def _get_session(self):
+        # Pas op de event loop aanmaken
+        if self._session is None:
+            self._session = ClientSession(connector=TCPConnector(limit=0, limit_per_host=self._pool_size))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def url(self, model, path):
+        return f"{self._base_urls[model]}{path}"
+
+    async def post(self, model, path, idempotent=False, read_timeout=None, **kwargs):
+        """POST naar de service; geeft de JSON-response terug of gooit ModelServiceError."""
+        return await self.request("POST", model, path, idempotent, read_timeout, **kwargs)
+
+    async def request(self, method, model, path, idempotent=False, read_timeout=None, **kwargs):
+        start = time.perf_counter()
+        status = "unreachable"
+        try:
+            data = await self._request(method, model, path, idempotent, read_timeout, **kwargs)
+            status = "ok"
+            return data
+        except ModelServiceError:
+            status = "error"
+            raise
+        finally:
+            UPSTREAM_REQUESTS.inc(model=model, path=path, status=status)
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, model=model, path=path)
+
+    def _sleep_before_retry(self, attempt):
+        return asyncio.sleep(random.uniform(0, min(self._backoff_max, self._backoff * (2 ** attempt))))
+
+    def _busy_delay(self, response, attempt):
+        try:
+            delay = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            delay = self._backoff * (2 ** attempt)
+        return min(self._busy_wait_max, delay) * random.uniform(1.0, 1.25)
+
+    async def _request(self, method, model, path, idempotent, read_timeout, **kwargs):
+        session = self._get_session()
+        url = self.url(model, path)
+        timeout = ClientTimeout(sock_connect=self._connect_timeout, sock_read=read_timeout or self._read_timeout)
+        attempts = self._retries + 1 if idempotent else 1
+        busy_attempts = 0
+        attempt = 0
+        while True:
+            last_attempt = attempt >= attempts - 1
+            try:
+                async with session.request(method, url, timeout=timeout, **kwargs) as r:
+                    if r.status == BUSY_STATUS and busy_attempts < self._retries:
+                        logger.warning(f"{method} {url} is bezet, opnieuw na Retry-After {r.headers.get('Retry-After')}")
+                        delay = self._busy_delay(r, busy_attempts)
+                        busy_attempts += 1
+                    elif r.status in RETRY_STATUSES and not last_attempt:
+                        logger.warning(f"{method} {url} gaf {r.status}, poging {attempt + 1}/{attempts}")
+                        delay = None
+                        attempt += 1
+                    elif r.status >= 400:
+                        raise ModelServiceError(r.status, url, await r.text())
+                    else:
+                        return await r.json(content_type=None)
+            except (ClientError, asyncio.TimeoutError) as e:
+                # De service heeft een request dat time-out gaat al; niet nog eens sturen
+                read_timeout = isinstance(e, asyncio.TimeoutError) and not isinstance(e, CONNECT_TIMEOUT)
+                if last_attempt or read_timeout:
+                    raise
+                logger.warning(f"{method} {url} gefaald ({e}), poging {attempt + 1}/{attempts}")
+                await self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+            if delay is None:
+                await self._sleep_before_retry(attempt - 1)
+            else:
+                await asyncio.sleep(delay)
+
+
+class AsyncDispatcher:
+    """Voert job-coroutines uit op de event loop van de async gateway.
+
+    `submit()` mag vanuit elke thread aangeroepen worden (de Flask-routes
+    draaien in de threadpool van de WSGI-brug).
+    """
+
+    def __init__(self, concurrency=256):
+        self._concurrency = max(1, concurrency)
+        self._loop = None
+        self._semaphore = None
+
+    def bind(self, loop):
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+
+    def submit(self, coro):
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError("Async gateway draait nog niet")
+        asyncio.run_coroutine_threadsafe(self._run(coro), self._loop)
+
+    async def _run(self, coro):
+        # Jobs die op de semaphore wachten blijven "queued"
+        async with self._semaphore:
+            await coro
+
+
+class _BodyReader(io.RawIOBase):
+    """wsgi.input dat de request-body blok voor blok van de event loop leest."""
+
+    def __init__(self, content, loop):
+        self._content = content
+        self._loop = loop
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = asyncio.run_coroutine_threadsafe(self._content.read(len(buffer)), self._loop).result()
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _environ(request, body):
+    path = request.raw_path.split("?", 1)[0]
+    host, _, port = (request.host or "localhost").partition(":")
+    environ = {
+        "REQUEST_METHOD": request.method,
+        "SCRIPT_NAME": "",
+        "PATH_INFO": unquote(path, encoding="latin-1"),
+        "QUERY_STRING": request.query_string,
+        "SERVER_NAME": host,
+        "SERVER_PORT": port or "80",
+        "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+        "REMOTE_ADDR": request.remote or "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": request.scheme,
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name in set(request.headers.keys()):
+        key = name.upper().replace("-", "_")
+        value = ",".join(request.headers.getall(name))
+        if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[key] = value
+        else:
+            environ[f"HTTP_{key}"] = value
+    return environ
+
+
+def _wsgi_handler(wsgi_app, pool):
+    async def handle(request):
+        loop = asyncio.get_running_loop()
+        environ = _environ(request, io.BufferedReader(_BodyReader(request.content, loop)))
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = status
+            started["headers"] = headers
+
+        def call():
+            result = wsgi_app(environ, start_response)
+            chunks = iter(result)
+            # Sommige responses roepen start_response pas bij het eerste blok aan
+            first = next(chunks, None)
+            return result, chunks, first
+
+        result, chunks, chunk = await loop.run_in_executor(pool, call)
+        try:
+            code, _, reason = started["status"].partition(" ")
+            response = web.StreamResponse(status=int(code), reason=reason or None)
+            for name, value in started["headers"]:
+                response.headers.add(name, value)
+            await response.prepare(request)
+            while chunk is not None:
+                if chunk:
+                    await response.write(chunk)
+                chunk = await loop.run_in_executor(pool, next, chunks, None)
+            await response.write_eof()
+            return response
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                await loop.run_in_executor(pool, close)
+
+    return handle
+
+
+def create_app(flask_app, jobs, dispatcher, client, job_status, parse_wait, bridge_threads=16):
+    """Bouw de aiohttp-app: async routes voor jobs, de rest via de Flask-app."""
+    pool = ThreadPoolExecutor(max_workers=bridge_threads, thread_name_prefix="wsgi-bridge")
+
+    async def job_route(request):
+        job = jobs.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "Job niet gevonden"}, status=404)
+        wait = parse_wait(request.query.get("wait"))
+        if wait and not job.wait(0):
+            loop = asyncio.get_running_loop()
+            done = loop.create_future()
+
+            def resolve(_):
+                loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+
+            job.add_done_callback(resolve)
+            try:
+                await asyncio.wait_for(done, wait)
+            except asyncio.TimeoutError:
+                pass
+        return web.json_response(job_status(job))
+
+    async def healthz_route(request):
+        return web.json_response({"status": "ok", "mode": "async"})
+
+    async def on_startup(app):
+        dispatcher.bind(asyncio.get_running_loop())
+
+    async def on_cleanup(app):
+        await client.close()
+        pool.shutdown(wait=False)
+
+    app = web.Application()
+    app.router.add_get("/api/jobs/{job_id}", job_route)
+    app.router.add_get("/healthz", healthz_route)
+    app.router.add_route("*", "/{tail:.*}", _wsgi_handler(flask_app.wsgi_app, pool))
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def serve(flask_app, jobs, dispatcher, client, job_status, parse_wait, host="0.0.0.0", port=5000,
+          bridge_threads=16):
+    app = create_app(flask_app, jobs, dispatcher, client, job_status, parse_wait, bridge_threads)
+    logger.info(f"Async gateway op {host}:{port} ({bridge_threads} threads voor de Flask-routes)")
+    web.run_app(app, host=host, port=port, print=None)
@@ -0,0 +1,40 @@
+import os
+import logging
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# config.yml wordt via docker-compose in de container gemount
+CONFIG_PATH = os.environ.get("CONFIG_PATH", "/app/config.yml")
+
+_config = None
+
+
+def load_config(path=None):
+    """Lees config.yml één keer in en cache het resultaat."""
+    global _config
+    if _config is not None and path is None:
+        return _config
+    path = path or CONFIG_PATH
+    try:
+        with open(path) as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        logger.warning(f"Config bestand {path} niet gevonden, standaardwaarden worden gebruikt")
+        data = {}
+    except yaml.YAMLError as e:
+        logger.error(f"Config bestand {path} kon niet gelezen worden: {e}")
+        data = {}
+    _config = data
+    return data
+
+
+def get_setting(key, default=None):
+    """Haal een waarde op via een pad met punten, bv. 'models.max_loaded_models'."""
+    value = load_config()
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return default if value is None else value
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Velden die niets aan de gegenereerde audio veranderen: de output, cache-opties en
+# boekhouding van de client (sessie, gebruiker, request-id)
+IGNORED_FIELDS = ("outputPath", "noCache", "model", "sessionId", "userId", "clientId", "requestId")
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg")
+# Wat de model services per track schrijven (DEFAULT_FORMATS in common/audio_sink.py)
+EXPECTED_EXTENSIONS = (".wav", ".mp3")
+META_FILE = "meta.json"
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        # Witruimte maakt voor het model niet uit
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class GenerationCache:
+    """Content-addressed cache voor gegenereerde tracks.
+
+    De sleutel is een hash van het genormaliseerde request (model, prompts,
+    vocals, duur, seed, sampling-parameters, ...). Per sleutel worden de
+    audiobestanden plus metadata bewaard in `root/<xx>/<sleutel>/`. Als de
+    totale grootte boven `max_bytes` komt worden de minst recent gebruikte
+    entries verwijderd.
+
+    De MP3 van een track wordt door de service op de achtergrond ge-encodeerd
+    en staat er meestal nog niet als de job klaar is. Formaten uit
+    `expected` die bij `store()` ontbreken worden door een achtergrond-
+    thread aan de entry toegevoegd zodra de encoder ze (via een rename, dus
+    compleet) neerzet, of opgegeven na `encode_timeout` seconden.
+    """
+
+    def __init__(self, root, max_bytes, expected=EXPECTED_EXTENSIONS, encode_timeout=300, poll_interval=1.0):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._expected = tuple(expected)
+        self._encode_timeout = encode_timeout
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        # Ontbrekende formaten: (sleutel, bronbestand, extensie, deadline)
+        self._awaiting = []
+        self._awaiting_cond = threading.Condition()
+        self._watcher = None
+        # sleutel -> grootte in bytes, minst recent gebruikt vooraan
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def key(self, kind, model, payload, extra=None):
+        fields = {k: v for k, v in payload.items() if k not in IGNORED_FIELDS}
+        blob = json.dumps(
+            {"kind": kind, "model": model, "params": _normalize(fields), "extra": extra},
+            sort_keys=True,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self._root, key[:2], key)
+
+    def _scan(self):
+        # Bouw de LRU opnieuw op uit de cache directory; de mtime van
+        # meta.json is het moment van laatste gebruik
+        found = []
+        for prefix in os.listdir(self._root):
+            prefix_dir = os.path.join(self._root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, key)
+                meta_path = os.path.join(entry_dir, META_FILE)
+                if ".tmp-" in key or not os.path.exists(meta_path):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir))
+                found.append((os.path.getmtime(meta_path), key, size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        logger.info(f"Generatie-cache: {len(self._entries)} entries, {self._bytes} bytes")
+
+    def fetch(self, key, output_dir, output_path):
+        """Zet de gecachte bestanden neer onder `output_path`; None bij een miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, META_FILE)) as f:
+                meta = json.load(f)
+            os.utime(os.path.join(entry_dir, META_FILE))
+            stem = os.path.splitext(os.path.basename(output_path))[0]
+            for ext in meta["artifacts"]:
+                _place(os.path.join(entry_dir, "audio" + ext), os.path.join(output_dir, stem + ext))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Cache entry {key} onbruikbaar, wordt verwijderd: {e}")
+            self._drop(key)
+            return None
+        result = dict(meta["response"])
+        result["outputPath"] = os.path.basename(output_path)
+        result["cached"] = True
+        return result
+
+    def store(self, key, output_dir, output_path, response):
+        """Neem de bestanden van een afgeronde generatie op in de cache."""
+        stem = os.path.splitext(os.path.basename(output_path))[0]
+        sources = {
+            ext: os.path.join(output_dir, stem + ext)
+            for ext in AUDIO_EXTENSIONS
+            if os.path.exists(os.path.join(output_dir, stem + ext))
+        }
+        if not sources:
+            logger.debug(f"Geen bestanden gevonden voor {output_path}, niets te cachen")
+            return
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp-{threading.get_ident()}"
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            for ext, src in sources.items():
+                _place(src, os.path.join(tmp_dir, "audio" + ext))
+            meta = {
+                "artifacts": sorted(sources),
+                "response": {k: v for k, v in response.items() if k != "outputPath"},
+                "createdAt": time.time(),
+            }
+            with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+                json.dump(meta, f)
+            size = sum(os.path.getsize(os.path.join(tmp_dir, f)) for f in os.listdir(tmp_dir))
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(tmp_dir, entry_dir)
+        except OSError as e:
+            logger.warning(f"Opslaan in cache van {output_path} gefaald: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._bytes += size
+            victims = []
+            while self._bytes > self._max_bytes and len(self._entries) > 1:
+                victim, victim_size = self._entries.popitem(last=False)
+                self._bytes -= victim_size
+                self.evictions += 1
+                victims.append(victim)
+        for victim in victims:
+            shutil.rmtree(self._entry_dir(victim), ignore_errors=True)
+        missing = [ext for ext in self._expected if ext not in sources]
+        if missing:
+            self._await(key, [(os.path.join(output_dir, stem + ext), ext) for ext in missing])
+
+    def _await(self, key, files):
+        deadline = time.monotonic() + self._encode_timeout
+        with self._awaiting_cond:
+            self._awaiting.extend((key, src, ext, deadline) for src, ext in files)
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch_encodes, name="cache-encodes", daemon=True)
+                self._watcher.start()
+            self._awaiting_cond.notify()
+
+    def awaiting(self):
+        """Aantal formaten dat nog op de encoder wacht."""
+        with self._awaiting_cond:
+            return len(self._awaiting)
+
+    def _watch_encodes(self):
+        while True:
+            with self._awaiting_cond:
+                self._awaiting_cond.wait_for(lambda: self._awaiting)
+                items = list(self._awaiting)
+            done = set()
+            now = time.monotonic()
+            for item in items:
+                key, src, ext, deadline = item
+                if os.path.exists(src):
+                    self.add_artifact(key, src, ext)
+                    done.add(item)
+                elif now > deadline:
+                    logger.debug(f"{src} niet op tijd ge-encodeerd; cache entry {key} blijft zonder {ext}")
+                    done.add(item)
+            with self._awaiting_cond:
+                self._awaiting = [item for item in self._awaiting if item not in done]
+            time.sleep(self._poll_interval)
+
+    def add_artifact(self, key, src, ext):
+        """Voeg een later geschreven formaat (`src`) toe aan een bestaande entry."""
+        with self._lock:
+            if key not in self._entries:
+                # Intussen ge-evict
+                return False
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, META_FILE)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if ext in meta["artifacts"]:
+                return False
+            dst = os.path.join(entry_dir, "audio" + ext)
+            _place(src, dst)
+            meta["artifacts"] = sorted(set(meta["artifacts"]) | {ext})
+            tmp = f"{meta_path}.tmp-{threading.get_ident()}"
+            with open(tmp, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp, meta_path)
+            added = os.path.getsize(dst)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"{ext} niet toegevoegd aan cache entry {key}: {e}")
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._entries[key] += added
+                self._bytes += added
+        return True
+
+    def _drop(self, key):
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self._max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "awaitingEncodes": self.awaiting(),
+            }
+
+
+def _place(src, dst):
+    # Bewust kopiëren i.p.v. hard linken: de model services schrijven soms
+    # in-place naar een bestaand pad, wat anders de cache zou overschrijven
+    tmp = f"{dst}.tmp-{threading.get_ident()}"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
@@ -0,0 +1,225 @@
+import logging
+import queue
+import threading
+import time
+
+from pymongo import ASCENDING, DESCENDING, UpdateMany, UpdateOne
+from pymongo.errors import PyMongoError
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+# Velden uit een request die niet bij de generatieparameters horen (zie library.py)
+IGNORED_PARAMS = ("outputPath", "noCache", "model", "contentPrompt", "prompt", "sourcePath", "sourceTrackPath", "sessionId")
+
+# Toegangspatronen: per sessie, per model en op tijd, altijd nieuwste eerst
+INDEXES = {
+    "jobs": (
+        [("session", ASCENDING), ("createdAt", DESCENDING)],
+        [("model", ASCENDING), ("createdAt", DESCENDING)],
+        [("createdAt", DESCENDING)],
+    ),
+    "tracks": (
+        [("session", ASCENDING), ("createdAt", DESCENDING)],
+        [("model", ASCENDING), ("createdAt", DESCENDING)],
+        [("createdAt", DESCENDING)],
+    ),
+}
+
+HISTORY_WRITES = metrics.Counter(
+    "gateway_history_writes_total", "Geschreven of verloren historie-records", ("collection", "status"),
+)
+
+
+def connect(uri):
+    """MongoClient voor `uri`; mongomock://... geeft een in-process database (voor tests)."""
+    if uri.startswith("mongomock://"):
+        import mongomock
+
+        return mongomock.MongoClient("mongodb://" + uri[len("mongomock://"):])
+    from pymongo import MongoClient
+
+    return MongoClient(uri, serverSelectionTimeoutMS=5000, appname="ai-music-studio-gateway")
+
+
+class MongoHistory:
+    """Job- en trackhistorie in MongoDB (MONGO_URI).
+
+    Schrijven gebeurt nooit op het request-pad: records gaan in een
+    begrensde rij en een achtergrond-thread schrijft ze per collectie met
+    één geordende bulk_write, zodra er `batch_size` klaarstaan of na
+    `flush_interval` seconden. Een job wordt bijgewerkt op zijn `_id`,
+    dus de records van queued en done komen in één document terecht. Zit
+    de rij vol of is MongoDB langer onbereikbaar, dan vervalt het record
+    (de history is informatief; de track staat ook in de track library).
+    """
+
+    def __init__(self, uri, batch_size=100, flush_interval=1.0, max_pending=10000, retries=3):
+        self._client = connect(uri)
+        db = self._client.get_default_database("music_generation")
+        self._collections = {"jobs": db.jobs, "tracks": db.tracks}
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._retries = retries
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._idle = threading.Condition()
+        self._unflushed = 0
+        self._indexed = False
+        t = threading.Thread(target=self._writer, name="history-writer", daemon=True)
+        t.start()
+
+    def _put(self, collection, op):
+        with self._idle:
+            self._unflushed += 1
+        try:
+            self._queue.put_nowait((collection, op))
+        except queue.Full:
+            HISTORY_WRITES.inc(collection=collection, status="dropped")
+            self._done(1)
+
+    def _done(self, count):
+        with self._idle:
+            self._unflushed -= count
+            self._idle.notify_all()
+
+    def pending(self):
+        with self._idle:
+            return self._unflushed
+
+    def flush(self, timeout=None):
+        """Wacht tot alle records geschreven (of opgegeven) zijn; True als dat lukte."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unflushed == 0, timeout)
+
+    def record_job(self, job, session=None):
+        doc = {
+            "kind": job.kind,
+            "model": job.model,
+            "status": job.status,
+            "error": job.error,
+            "session": session,
+            "createdAt": job.created_at,
+            "startedAt": job.started_at,
+            "finishedAt": job.finished_at,
+            "outputPath": (job.result or {}).get("outputPath"),
+            "cached": bool((job.result or {}).get("cached")),
+        }
+        self._put("jobs", UpdateOne({"_id": job.id}, {"$set": doc}, upsert=True))
+
+    def record_track(self, kind, model, payload, result, job_id=None, session=None):
+        name = result.get("outputPath")
+        if not name:
+            return
+        doc = {
+            "name": name,
+            "kind": kind,
+            "model": model,
+            "prompt": payload.get("contentPrompt") or payload.get("prompt"),
+            "params": {k: v for k, v in payload.items() if k not in IGNORED_PARAMS},
+            "duration": result.get("duration"),
+            "jobId": job_id,
+            "session": session,
+            "createdAt": time.time(),
+            "removedAt": None,
+        }
+        self._put("tracks", UpdateOne({"_id": name}, {"$set": doc}, upsert=True))
+
+    def mark_removed(self, names):
+        """Tracks die de retentie van de track library verwijderd heeft."""
+        if names:
+            self._put("tracks", UpdateMany({"_id": {"$in": list(names)}}, {"$set": {"removedAt": time.time()}}))
+
+    def history(self, limit=20, before=None, model=None, session=None):
+        """Nieuwste tracks eerst; `before` is de `next` van de vorige pagina."""
+        query = {"removedAt": None}
+        if model:
+            query["model"] = model
+        if session:
+            query["session"] = session
+        if before is not None:
+            query["createdAt"] = {"$lt": before}
+        docs = list(self._collections["tracks"].find(query).sort("createdAt", DESCENDING).limit(limit + 1))
+        tracks = [
+            {
+                "id": doc["_id"],
+                "name": doc["name"],
+                "kind": doc.get("kind"),
+                "model": doc.get("model"),
+                "prompt": doc.get("prompt"),
+                "params": doc.get("params") or {},
+                "duration": doc.get("duration"),
+                "jobId": doc.get("jobId"),
+                "session": doc.get("session"),
+                "createdAt": doc["createdAt"],
+            }
+            for doc in docs[:limit]
+        ]
+        return {"tracks": tracks, "next": tracks[-1]["createdAt"] if len(docs) > limit else None}
+
+    def stats(self, session=None):
+        match = {"session": session} if session else {}
+        models = {}
+        for row in self._collections["tracks"].aggregate([
+            {"$match": dict(match, removedAt=None)},
+            {"$group": {"_id": "$model", "tracks": {"$sum": 1}, "audioSeconds": {"$sum": "$duration"}}},
+        ]):
+            models.setdefault(row["_id"], {"jobs": {}}).update(tracks=row["tracks"], audioSeconds=row["audioSeconds"])
+        for row in self._collections["jobs"].aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"model": "$model", "status": "$status"},
+                "count": {"$sum": 1},
+                "seconds": {"$avg": {"$subtract": ["$finishedAt", "$startedAt"]}},
+            }},
+        ]):
+            entry = models.setdefault(row["_id"]["model"], {"tracks": 0, "audioSeconds": 0.0, "jobs": {}})
+            entry["jobs"][row["_id"]["status"]] = {"count": row["count"], "avgSeconds": row["seconds"]}
+        return {"models": models, "pendingWrites": self.pending()}
+
+    def _ensure_indexes(self):
+        for name, indexes in INDEXES.items():
+            for keys in indexes:
+                self._collections[name].create_index(keys)
+        self._indexed = True
+
+    def _next_batch(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self._flush_interval
+        while len(items) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _writer(self):
+        while True:
+            items = self._next_batch()
+            by_collection = {}
+            for collection, op in items:
+                by_collection.setdefault(collection, []).append(op)
+            for collection, ops in by_collection.items():
+                try:
+                    self._write(collection, ops)
+                except Exception:
+                    logger.error(f"Historie-batch voor {collection} verloren:", exc_info=True)
+                    HISTORY_WRITES.inc(len(ops), collection=collection, status="dropped")
+            self._done(len(items))
+
+    def _write(self, collection, ops):
+        for attempt in range(self._retries + 1):
+            try:
+                if not self._indexed:
+                    self._ensure_indexes()
+                # Geordend: de updates van één job moeten in volgorde landen
+                self._collections[collection].bulk_write(ops, ordered=True)
+                HISTORY_WRITES.inc(len(ops), collection=collection, status="ok")
+                return
+            except PyMongoError as e:
+                logger.warning(f"Historie naar MongoDB schrijven gefaald ({e}), poging {attempt + 1}/{self._retries + 1}")
+                time.sleep(min(8.0, 0.5 * (2 ** attempt)))
+        HISTORY_WRITES.inc(len(ops), collection=collection, status="dropped")
@@ -0,0 +1,238 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+JOBS_TOTAL = metrics.Counter(
+    "gateway_jobs_total", "Afgeronde jobs per soort, model en status",
+    ("kind", "model", "status"),
+)
+JOB_SECONDS = metrics.Histogram(
+    "gateway_job_seconds", "Uitvoeringsduur van jobs",
+    ("kind", "model"),
+)
+JOB_WAIT_SECONDS = metrics.Histogram(
+    "gateway_job_wait_seconds", "Tijd die jobs in de wachtrij staan",
+    ("kind", "model"),
+)
+JOBS_QUEUED = metrics.Gauge("gateway_jobs_queued", "Jobs die op een worker wachten")
+
+
+class QueueFullError(Exception):
+    """De job-wachtrij zit vol; de client moet het later opnieuw proberen."""
+
+
+_callback_lock = threading.Lock()
+
+
+class Job:
+    _seq = itertools.count()
+
+    def __init__(self, kind, model, payload):
+        self.id = uuid.uuid4().hex
+        self.seq = next(Job._seq)
+        self.kind = kind
+        self.model = model
+        self.payload = payload
+        self.status = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+        self._callbacks = []
+
+    def wait(self, timeout=None):
+        """Wacht tot de job klaar (of gefaald) is; True als dat zo is."""
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, fn):
+        """Roep `fn(job)` aan zodra de job klaar is (meteen als dat al zo is)."""
+        with _callback_lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _mark_done(self):
+        with _callback_lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                logger.error(f"Callback van job {self.id} gefaald:", exc_info=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "model": self.model,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+
+
+class JobQueue:
+    """Begrensde wachtrij met een vaste pool worker-threads.
+
+    `handlers` koppelt een job-soort (bv. "generate") aan een functie die de
+    job uitvoert en het resultaat teruggeeft. Afgeronde jobs blijven
+    `retention` seconden opvraagbaar.
+
+    Met `dispatcher` (async mode, zie async_gateway.py) zijn er geen
+    worker-threads: de coroutine `run_async(job)` van elke job wordt aan
+    `dispatcher()` gegeven, die hem op de event loop uitvoert. De handlers
+    zijn dan async functies en `max_queued` begrenst het aantal jobs dat
+    nog niet klaar is.
+    """
+
+    def __init__(self, handlers, workers=4, max_queued=500, retention=3600, dispatcher=None):
+        self._handlers = handlers
+        self._dispatcher = dispatcher
+        self._max_queued = max_queued
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._retention = retention
+        self._threads = []
+        for i in range(0 if dispatcher else workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        JOBS_QUEUED.set_function(self.queued)
+
+    def submit(self, kind, model, payload):
+        if kind not in self._handlers:
+            raise ValueError(f"Onbekende job-soort: {kind}")
+        job = Job(kind, model, payload)
+        with self._lock:
+            self._prune()
+            if self._dispatcher is not None and self._unfinished() >= self._max_queued:
+                JOBS_TOTAL.inc(kind=kind, model=model, status="rejected")
+                raise QueueFullError("Job-wachtrij zit vol")
+            self._jobs[job.id] = job
+        if self._dispatcher is not None:
+            self._dispatcher(self.run_async(job))
+            logger.debug(f"Job {job.id} ({kind}) voor {model} gestart")
+            return job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            JOBS_TOTAL.inc(kind=kind, model=model, status="rejected")
+            raise QueueFullError("Job-wachtrij zit vol")
+        logger.debug(f"Job {job.id} ({kind}) voor {model} in de wachtrij gezet")
+        return job
+
+    def add_completed(self, kind, model, result):
+        """Registreer een job die zonder model-call al klaar is (bv. een cache hit)."""
+        job = Job(kind, model, None)
+        job.started_at = job.finished_at = job.created_at
+        job.result = result
+        job.status = JOB_DONE
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job._mark_done()
+        JOBS_TOTAL.inc(kind=kind, model=model, status="cached")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """Aantal wachtende jobs dat vóór deze job aan de beurt is."""
+        if job.status != JOB_QUEUED:
+            return 0
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.status == JOB_QUEUED and j.seq < job.seq)
+
+    def queued(self):
+        if self._dispatcher is None:
+            return self._queue.qsize()
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.status == JOB_QUEUED)
+
+    def _unfinished(self):
+        # Aanroepen met self._lock vast
+        return sum(1 for j in self._jobs.values() if j.finished_at is None)
+
+    def stats(self):
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts["workers"] = len(self._threads)
+        counts["mode"] = "async" if self._dispatcher is not None else "threads"
+        return counts
+
+    def _prune(self):
+        # Aanroepen met self._lock vast
+        cutoff = time.time() - self._retention
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _start(self, job):
+        job.started_at = time.time()
+        job.status = JOB_RUNNING
+        JOB_WAIT_SECONDS.observe(job.started_at - job.created_at, kind=job.kind, model=job.model)
+
+    def _fail(self, job, e):
+        logger.error(f"Job {job.id} ({job.kind}) voor {job.model} gefaald:", exc_info=True)
+        job.error = str(e)
+        job.status = JOB_FAILED
+
+    def _finish(self, job):
+        job.finished_at = time.time()
+        JOBS_TOTAL.inc(kind=job.kind, model=job.model, status=job.status)
+        JOB_SECONDS.observe(job.finished_at - job.started_at, kind=job.kind, model=job.model)
+        job._mark_done()
+
+    async def run_async(self, job):
+        """Voer een job uit met een async handler (async mode)."""
+        self._start(job)
+        try:
+            job.result = await self._handlers[job.kind](job)
+            job.status = JOB_DONE
+        except Exception as e:
+            self._fail(job, e)
+        finally:
+            self._finish(job)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            self._start(job)
+            try:
+                job.result = self._handlers[job.kind](job)
+                job.status = JOB_DONE
+            except Exception as e:
+                self._fail(job, e)
+            finally:
+                self._finish(job)
+                self._queue.task_done()
@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    stem TEXT NOT NULL,
+    kind TEXT,
+    model TEXT,
+    prompt TEXT,
+    params TEXT,
+    duration REAL,
+    job_id TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_model ON tracks (model, id);
+CREATE INDEX IF NOT EXISTS tracks_stem ON tracks (stem);
+CREATE TABLE IF NOT EXISTS artifacts (
+    name TEXT PRIMARY KEY,
+    track_id INTEGER NOT NULL REFERENCES tracks (id) ON DELETE CASCADE,
+    bytes INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_track ON artifacts (track_id);
+CREATE TABLE IF NOT EXISTS issued (
+    stem TEXT PRIMARY KEY,
+    issued_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Velden uit een request die niet bij de generatieparameters horen
+IGNORED_PARAMS = ("outputPath", "noCache", "model", "contentPrompt", "prompt", "sourcePath", "sourceTrackPath", "sessionId")
+
+
+def _is_output(name):
+    # Verborgen mappen (.cache, .library) en half geschreven bestanden horen er niet bij
+    return not name.startswith(".") and not name.endswith(".part")
+
+
+class TrackLibrary:
+    """Index van alle tracks in de output directory (SQLite in WAL-mode).
+
+    De gateway legt elke output vast zodra een job hem oplevert: model,
+    prompt, parameters, duur en tijdstip, plus de bestanden (WAV, MP3, ...)
+    met hun grootte. `history()` beantwoordt gepagineerde queries zonder
+    het filesystem aan te raken.
+
+    Een achtergrond-thread houdt elke `interval` seconden de output
+    directory binnen budget: alleen de nieuwste `history_size` tracks en
+    hoogstens `max_bytes` blijven staan. Dezelfde ronde koppelt
+    bijbehorende bestanden die later klaar kwamen (de MP3 van een WAV) aan
+    hun track, en verwijdert bestanden zonder track die ouder zijn dan
+    `orphan_grace` seconden. Verwijderen gebeurt per ronde in één
+    transactie; `on_remove(names)` krijgt de tracks die vervallen zijn.
+
+    Als wees geldt alleen een bestand waarvan de gateway de naam zelf
+    heeft uitgegeven (`issue()` bij het insturen van een job), bv. de
+    output van een gefaalde job. Wat de services op eigen gezag schrijven
+    (extends gaan niet via de gateway) blijft staan. De eerste ronde op
+    een nieuwe database neemt alle bestaande bestanden op als tracks van
+    model "unknown", zodat een upgrade de outputs van voor de library niet
+    als wezen weggooit; daarna vallen ze gewoon onder de budgetten.
+    """
+
+    def __init__(self, db_path, output_dir, history_size=50, max_bytes=0, interval=300,
+                 orphan_grace=3600, delete_orphans=True, on_remove=None):
+        self._output_dir = output_dir
+        self._history_size = history_size
+        self._max_bytes = max_bytes
+        self._orphan_grace = orphan_grace
+        self._delete_orphans = delete_orphans
+        self._on_remove = on_remove
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+        if interval and interval > 0:
+            t = threading.Thread(target=self._retention, args=(interval,), name="library-retention", daemon=True)
+            t.start()
+
+    def issue(self, output_path):
+        """Onthoud dat de gateway `output_path` aan een model service heeft gegeven."""
+        name = os.path.basename(output_path or "")
+        if not name:
+            return
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO issued (stem, issued_at) VALUES (?, ?)",
+                (os.path.splitext(name)[0], time.time()),
+            )
+
+    def record(self, kind, model, payload, result, job_id=None):
+        """Leg de output uit `result` (response van een model service) vast."""
+        name = os.path.basename(result.get("outputPath") or "")
+        if not name:
+            return None
+        params = {k: v for k, v in payload.items() if k not in IGNORED_PARAMS}
+        prompt = payload.get("contentPrompt") or payload.get("prompt")
+        try:
+            st = os.stat(os.path.join(self._output_dir, name))
+            size, mtime = st.st_size, st.st_mtime
+        except OSError:
+            size, mtime = 0, time.time()
+        with self._lock, self._db:
+            # Dezelfde naam opnieuw (cache-hit, verlengd in place): de track krijgt de nieuwe gegevens
+            self._db.execute(
+                "INSERT INTO tracks (name, stem, kind, model, prompt, params, duration, job_id, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET kind = excluded.kind, model = excluded.model,"
+                " prompt = excluded.prompt, params = excluded.params, duration = excluded.duration,"
+                " job_id = excluded.job_id, created_at = excluded.created_at",
+                (name, os.path.splitext(name)[0], kind, model, prompt, json.dumps(params, default=str),
+                 result.get("duration"), job_id, time.time()),
+            )
+            track_id, = self._db.execute("SELECT id FROM tracks WHERE name = ?", (name,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts (name, track_id, bytes, mtime) VALUES (?, ?, ?, ?)",
+                (name, track_id, size, mtime),
+            )
+        return track_id
+
+    def history(self, limit=20, before=None, model=None):
+        """Nieuwste tracks eerst; `before` is de `next` van de vorige pagina."""
+        where, args = [], []
+        if before is not None:
+            where.append("t.id < ?")
+            args.append(before)
+        if model:
+            where.append("t.model = ?")
+            args.append(model)
+        sql = (
+            "SELECT t.*, COALESCE(SUM(a.bytes), 0) AS bytes, GROUP_CONCAT(a.name) AS files"
+            " FROM tracks t LEFT JOIN artifacts a ON a.track_id = t.id"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " GROUP BY t.id ORDER BY t.id DESC LIMIT ?"
+        )
+        with self._lock:
+            rows = self._db.execute(sql, (*args, limit + 1)).fetchall()
+        tracks = [self._track(row) for row in rows[:limit]]
+        return {"tracks": tracks, "next": tracks[-1]["id"] if len(rows) > limit else None}
+
+    @staticmethod
+    def _track(row):
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "kind": row["kind"],
+            "model": row["model"],
+            "prompt": row["prompt"],
+            "params": json.loads(row["params"] or "{}"),
+            "duration": row["duration"],
+            "bytes": row["bytes"],
+            "files": sorted((row["files"] or "").split(",")) if row["files"] else [],
+            "createdAt": row["created_at"],
+        }
+
+    def stats(self):
+        with self._lock:
+            tracks, = self._db.execute("SELECT COUNT(*) FROM tracks").fetchone()
+            files, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM artifacts").fetchone()
+        return {"tracks": tracks, "files": files, "bytes": size,
+                "historySize": self._history_size, "maxBytes": self._max_bytes}
+
+    def sweep(self):
+        """Eén retentie-ronde; geeft het aantal verwijderde bestanden terug."""
+        with self._lock:
+            imported = self._db.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone()
+        if imported is None:
+            self._import_existing()
+        removed = self._sync_files()
+        return removed + self._enforce_budgets()
+
+    def _import_existing(self):
+        # Eerste ronde: bestanden zonder track worden tracks, per stem en op volgorde van leeftijd
+        with self._lock:
+            known = {row["name"] for row in self._db.execute("SELECT name FROM artifacts")}
+        stems = {}
+        for entry in os.scandir(self._output_dir):
+            if not _is_output(entry.name) or entry.name in known:
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                stems.setdefault(os.path.splitext(entry.name)[0], []).append((entry.name, st.st_size, st.st_mtime))
+        ordered = sorted(stems.items(), key=lambda item: min(mtime for _, _, mtime in item[1]))
+        with self._lock, self._db:
+            for stem, files in ordered:
+                row = self._db.execute("SELECT id FROM tracks WHERE stem = ?", (stem,)).fetchone()
+                if row is None:
+                    # De naam van de track is zijn WAV als die er is
+                    name = min((n for n, _, _ in files), key=lambda n: (not n.endswith(".wav"), n))
+                    created = min(mtime for _, _, mtime in files)
+                    track_id = self._db.execute(
+                        "INSERT INTO tracks (name, stem, model, params, created_at) VALUES (?, ?, 'unknown', '{}', ?)",
+                        (name, stem, created),
+                    ).lastrowid
+                else:
+                    track_id = row["id"]
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO artifacts (name, track_id, bytes, mtime) VALUES (?, ?, ?, ?)",
+                    [(name, track_id, size, mtime) for name, size, mtime in files],
+                )
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', ?)", (str(time.time()),))
+        if ordered:
+            logger.info(f"{len(ordered)} bestaande track(s) in {self._output_dir} opgenomen in de library")
+
+    def _sync_files(self):
+        # De enige plek die de output directory scant, en alleen in de achtergrond
+        with self._lock:
+            known = {row["name"]: (row["bytes"], row["mtime"]) for row in self._db.execute("SELECT name, bytes, mtime FROM artifacts")}
+            stems = {row["stem"]: row["id"] for row in self._db.execute("SELECT stem, id FROM tracks")}
+            issued = {row["stem"] for row in self._db.execute("SELECT stem FROM issued")}
+        updates, orphans, present = [], [], set()
+        cutoff = time.time() - self._orphan_grace
+        for entry in os.scandir(self._output_dir):
+            if not _is_output(entry.name):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            present.add(entry.name)
+            if entry.name in known:
+                if known[entry.name] != (st.st_size, st.st_mtime):
+                    updates.append((entry.name, stems.get(os.path.splitext(entry.name)[0]), st.st_size, st.st_mtime))
+            elif os.path.splitext(entry.name)[0] in stems:
+                # Een later geschreven formaat van een bekende track
+                updates.append((entry.name, stems[os.path.splitext(entry.name)[0]], st.st_size, st.st_mtime))
+            elif os.path.splitext(entry.name)[0] in issued and st.st_mtime < cutoff:
+                orphans.append(entry.path)
+        missing = [(name,) for name in known if name not in present]
+        present_stems = {os.path.splitext(name)[0] for name in present}
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO artifacts (name, track_id, bytes, mtime) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET bytes = excluded.bytes, mtime = excluded.mtime",
+                [u for u in updates if u[1] is not None],
+            )
+            self._db.executemany("DELETE FROM artifacts WHERE name = ?", missing)
+            # Uitgegeven namen zonder bestand en zonder track zijn na de grace-periode niet meer nodig
+            self._db.executemany(
+                "DELETE FROM issued WHERE stem = ? AND issued_at < ? AND stem NOT IN (SELECT stem FROM tracks)",
+                [(stem, cutoff) for stem in issued if stem not in present_stems],
+            )
+        if not self._delete_orphans:
+            return 0
+        removed = _remove_files(orphans)
+        if removed:
+            logger.info(f"{removed} bestand(en) zonder track verwijderd uit {self._output_dir}")
+        return removed
+
+    def _enforce_budgets(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT t.id, COALESCE(SUM(a.bytes), 0) AS bytes FROM tracks t"
+                " LEFT JOIN artifacts a ON a.track_id = t.id GROUP BY t.id ORDER BY t.id DESC"
+            ).fetchall()
+        expired, total = [], 0
+        for i, row in enumerate(rows):
+            total += row["bytes"]
+            if (self._history_size and i >= self._history_size) or (self._max_bytes and total > self._max_bytes):
+                expired.append(row["id"])
+        if not expired:
+            return 0
+        with self._lock, self._db:
+            names, tracks = [], []
+            for i in range(0, len(expired), 500):
+                chunk = expired[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                names += [row["name"] for row in self._db.execute(f"SELECT name FROM artifacts WHERE track_id IN ({marks})", chunk)]
+                tracks += [row["name"] for row in self._db.execute(f"SELECT name FROM tracks WHERE id IN ({marks})", chunk)]
+                self._db.execute(f"DELETE FROM tracks WHERE id IN ({marks})", chunk)
+        if self._on_remove is not None:
+            self._on_remove(tracks)
+        # Eerst de index, dan de bestanden: wat hier misgaat ruimt de volgende ronde als wees op
+        removed = _remove_files(os.path.join(self._output_dir, name) for name in names)
+        logger.info(f"{len(expired)} track(s) buiten het budget verwijderd ({removed} bestanden)")
+        return removed
+
+    def _retention(self, interval):
+        while True:
+            try:
+                self.sweep()
+            except Exception:
+                logger.error("Retentie van de track library gefaald:", exc_info=True)
+            time.sleep(interval)
+
+
+def _remove_files(paths):
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
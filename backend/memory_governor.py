@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+MEMORY_EVICTIONS = metrics.Counter(
+    "gateway_memory_evictions_total", "Modellen die de memory governor ontladen heeft", ("model", "reason"),
+)
+MEMORY_REFUSED = metrics.Counter(
+    "gateway_memory_refused_loads_total", "Loads die geweigerd zijn omdat ze boven gpu.unload_threshold uitkwamen",
+    ("model",),
+)
+
+
+class MemoryPressure(Exception):
+    """Een load zou boven gpu.unload_threshold uitkomen en er is niets meer te ontladen."""
+
+    def __init__(self, message, retry_after=30, **details):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.details = details
+
+    def to_dict(self):
+        return dict(self.details, error=str(self), retryAfter=self.retry_after)
+
+
+def _mb(nbytes):
+    return f"{(nbytes or 0) / (1024 * 1024):.0f} MB"
+
+
+class MemoryGovernor:
+    """Houdt het geheugen van de model services onder gpu.unload_threshold.
+
+    Elke service meldt via /memory hoeveel geheugen er in gebruik is (het
+    CUDA-device, anders de cgroup van de container of de host; zie
+    common.memory) en hoeveel zijn model bij de laatste load innam. De
+    gateway onthoudt die footprints per service in de gedeelde state, zodat
+    ze een herstart overleven; tot een model één keer gemeten is geldt de
+    schatting uit gpu.model_footprints.
+
+    `before_load()` draait in ModelResidency vlak voor elke /load: komt
+    het huidige gebruik plus de footprint boven `threshold` procent, dan
+    worden (met `auto_unload`) de minst recent gebruikte modellen die niet
+    in gebruik zijn ontladen tot het past. Past het dan nog niet, dan wordt
+    de load geweigerd met MemoryPressure in plaats van dat de service (en
+    de job die er nog loopt) door een OOM onderuit gaat. Ontladen helpt
+    alleen als het budget gedeeld is (één GPU of de hele host); een service
+    met een eigen cgroup-limiet kan alleen geweigerd worden.
+
+    Daarnaast bevraagt een achtergrond-thread elke `interval` seconden de
+    services met een geladen model en ontlaadt idle modellen zodra een
+    gedeeld budget boven de drempel zit (bv. doordat een generatie veel
+    activaties heeft laten staan).
+    """
+
+    def __init__(self, client, threshold=85, auto_unload=True, footprints=None, groups=None,
+                 state=None, interval=15, sample_timeout=5):
+        self._client = client
+        self._threshold = threshold / 100.0
+        self._auto_unload = auto_unload
+        self._estimates = {service: mb * 1024 * 1024 for service, mb in (footprints or {}).items()}
+        self._groups = dict(groups or {})
+        self._state = state
+        self._interval = interval
+        self._sample_timeout = sample_timeout
+        self._residency = None
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._measured = dict(state.get("footprints") or {}) if state is not None else {}
+
+    def attach(self, residency):
+        """Koppel de residency waarvan de governor modellen mag ontladen."""
+        self._residency = residency
+        if self._interval and self._interval > 0:
+            t = threading.Thread(target=self._watch, args=(self._interval,), name="memory-governor", daemon=True)
+            t.start()
+
+    def _service(self, model):
+        return self._groups.get(model, model)
+
+    def footprint(self, service):
+        with self._lock:
+            return self._measured.get(service, self._estimates.get(service, 0))
+
+    def sample(self, model):
+        """Vraag /memory van de service van `model` op; None als dat niet lukt.
+
+        Een persona wordt zelf bevraagd (/personas/<naam>/memory), zodat
+        `loaded` zegt of zijn checkpoint al in de gedeelde engine staat.
+        """
+        service = self._service(model)
+        try:
+            r = self._client.request("GET", model, "/memory", read_timeout=self._sample_timeout)
+            r.raise_for_status()
+            data = r.json()
+        except Exception as e:
+            logger.debug(f"/memory van {service} niet beschikbaar: {e}")
+            return None
+        if not data.get("total"):
+            return None
+        data["at"] = time.time()
+        with self._lock:
+            self._samples[service] = data
+            measured = data.get("footprint")
+            changed = measured is not None and self._measured.get(service) != measured
+            if changed:
+                self._measured[service] = measured
+        if changed and self._state is not None:
+            try:
+                self._state.update(lambda state: state.setdefault("footprints", {}).__setitem__(service, measured))
+            except OSError as e:
+                logger.warning(f"Footprint van {service} niet opgeslagen: {e}")
+        return data
+
+    def _over(self, sample, extra=0):
+        return sample["used"] + extra > self._threshold * sample["total"]
+
+    def before_load(self, model):
+        """Maak ruimte voor `model` of gooi MemoryPressure."""
+        service = self._service(model)
+        sample = self.sample(model)
+        if sample is None:
+            # Niet te meten (oude service, geen /proc): niet tegenhouden
+            return
+        need = 0 if sample.get("loaded") else self.footprint(service)
+        if not self._over(sample, need):
+            return
+        if self._auto_unload and sample["scope"] != "cgroup" and self._residency is not None:
+            while self._over(sample, need):
+                evicted = self._residency.evict_idle(exclude=service)
+                if not evicted:
+                    break
+                for victim in evicted:
+                    MEMORY_EVICTIONS.inc(model=victim, reason="load")
+                logger.info(f"{', '.join(evicted)} ontladen om ruimte te maken voor {model}")
+                sample = self.sample(model)
+                if sample is None:
+                    return
+        if not self._over(sample, need):
+            return
+        MEMORY_REFUSED.inc(model=model)
+        raise MemoryPressure(
+            f"Onvoldoende geheugen voor {model}: {_mb(sample['used'])} van {_mb(sample['total'])} in gebruik, "
+            f"het model heeft {_mb(need)} nodig (drempel {self._threshold * 100:g}%)",
+            model=model, used=sample["used"], total=sample["total"], footprint=need,
+            threshold=self._threshold * 100,
+        )
+
+    def check(self):
+        """Eén ronde: ontlaad idle modellen zolang een gedeeld budget boven de drempel zit."""
+        if self._residency is None:
+            return []
+        evicted = []
+        services = {self._service(m) for m in self._residency.loaded_models()}
+        for service in sorted(services):
+            sample = self.sample(service)
+            if sample is None or not self._over(sample):
+                continue
+            if not self._auto_unload or sample["scope"] == "cgroup":
+                logger.warning(
+                    f"{service} gebruikt {_mb(sample['used'])} van {_mb(sample['total'])} "
+                    f"(boven {self._threshold * 100:g}%)"
+                )
+                continue
+            while sample is not None and self._over(sample):
+                victims = self._residency.evict_idle()
+                if not victims:
+                    break
+                for victim in victims:
+                    MEMORY_EVICTIONS.inc(model=victim, reason="pressure")
+                logger.info(f"{', '.join(victims)} ontladen: geheugen boven {self._threshold * 100:g}%")
+                evicted.extend(victims)
+                sample = self.sample(service)
+        return evicted
+
+    def status(self):
+        with self._lock:
+            return {
+                "threshold": self._threshold * 100,
+                "autoUnload": self._auto_unload,
+                "services": {
+                    service: dict(sample, footprint=self._measured.get(service, self._estimates.get(service)))
+                    for service, sample in self._samples.items()
+                },
+            }
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.check()
+            except Exception:
+                logger.error("Geheugencontrole gefaald:", exc_info=True)
@@ -0,0 +1,131 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+# Statuscodes waarbij de model service tijdelijk onbereikbaar is
+RETRY_STATUSES = (502, 503, 504)
+# De inference-wachtrij van de service zit vol; het request is niet uitgevoerd
+BUSY_STATUS = 429
+
+UPSTREAM_REQUESTS = metrics.Counter(
+    "gateway_model_requests_total", "Requests van de gateway naar de model services",
+    ("model", "path", "status"),
+)
+UPSTREAM_SECONDS = metrics.Histogram(
+    "gateway_model_request_seconds", "Latency van requests naar de model services, incl. retries",
+    ("model", "path"),
+)
+
+
+class ModelClient:
+    """Gedeelde HTTP-client naar de model services.
+
+    Per model wordt één `requests.Session` met een eigen keep-alive
+    connection pool bijgehouden, zodat niet elke call een nieuwe TCP-verbinding
+    en DNS lookup op het Docker-netwerk kost. Idempotente calls (zoals /load en
+    /unload) worden bij verbindingsfouten en 502/503/504 opnieuw geprobeerd met
+    exponentiële backoff en jitter. Een read-timeout niet: de service heeft het
+    request dan al en is er nog mee bezig (een /load van een groot model), en
+    opnieuw sturen laat hem hetzelfde werk nog eens doen. Een 429 betekent dat de service het request niet heeft
+    uitgevoerd; dat wordt ook voor generaties opnieuw geprobeerd, na de
+    Retry-After van de service (hoogstens `busy_wait_max` seconden).
+    """
+
+    def __init__(self, base_urls, pool_size=8, connect_timeout=5.0, read_timeout=180.0,
+                 retries=3, backoff=0.5, backoff_max=8.0, busy_wait_max=30.0):
+        self._base_urls = base_urls
+        self._pool_size = pool_size
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._backoff_max = backoff_max
+        self._busy_wait_max = busy_wait_max
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, model):
+        with self._lock:
+            session = self._sessions.get(model)
+            if session is None:
+                session = requests.Session()
+                # Retries doen we zelf, zodat we jitter kunnen toevoegen
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[model] = session
+            return session
+
+    def url(self, model, path):
+        return f"{self._base_urls[model]}{path}"
+
+    def _sleep_before_retry(self, attempt):
+        # "Full jitter": willekeurig tussen 0 en de exponentiële limiet
+        delay = random.uniform(0, min(self._backoff_max, self._backoff * (2 ** attempt)))
+        time.sleep(delay)
+
+    def _wait_until_not_busy(self, response, attempt):
+        try:
+            delay = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            delay = self._backoff * (2 ** attempt)
+        # Jitter, zodat wachtende workers niet tegelijk terugkomen
+        time.sleep(min(self._busy_wait_max, delay) * random.uniform(1.0, 1.25))
+
+    def request(self, method, model, path, idempotent=False, read_timeout=None, **kwargs):
+        start = time.perf_counter()
+        status = "unreachable"
+        try:
+            r = self._request(method, model, path, idempotent, read_timeout, **kwargs)
+            status = "ok" if r.status_code < 400 else "error"
+            return r
+        finally:
+            UPSTREAM_REQUESTS.inc(model=model, path=path, status=status)
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, model=model, path=path)
+
+    def _request(self, method, model, path, idempotent, read_timeout, **kwargs):
+        session = self._session(model)
+        url = self.url(model, path)
+        timeout = (self._connect_timeout, read_timeout or self._read_timeout)
+        attempts = self._retries + 1 if idempotent else 1
+        busy_attempts = 0
+        attempt = 0
+        while True:
+            last_attempt = attempt >= attempts - 1
+            try:
+                r = session.request(method, url, timeout=timeout, **kwargs)
+            except requests.ConnectionError as e:
+                # Ook ConnectTimeout; een ReadTimeout gaat direct naar de caller
+                if last_attempt:
+                    raise
+                logger.warning(f"{method} {url} gefaald ({e}), poging {attempt + 1}/{attempts}")
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+            if r.status_code == BUSY_STATUS and busy_attempts < self._retries:
+                logger.warning(f"{method} {url} is bezet, opnieuw na Retry-After {r.headers.get('Retry-After')}")
+                r.close()
+                self._wait_until_not_busy(r, busy_attempts)
+                busy_attempts += 1
+                continue
+            if r.status_code in RETRY_STATUSES and not last_attempt:
+                logger.warning(f"{method} {url} gaf {r.status_code}, poging {attempt + 1}/{attempts}")
+                r.close()
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+            return r
+
+    def get(self, model, path, **kwargs):
+        return self.request("GET", model, path, idempotent=True, **kwargs)
+
+    def post(self, model, path, **kwargs):
+        return self.request("POST", model, path, **kwargs)
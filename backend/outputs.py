@@ -0,0 +1,87 @@
+import logging
+import mimetypes
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+
+class OutputFile:
+    def __init__(self, name, path, st):
+        self.name = name
+        self.path = path
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.signature = (st.st_size, st.st_mtime_ns, st.st_ino)
+        # Sterke ETag: verandert bij elke nieuwe versie van het bestand (outputs worden via rename of in place verlengd)
+        self.etag = f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+class OutputIndex:
+    """In-memory index van de bestanden in de output directory.
+
+    De gateway registreert een output zodra een job (of de generatie-cache)
+    hem oplevert, zodat /api/output de directory nooit hoeft te scannen.
+    Een bestand dat nog niet in de index staat (een MP3 die na de job klaar
+    kwam, of een output van voor de herstart) wordt bij de eerste aanvraag
+    met één stat toegevoegd. Bij elke lookup wordt de stat-signatuur
+    vergeleken, zodat een verlengd of opnieuw geschreven bestand een nieuwe
+    ETag krijgt. Hoogstens `max_entries` bestanden worden onthouden.
+    """
+
+    def __init__(self, root, max_entries=10000):
+        self._root = root
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, name):
+        """Registreer een (nieuw geschreven) output; geeft de entry of None terug."""
+        name = os.path.basename(name or "")
+        # Verborgen namen zijn interne mappen (.cache, .library, ...), geen outputs
+        path = safe_join(self._root, name) if name and not name.startswith(".") else None
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.discard(name)
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        entry = OutputFile(name, path, st)
+        with self._lock:
+            self._entries[name] = entry
+            self._entries.move_to_end(name)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def discard(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def lookup(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+        if entry is None:
+            return self.add(name)
+        try:
+            st = os.stat(entry.path)
+        except OSError:
+            self.discard(name)
+            return None
+        if (st.st_size, st.st_mtime_ns, st.st_ino) != entry.signature:
+            return self.add(name)
+        return entry
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
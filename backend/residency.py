@@ -0,0 +1,328 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+STATE_UNLOADED = "unloaded"
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_UNLOADING = "unloading"
+STATE_FAILED = "failed"
+
+
+class ModelResidency:
+    """Houdt bij welke modellen warm zijn in de model services.
+
+    Er zijn maximaal `max_loaded` modellen tegelijk geladen; wordt er een
+    ander model gevraagd, dan wordt het minst recent gebruikte model dat niet
+    in gebruik is eerst ontladen. Modellen die langer dan `idle_timeout`
+    seconden niet gebruikt zijn worden door een achtergrond-thread ontladen
+    (0 schakelt dat uit).
+
+    Elke `ready_interval` seconden wordt /readyz van de services bevraagd:
+    een service die zelf al geladen is (preload bij het starten) wordt
+    overgenomen, en een model waarvan de service niet meer ready is (bv. na
+    een herstart van de container) wordt weer als ontladen gemarkeerd, zodat
+    de volgende job eerst /load doet.
+
+    `groups` koppelt modellen die in dezelfde service dezelfde gewichten
+    delen (de MusicGen-persona's) aan een groepsnaam; zo'n groep telt als
+    één plek in `max_loaded`.
+
+    Met een `governor` (zie memory_governor.py) wordt vlak voor elke /load
+    gecontroleerd of het model nog in het geheugen past; de governor kan
+    daarvoor idle modellen ontladen via `evict_idle()`, of de load weigeren.
+    """
+
+    def __init__(self, client, models, max_loaded=2, idle_timeout=300, load_timeout=120,
+                 unload_timeout=30, sweep_interval=30, ready_interval=15, groups=None,
+                 governor=None):
+        self._client = client
+        self._governor = governor
+        self._groups = dict(groups or {})
+        self._max_loaded = max(1, max_loaded)
+        self._idle_timeout = idle_timeout
+        self._load_timeout = load_timeout
+        self._unload_timeout = unload_timeout
+        self._cond = threading.Condition()
+        self._models = {
+            model: {"state": STATE_UNLOADED, "inUse": 0, "lastUsed": None, "loadedAt": None, "error": None}
+            for model in models
+        }
+        # Geladen (of ladende) modellen, minst recent gebruikt vooraan
+        self._lru = OrderedDict()
+        if idle_timeout and idle_timeout > 0:
+            t = threading.Thread(target=self._reaper, args=(sweep_interval,), name="model-reaper", daemon=True)
+            t.start()
+        if ready_interval and ready_interval > 0:
+            t = threading.Thread(target=self._watch, args=(ready_interval,), name="model-readiness", daemon=True)
+            t.start()
+        if governor is not None:
+            governor.attach(self)
+
+    def status(self):
+        with self._cond:
+            return {
+                model: dict(info, resident=model in self._lru)
+                for model, info in self._models.items()
+            }
+
+    def loaded_models(self):
+        with self._cond:
+            return [m for m in self._lru if self._models[m]["state"] == STATE_READY]
+
+    def ensure_loaded(self, model):
+        """Laad `model` indien nodig en wacht tot het klaar is."""
+        with self._cond:
+            while True:
+                info = self._models[model]
+                if info["state"] == STATE_READY:
+                    self._touch(model)
+                    return
+                if info["state"] in (STATE_LOADING, STATE_UNLOADING):
+                    self._cond.wait()
+                    continue
+                victims = self._pick_victims(model)
+                if victims is None:
+                    # Alle warme modellen zijn in gebruik; wacht tot er één vrijkomt
+                    self._cond.wait()
+                    continue
+                break
+            info["state"] = STATE_LOADING
+            info["error"] = None
+            self._lru[model] = True
+
+        for victim in victims:
+            self._unload(victim)
+
+        try:
+            if self._governor is not None:
+                self._governor.before_load(model)
+            r = self._client.post(model, "/load", idempotent=True, read_timeout=self._load_timeout)
+            r.raise_for_status()
+        except Exception as e:
+            with self._cond:
+                info["state"] = STATE_FAILED
+                info["error"] = str(e)
+                self._lru.pop(model, None)
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            info["state"] = STATE_READY
+            info["loadedAt"] = time.time()
+            self._touch(model)
+            self._cond.notify_all()
+        logger.info(f"Model {model} geladen (warm: {list(self._lru)})")
+        if self._governor is not None:
+            # Leert de footprint die de service bij deze load gemeten heeft
+            self._governor.sample(model)
+
+    def preload(self, model):
+        """Laad `model` op de achtergrond, bv. models.default_model bij het starten."""
+        def run():
+            try:
+                self.ensure_loaded(model)
+            except Exception as e:
+                logger.warning(f"Preload van {model} gefaald: {e}")
+        t = threading.Thread(target=run, name=f"preload-{model}", daemon=True)
+        t.start()
+        return t
+
+    def probe(self, model):
+        """Vraag /readyz van de service op; None als hij niet bereikbaar is."""
+        try:
+            r = self._client.request("GET", model, "/readyz", read_timeout=5)
+        except Exception:
+            return None
+        return r.status_code == 200
+
+    def sync(self):
+        """Stem de status af op wat de services zelf via /readyz melden."""
+        for model in list(self._models):
+            probed_at = time.time()
+            ready = self.probe(model)
+            with self._cond:
+                info = self._models[model]
+                if (info["loadedAt"] or 0) > probed_at:
+                    # Tijdens de probe (opnieuw) geladen; de probe is verouderd
+                    continue
+                if ready and info["state"] in (STATE_UNLOADED, STATE_FAILED):
+                    if self._slots(list(self._lru) + [model]) > self._max_loaded:
+                        continue
+                    logger.info(f"Model {model} is al geladen in de service; overgenomen")
+                    info["state"] = STATE_READY
+                    info["loadedAt"] = time.time()
+                    info["error"] = None
+                    self._lru[model] = True
+                    self._touch(model)
+                    self._cond.notify_all()
+                elif not ready and info["state"] == STATE_READY and info["inUse"] == 0:
+                    logger.warning(f"Service van {model} is niet meer ready; model als ontladen gemarkeerd")
+                    info["state"] = STATE_UNLOADED
+                    info["loadedAt"] = None
+                    self._lru.pop(model, None)
+                    self._cond.notify_all()
+
+    @contextmanager
+    def use(self, model):
+        """Houd `model` geladen zolang het blok loopt, zodat het niet ge-evict wordt."""
+        self.hold(model)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def hold(self, model):
+        """Laad `model` indien nodig en houd het vast tot `release()`.
+
+        Losse variant van `use()` voor de async gateway, die het laden in
+        een thread doet maar de generatie zelf als coroutine afwacht.
+        """
+        with self._cond:
+            self._models[model]["inUse"] += 1
+        try:
+            self.ensure_loaded(model)
+        except BaseException:
+            self.release(model)
+            raise
+
+    def try_hold(self, model):
+        """Houd `model` vast als het al klaar is; blokkeert nooit."""
+        with self._cond:
+            info = self._models[model]
+            if info["state"] != STATE_READY:
+                return False
+            info["inUse"] += 1
+            self._touch(model)
+            return True
+
+    def release(self, model):
+        with self._cond:
+            self._models[model]["inUse"] -= 1
+            self._touch(model)
+            self._cond.notify_all()
+
+    def unload(self, model):
+        """Ontlaad `model` expliciet, zodra lopende requests klaar zijn."""
+        with self._cond:
+            while True:
+                info = self._models[model]
+                if info["state"] in (STATE_LOADING, STATE_UNLOADING) or info["inUse"] > 0:
+                    self._cond.wait()
+                    continue
+                break
+            # Ook als de gateway denkt dat het model niet geladen is sturen we
+            # /unload door; na een herstart van de gateway kan het nog warm zijn
+            info["state"] = STATE_UNLOADING
+            self._lru.pop(model, None)
+        error = self._unload(model)
+        if error:
+            raise RuntimeError(error)
+
+    def evict_idle(self, exclude=None):
+        """Ontlaad de minst recent gebruikte groep die niet in gebruik is.
+
+        `exclude` is een groep (of model) die blijft staan. Geeft de
+        ontladen modellen terug; leeg als er niets idle is.
+        """
+        with self._cond:
+            victims = next(self._idle_groups(exclude), [])
+            for m in victims:
+                self._models[m]["state"] = STATE_UNLOADING
+                self._lru.pop(m)
+        for m in victims:
+            self._unload(m)
+        return victims
+
+    def _touch(self, model):
+        # Aanroepen met self._cond vast
+        self._models[model]["lastUsed"] = time.time()
+        if model in self._lru:
+            self._lru.move_to_end(model)
+
+    def _slots(self, models):
+        # Aantal plekken dat deze modellen innemen; een groep telt één keer
+        return len({self._groups.get(m, m) for m in models})
+
+    def _pick_victims(self, model):
+        # Aanroepen met self._cond vast. Markeert de te ontladen modellen als
+        # UNLOADING; geeft None terug als er niets ge-evict kan worden. Een
+        # groep komt pas vrij als al zijn leden ontladen worden.
+        resident = list(self._lru)
+        slots = self._slots(resident + [model])
+        if slots <= self._max_loaded:
+            return []
+        victims = []
+        for members in self._idle_groups(self._groups.get(model, model)):
+            victims.extend(members)
+            slots -= 1
+            if slots <= self._max_loaded:
+                break
+        else:
+            return None
+        for m in victims:
+            self._models[m]["state"] = STATE_UNLOADING
+            self._lru.pop(m)
+        return victims
+
+    def _idle_groups(self, exclude=None):
+        # Aanroepen met self._cond vast. De leden van elke warme groep die
+        # helemaal idle is, op volgorde van hun laatst gebruikte lid, minst
+        # recent eerst
+        resident = list(self._lru)
+        last_used = {self._groups.get(m, m): i for i, m in enumerate(resident)}
+        for candidate in sorted(last_used, key=last_used.get):
+            if candidate == exclude:
+                continue
+            members = [m for m in resident if self._groups.get(m, m) == candidate]
+            if any(self._models[m]["state"] != STATE_READY or self._models[m]["inUse"] for m in members):
+                continue
+            yield members
+
+    def _unload(self, model):
+        # Het model is al als UNLOADING gemarkeerd en uit de LRU gehaald
+        logger.info(f"Model {model} wordt ontladen")
+        try:
+            r = self._client.post(model, "/unload", idempotent=True, read_timeout=self._unload_timeout)
+            r.raise_for_status()
+            error = None
+        except Exception as e:
+            logger.error(f"Unload van model {model} gefaald:", exc_info=True)
+            error = str(e)
+        with self._cond:
+            info = self._models[model]
+            info["state"] = STATE_UNLOADED
+            info["loadedAt"] = None
+            info["error"] = error
+            self._cond.notify_all()
+        return error
+
+    def _watch(self, interval):
+        while True:
+            try:
+                self.sync()
+            except Exception:
+                logger.error("Readiness-sync gefaald:", exc_info=True)
+            time.sleep(interval)
+
+    def _reaper(self, interval):
+        while True:
+            time.sleep(interval)
+            cutoff = time.time() - self._idle_timeout
+            with self._cond:
+                idle = [
+                    m for m in self._lru
+                    if self._models[m]["state"] == STATE_READY
+                    and self._models[m]["inUse"] == 0
+                    and (self._models[m]["lastUsed"] or 0) < cutoff
+                ]
+                for m in idle:
+                    self._models[m]["state"] = STATE_UNLOADING
+                    self._lru.pop(m)
+            for m in idle:
+                logger.info(f"Model {m} is langer dan {self._idle_timeout}s niet gebruikt")
+                self._unload(m)
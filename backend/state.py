@@ -0,0 +1,77 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SharedState:
+    """Kleine key-value state in een JSON-bestand.
+
+    Waarden als het huidige model overleven zo een herstart van de gateway.
+    Schrijven loopt onder een flock en via een atomische rename, lezen
+    gebruikt een cache die alleen ververst wordt als het bestand veranderd
+    is. Dit maakt meerdere gateway-processen niet veilig: residency, de
+    admission-tellers en de job queue staan in het geheugen van één proces.
+    """
+
+    def __init__(self, path, defaults=None):
+        self._path = path
+        self._defaults = dict(defaults or {})
+        self._lock = threading.Lock()
+        self._cache = None
+        self._signature = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _read(self):
+        # Aanroepen met self._lock vast
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            return dict(self._defaults)
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if signature != self._signature:
+            try:
+                with open(self._path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Gateway-state {self._path} niet leesbaar, standaardwaarden gebruikt: {e}")
+                data = {}
+            self._cache = dict(self._defaults, **data)
+            self._signature = signature
+        return dict(self._cache)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._read().get(key, default)
+
+    def snapshot(self):
+        with self._lock:
+            return self._read()
+
+    def update(self, fn):
+        """Pas de state atomisch aan: `fn(state)` wijzigt de dict in place."""
+        with self._lock, open(f"{self._path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._signature = None
+            data = self._read()
+            result = fn(data)
+            tmp = f"{self._path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self._path)
+            return result
+
+    def set(self, key, value):
+        self.update(lambda data: data.__setitem__(key, value))
+
+    def clear_if(self, key, expected):
+        """Zet `key` op None als hij nu `expected` is; geeft True als dat gebeurde."""
+        def clear(data):
+            if data.get(key) != expected:
+                return False
+            data[key] = None
+            return True
+        return self.update(clear)
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+TMP_PREFIX = ".upload-"
+
+
+class UploadTooLarge(RequestEntityTooLarge):
+    """De upload is groter dan system.max_upload_size."""
+
+
+class _HashingWriter:
+    """Bestand waarin werkzeug een upload-deel schrijft terwijl het binnenkomt.
+
+    Elk blok gaat meteen naar schijf en door de sha256; boven `max_bytes`
+    wordt de upload afgebroken. Zo staat er nooit een hele upload in het
+    geheugen en hoeft het bestand achteraf niet opnieuw gelezen te worden.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.size = 0
+        self._max_bytes = max_bytes
+        self._hash = hashlib.sha256()
+        self._file = open(path, "w+b")
+
+    def write(self, data):
+        self.size += len(data)
+        if self._max_bytes and self.size > self._max_bytes:
+            self.discard()
+            raise UploadTooLarge(f"Upload groter dan {self._max_bytes // (1024 * 1024)} MB")
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __getattr__(self, name):
+        # seek, read, close, ... van het onderliggende bestand (FileStorage gebruikt die)
+        return getattr(self._file, name)
+
+
+class StoredUpload:
+    def __init__(self, path, sha256, size, filename):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.filename = filename
+
+
+class UploadStore:
+    """Content-addressed opslag voor uploads in de gedeelde uploads-map.
+
+    Uploads worden tijdens het parsen van het request blok voor blok naar
+    `root` geschreven (zie `writer()`), gehasht en daarna onder hun sha256
+    bewaard. De model services lezen hetzelfde bestand via de gedeelde
+    volume-mount; de gateway geeft alleen het pad door. Dezelfde bron twee
+    keer uploaden levert één bestand op. Bestanden die langer dan
+    `retention` seconden niet gebruikt zijn worden opgeruimd.
+    """
+
+    def __init__(self, root, max_bytes, retention=3600, prune_interval=60):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._retention = retention
+        self._prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    def writer(self):
+        """Nieuw tijdelijk bestand voor een upload-deel dat nog binnenkomt."""
+        return _HashingWriter(os.path.join(self._root, f"{TMP_PREFIX}{uuid.uuid4().hex}"), self._max_bytes)
+
+    def commit(self, stream, filename):
+        """Bewaar een geparste upload onder zijn hash en geef de referentie terug."""
+        if not isinstance(stream, _HashingWriter):
+            # Niet via writer() geparst (bv. een kleine upload in het geheugen)
+            writer = self.writer()
+            stream.seek(0)
+            for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                writer.write(chunk)
+            stream = writer
+        stream.close()
+        ext = os.path.splitext(filename or "")[1].lower()[:8]
+        path = os.path.join(self._root, f"{stream.hexdigest()}{ext}")
+        if os.path.exists(path):
+            # Deze bron is al eerder geüpload
+            os.remove(stream.path)
+            os.utime(path)
+        else:
+            os.replace(stream.path, path)
+        self._maybe_prune()
+        return StoredUpload(path, stream.hexdigest(), stream.size, filename)
+
+    def _maybe_prune(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < self._prune_interval:
+                return
+            self._last_prune = now
+        cutoff = now - self._retention
+        removed = 0
+        for entry in os.scandir(self._root):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.debug(f"{removed} oude upload(s) opgeruimd")
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Load-test en throughput benchmark voor de gateway.
+
+Start per model een stand-in service (benchmark/standin.py) en de gateway
+uit backend/ als losse processen, stuurt gelijktijdig generate/extend/remix
+verkeer en schrijft de resultaten als JSON weg:
+
+    python benchmark/run.py --models musicgen,bark --concurrency 16 \\
+        --requests 400 --mix generate=6,remix=2,extend=2 --output results.json
+
+Generate en remix lopen via de gateway (job aanmaken en pollen tot hij
+klaar is). De gateway heeft geen extend-route, dus extend gaat direct naar
+de stand-in service. De gateway-overhead per request is de latency aan de
+clientkant min de rekentijd die de stand-in zelf rapporteert.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+import soundfile as sf
+import yaml
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+MODELS_DIR = os.path.join(ROOT, "models")
+
+OPERATIONS = ("generate", "extend", "remix")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} kwam niet binnen {timeout}s online")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentiel; None voor een lege lijst."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(np.ceil(pct / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def _summary(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values),
+        "max": max(values),
+    }
+
+
+class Stack:
+    """Stand-in services plus gateway als subprocessen in een tijdelijke map."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="ams-bench-")
+        self.output_dir = os.path.join(self.workdir, "output")
+        self.upload_dir = os.path.join(self.workdir, "uploads")
+        os.makedirs(self.output_dir)
+        os.makedirs(self.upload_dir)
+        self.service_urls = {}
+        self.gateway_url = None
+        self._procs = []
+
+    def _spawn(self, name, cmd, cwd, env):
+        log = open(os.path.join(self.workdir, f"{name}.log"), "wb")
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        self._procs.append((proc, log))
+        return proc
+
+    def start(self):
+        args = self.args
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([MODELS_DIR, os.environ.get("PYTHONPATH", "")]))
+        for model in args.models:
+            port = _free_port()
+            cmd = [
+                sys.executable, os.path.join(ROOT, "benchmark", "standin.py"),
+                "--model", model, "--port", str(port), "--output-dir", self.output_dir,
+                "--latency", str(args.latency), "--per-audio-second", str(args.per_audio_second),
+                "--jitter", str(args.jitter), "--audio-seconds", str(args.audio_seconds),
+                "--load-latency", str(args.load_latency), "--fail-rate", str(args.fail_rate),
+                "--parallel", str(args.parallel),
+            ]
+            if args.no_write:
+                cmd.append("--no-write")
+            self._spawn(f"standin-{model}", cmd, ROOT, env)
+            self.service_urls[model] = f"http://127.0.0.1:{port}"
+
+        with open(os.path.join(ROOT, "config.yml")) as f:
+            config = yaml.safe_load(f) or {}
+        gateway = config.setdefault("gateway", {})
+        gateway["model_urls"] = dict(self.service_urls)
+        gateway.setdefault("jobs", {}).update(workers=args.gateway_workers)
+        config["cache"] = dict(config.get("cache") or {}, enabled=args.cache, path=os.path.join(self.workdir, "cache"))
+        # De benchmark meet de gateway zelf: geen rate limit per client en plafonds ruim boven de belasting
+        config["security"] = dict(config.get("security") or {}, rate_limit=0)
+        config["admission"] = dict(
+            config.get("admission") or {},
+            max_queued_per_model=args.requests,
+            max_running_per_model=max(args.concurrency, 8),
+            max_duration=0,
+        )
+        config_path = os.path.join(self.workdir, "config.yml")
+        with open(config_path, "w") as f:
+            yaml.safe_dump(config, f)
+
+        port = _free_port()
+        gateway_env = dict(
+            env,
+            CONFIG_PATH=config_path,
+            OUTPUT_FOLDER=self.output_dir,
+            UPLOAD_FOLDER=self.upload_dir,
+        )
+        serve = (
+            "import logging, app; logging.getLogger().setLevel(logging.WARNING); "
+            f"app.app.run(host='127.0.0.1', port={port}, threaded=True)"
+        )
+        self._spawn("gateway", [sys.executable, "-c", serve], BACKEND_DIR, gateway_env)
+        self.gateway_url = f"http://127.0.0.1:{port}"
+
+        for url in self.service_urls.values():
+            _wait_until_up(f"{url}/metrics")
+        _wait_until_up(f"{self.gateway_url}/api/models")
+
+    def stop(self):
+        for proc, log in self._procs:
+            proc.send_signal(signal.SIGTERM)
+        for proc, log in self._procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+        if not self.args.keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class LoadGenerator:
+    def __init__(self, stack, args):
+        self.stack = stack
+        self.args = args
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=args.concurrency * 2)
+        self.session.mount("http://", adapter)
+        self.results = []
+        self._lock = threading.Lock()
+        self._random = random.Random(args.seed)
+        self._source = self._source_track()
+
+    def _source_track(self):
+        # Bronbestand voor remix (upload) en extend (pad op de stand-in)
+        audio = (np.random.default_rng(self.args.seed).standard_normal(32000 * 2) * 0.1).astype(np.float32)
+        buf = io.BytesIO()
+        sf.write(buf, audio, 32000, format="WAV")
+        path = os.path.join(self.stack.output_dir, "bench-source.wav")
+        with open(path, "wb") as f:
+            f.write(buf.getvalue())
+        return buf.getvalue()
+
+    def _pick(self):
+        with self._lock:
+            model = self._random.choice(self.args.models)
+            operation = self._random.choices(list(self.args.mix), weights=list(self.args.mix.values()))[0]
+        return model, operation
+
+    def _wait_for_job(self, job, deadline):
+        while job["status"] not in ("done", "failed"):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job['jobId']} niet klaar binnen {self.args.timeout}s")
+            time.sleep(self.args.poll_interval)
+            r = self.session.get(f"{self.stack.gateway_url}/api/jobs/{job['jobId']}", timeout=10)
+            r.raise_for_status()
+            job = dict(job, **r.json())
+        return job
+
+    def _via_gateway(self, model, operation, index, deadline):
+        url = self.stack.gateway_url
+        output_path = f"bench-{operation}-{index}.wav"
+        prompt = f"benchmark track {index}"
+        if operation == "generate":
+            r = self.session.post(f"{url}/api/generate", timeout=30, json={
+                "model": model, "prompt": prompt, "outputPath": output_path, "noCache": not self.args.cache,
+            })
+        else:
+            data = {"model": model, "prompt": prompt}
+            if not self.args.cache:
+                data["noCache"] = "1"
+            r = self.session.post(f"{url}/api/remix", timeout=30, data=data,
+                                  files={"file": ("source.wav", self._source, "audio/wav")})
+        if r.status_code != 202:
+            return {"ok": False, "status": r.status_code, "error": r.text[:200]}
+        job = self._wait_for_job(r.json(), deadline)
+        if job["status"] != "done":
+            return {"ok": False, "status": "job-failed", "error": job.get("error")}
+        result = job.get("result") or {}
+        return {"ok": True, "status": 200, "serviceSeconds": result.get("serviceSeconds"),
+                "cached": bool(result.get("cached"))}
+
+    def _direct_extend(self, model, index):
+        r = self.session.post(f"{self.stack.service_urls[model]}/generate/extend", timeout=self.args.timeout, json={
+            "sourceTrackPath": os.path.join(self.stack.output_dir, "bench-source.wav"),
+            "outputPath": f"bench-extend-{index}.wav",
+            "extendDuration": self.args.audio_seconds,
+            "contentPrompt": f"benchmark track {index}",
+        })
+        if r.status_code != 200:
+            return {"ok": False, "status": r.status_code, "error": r.text[:200]}
+        return {"ok": True, "status": 200, "serviceSeconds": r.json().get("serviceSeconds")}
+
+    def _one(self, index):
+        model, operation = self._pick()
+        start = time.monotonic()
+        try:
+            if operation == "extend":
+                outcome = self._direct_extend(model, index)
+            else:
+                outcome = self._via_gateway(model, operation, index, start + self.args.timeout)
+        except Exception as e:
+            outcome = {"ok": False, "status": None, "error": f"{type(e).__name__}: {e}"}
+        outcome.update(model=model, operation=operation, start=start, latency=time.monotonic() - start)
+        with self._lock:
+            self.results.append(outcome)
+
+    def warmup(self):
+        for model in self.args.models:
+            r = self.session.post(f"{self.stack.gateway_url}/api/models/load", json={"id": model}, timeout=self.args.timeout)
+            r.raise_for_status()
+
+    def run(self):
+        stop_at = time.monotonic() + self.args.duration if self.args.duration else None
+        counter = iter(range(self.args.requests or sys.maxsize))
+
+        def worker():
+            while stop_at is None or time.monotonic() < stop_at:
+                with self._lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                self._one(index)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            for _ in range(self.args.concurrency):
+                pool.submit(worker)
+        return time.monotonic() - start
+
+
+def report(results, wall_seconds, args):
+    def block(items):
+        ok = [r for r in items if r["ok"]]
+        latencies = [r["latency"] for r in ok]
+        overhead = [
+            r["latency"] - r["serviceSeconds"] for r in ok
+            if r["operation"] != "extend" and r.get("serviceSeconds") is not None and not r.get("cached")
+        ]
+        errors = {}
+        for r in items:
+            if not r["ok"]:
+                errors[str(r["status"])] = errors.get(str(r["status"]), 0) + 1
+        return {
+            "requests": len(items),
+            "succeeded": len(ok),
+            "failed": len(items) - len(ok),
+            "errorRate": (len(items) - len(ok)) / len(items) if items else 0.0,
+            "errors": errors,
+            "throughput": len(ok) / wall_seconds if wall_seconds else 0.0,
+            "latency": _summary(latencies),
+            "gatewayOverhead": _summary(overhead),
+        }
+
+    return {
+        "config": {
+            "models": args.models,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "latency": args.latency,
+            "perAudioSecond": args.per_audio_second,
+            "jitter": args.jitter,
+            "audioSeconds": args.audio_seconds,
+            "parallel": args.parallel,
+            "failRate": args.fail_rate,
+            "gatewayWorkers": args.gateway_workers,
+            "pollInterval": args.poll_interval,
+            "cache": args.cache,
+        },
+        "wallSeconds": wall_seconds,
+        "total": block(results),
+        "operations": {op: block([r for r in results if r["operation"] == op]) for op in OPERATIONS if op in args.mix},
+        "models": {m: block([r for r in results if r["model"] == m]) for m in args.models},
+    }
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Onbekende operatie: {name}")
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default="musicgen", type=lambda v: [m.strip() for m in v.split(",") if m.strip()])
+    parser.add_argument("--mix", default="generate=6,remix=2,extend=2", type=_parse_mix,
+                        help="Verhouding tussen operaties, bv. generate=6,remix=2,extend=2")
+    parser.add_argument("--concurrency", type=int, default=8, help="Gelijktijdige clients")
+    parser.add_argument("--requests", type=int, default=100, help="Totaal aantal requests (0 = onbeperkt)")
+    parser.add_argument("--duration", type=float, default=0, help="Stop na zoveel seconden (0 = geen limiet)")
+    parser.add_argument("--timeout", type=float, default=300, help="Maximale duur per request (s)")
+    parser.add_argument("--poll-interval", type=float, default=0.01, help="Interval voor job-status polling (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Generatie-cache van de gateway aan laten")
+    parser.add_argument("--gateway-workers", type=int, default=4, help="gateway.jobs.workers")
+    # Stand-in instellingen
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--per-audio-second", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--audio-seconds", type=float, default=5)
+    parser.add_argument("--load-latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=1, help="Gelijktijdige generaties per stand-in")
+    parser.add_argument("--no-write", action="store_true")
+    parser.add_argument("--output", help="Schrijf de JSON-resultaten naar dit bestand i.p.v. stdout")
+    parser.add_argument("--keep", action="store_true", help="Werkmap met logs niet opruimen")
+    args = parser.parse_args()
+    if not args.requests and not args.duration:
+        parser.error("Geef --requests of --duration op")
+
+    stack = Stack(args)
+    try:
+        stack.start()
+        generator = LoadGenerator(stack, args)
+        generator.warmup()
+        wall_seconds = generator.run()
+        results = report(generator.results, wall_seconds, args)
+    finally:
+        stack.stop()
+        if args.keep:
+            print(f"Logs en output in {stack.workdir}", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    total = results["total"]
+    print(
+        f"{total['succeeded']}/{total['requests']} ok in {wall_seconds:.1f}s, "
+        f"{total['throughput']:.2f} req/s, p95 {total['latency']['p95']}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Stand-in model service voor benchmarks, zonder GPU of echte modellen.
+
+Spreekt dezelfde HTTP-interface als de model services (/load, /unload,
+/generate, /extend, /remix en de varianten onder /generate/...) en
+genereert ruis (0,1 x normaal verdeeld) met de interface van een
+audiocraft MusicGen-model (`set_generation_params`, `generate`). Latency en lengte van de output zijn instelbaar:
+
+    python benchmark/standin.py --model musicgen --port 5101 \\
+        --latency 0.5 --per-audio-second 0.1 --audio-seconds 10
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+from flask import Flask, jsonify, request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models"))
+
+from common import readiness  # noqa: E402
+from common.audio_sink import write_audio  # noqa: E402
+from common.service import service_bp  # noqa: E402
+
+SAMPLE_RATE = 32000
+
+
+class StandInModel:
+    """Nep-MusicGen in numpy met synthetische rekentijd.
+
+    De rekentijd is `latency + duur * per_audio_second`, plus willekeurige
+    jitter. `parallel` bepaalt hoeveel generaties tegelijk mogen lopen; een
+    echte GPU-service doet er effectief één tegelijk.
+    """
+
+    def __init__(self, latency=0.5, per_audio_second=0.0, jitter=0.0, audio_seconds=5,
+                 fail_rate=0.0, parallel=1):
+        self.latency = latency
+        self.per_audio_second = per_audio_second
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.generation_params = {"duration": audio_seconds}
+        self._slots = threading.Semaphore(max(1, parallel))
+
+    def set_generation_params(self, **kwargs):
+        self.generation_params.update(kwargs)
+
+    def compute_seconds(self, duration):
+        delay = self.latency + duration * self.per_audio_second
+        if self.jitter:
+            delay += random.uniform(-self.jitter, self.jitter)
+        return max(0.0, delay)
+
+    def generate(self, descriptions, duration=None):
+        duration = float(duration or self.generation_params["duration"])
+        with self._slots:
+            time.sleep(self.compute_seconds(duration))
+            if self.fail_rate and random.random() < self.fail_rate:
+                raise RuntimeError("Gesimuleerde generatiefout")
+            samples = int(SAMPLE_RATE * duration)
+            return (np.random.randn(len(descriptions), 1, samples) * 0.1).astype(np.float32)
+
+
+def create_app(name, model, output_dir, load_latency=0.0, write=True):
+    app = Flask(f"standin-{name}")
+    app.register_blueprint(service_bp)
+
+    def _load():
+        time.sleep(load_latency)
+        return True
+
+    def _warmup():
+        model.generate(["warmup"], duration=readiness.WARMUP_DURATION)
+
+    def _output_path(output_path):
+        output_path = output_path or f"{name}-{int(time.time() * 1000)}.wav"
+        return os.path.join(output_dir, os.path.basename(output_path))
+
+    def _run(prompt, output_path, duration=None):
+        start = time.perf_counter()
+        if not readiness.is_ready():
+            readiness.load(_load, _warmup)
+        audio = model.generate([prompt], duration=duration)[0]
+        service_seconds = time.perf_counter() - start
+        if write:
+            saved = write_audio(audio, SAMPLE_RATE, _output_path(output_path), formats=("wav",))
+            duration = saved["duration"]
+        else:
+            duration = audio.shape[-1] / SAMPLE_RATE
+        return jsonify(
+            success=True,
+            duration=duration,
+            outputPath=os.path.basename(output_path or ""),
+            serviceSeconds=service_seconds,
+        )
+
+    @app.route("/load", methods=["POST"])
+    def load_route():
+        readiness.load(_load, _warmup)
+        return jsonify(success=True, message="Model loaded successfully")
+
+    @app.route("/unload", methods=["POST"])
+    def unload_route():
+        readiness.unload(lambda: True)
+        return jsonify(success=True, message="Model unloaded successfully")
+
+    @app.route("/generate", methods=["POST"])
+    def generate_route():
+        data = request.get_json(silent=True) or {}
+        try:
+            return _run(data.get("prompt") or data.get("contentPrompt", ""), data.get("outputPath"))
+        except RuntimeError as e:
+            return jsonify(success=False, error=str(e)), 500
+
+    @app.route("/extend", methods=["POST"])
+    @app.route("/generate/extend", methods=["POST"])
+    def extend_route():
+        data = request.get_json(silent=True) or {}
+        try:
+            return _run(data.get("contentPrompt", ""), data.get("outputPath"),
+                        duration=data.get("extendDuration"))
+        except RuntimeError as e:
+            return jsonify(success=False, error=str(e)), 500
+
+    @app.route("/remix", methods=["POST"])
+    @app.route("/generate/remix", methods=["POST"])
+    def remix_route():
+        # De gateway stuurt multipart met het bronbestand, directe clients JSON
+        data = request.get_json(silent=True) or request.form
+        try:
+            return _run(data.get("prompt") or data.get("contentPrompt", ""), data.get("outputPath"))
+        except RuntimeError as e:
+            return jsonify(success=False, error=str(e)), 500
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="musicgen", help="Naam van het model dat wordt nagebootst")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--latency", type=float, default=0.5, help="Vaste rekentijd per generatie (s)")
+    parser.add_argument("--per-audio-second", type=float, default=0.0,
+                        help="Extra rekentijd per seconde gegenereerde audio (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Willekeurige afwijking van de rekentijd (s)")
+    parser.add_argument("--audio-seconds", type=float, default=5, help="Lengte van de output (s)")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Duur van /load (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fractie generaties die faalt")
+    parser.add_argument("--parallel", type=int, default=1, help="Gelijktijdige generaties")
+    parser.add_argument("--no-write", action="store_true", help="Geen audiobestanden wegschrijven")
+    parser.add_argument("--preload", action="store_true", help="Model bij het starten op de achtergrond laden")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    model = StandInModel(
+        latency=args.latency,
+        per_audio_second=args.per_audio_second,
+        jitter=args.jitter,
+        audio_seconds=args.audio_seconds,
+        fail_rate=args.fail_rate,
+        parallel=args.parallel,
+    )
+    app = create_app(args.model, model, args.output_dir, load_latency=args.load_latency, write=not args.no_write)
+    if args.preload:
+        threading.Thread(target=lambda: app.test_client().post("/load"), name="model-preload", daemon=True).start()
+    readiness.mark_serving()
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
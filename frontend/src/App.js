@@ -21,11 +21,9 @@ function App() {
       })
   }, [])
 
+  // De gateway houdt zelf de laatst gebruikte modellen warm, dus het vorige
+  // model hoeft hier niet meer ontladen te worden
   const selectModel = async (id) => {
-    if (selectedModel) {
-      try { await axios.post('/api/models/unload', { id: selectedModel }) }
-      catch (_) {}
-    }
     try {
       await axios.post('/api/models/load', { id })
       setSelectedModel(id)
@@ -37,6 +35,18 @@ function App() {
     }
   }
 
+  // Generatie en remix draaien als job; poll tot de job klaar is
+  const waitForJob = async (job) => {
+    if (job.status === 'done') return job.result || {}
+    const jobId = job.jobId
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 2000))
+      const res = await axios.get(`/api/jobs/${jobId}`)
+      if (res.data.status === 'done') return res.data.result || {}
+      if (res.data.status === 'failed') throw new Error(res.data.error || 'Job failed')
+    }
+  }
+
   const generate = async () => {
     if (!selectedModel || !prompt.trim()) return
     setLoading(true)
@@ -48,20 +58,22 @@ function App() {
     try {
       console.log("Sending generation request with filename:", filename)
       const res = await axios.post('/api/generate', {
+        model:          selectedModel,
         contentPrompt: prompt,
         stylePrompt:    '',
         hasVocals:      vocals,
         outputPath:     filename
       })
       
-      console.log("Generation response:", res.data)
+      const result = await waitForJob(res.data)
+      console.log("Generation response:", result)
       
-      if (res.data.error) {
-        throw new Error(res.data.error)
+      if (result.error) {
+        throw new Error(result.error)
       }
       
       // Check both possible response formats
-      const outputPath = res.data.outputPath || filename
+      const outputPath = result.outputPath || filename
       console.log("Setting audio URL to:", `/api/output/${outputPath}`)
       
       // Add a small delay to ensure file is written to disk
@@ -84,6 +96,7 @@ function App() {
     setError(null)
     
     const form = new FormData()
+    form.append('model',    selectedModel)
     form.append('file',     selectedFile)
     form.append('prompt',   prompt)
     form.append('duration', duration)
@@ -91,14 +104,15 @@ function App() {
 
     try {
       const res = await axios.post('/api/remix', form)
-      console.log("Remix response:", res.data)
+      const result = await waitForJob(res.data)
+      console.log("Remix response:", result)
       
-      if (res.data.error) {
-        throw new Error(res.data.error)
+      if (result.error) {
+        throw new Error(result.error)
       }
       
       // Check both possible response formats
-      const outputPath = res.data.outputPath || `${selectedModel}-remix-${Date.now()}.wav`
+      const outputPath = result.outputPath || `${selectedModel}-remix-${Date.now()}.wav`
       
       // Add a small delay to ensure file is written to disk
       setTimeout(() => {
@@ -2,22 +2,32 @@ import os
 import gc
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from common import executor, readiness
+from common.lazy import lazy_import
+from common.service import service_bp
 
-from app_impl import (
-    load_model_impl,
-    unload_model_impl,
-    generate_impl,
-    extend_impl,
-    remix_impl,
+load_model_impl, unload_model_impl, warmup_impl, generate_impl, extend_impl, remix_impl = lazy_import(
+    "app_impl",
+    "load_model_impl",
+    "unload_model_impl",
+    "warmup_impl",
+    "generate_impl",
+    "extend_impl",
+    "remix_impl",
 )
 
+# Al het model-werk loopt via één inference-thread; load/unload sluiten achteraan aan
+generate_impl, extend_impl, remix_impl = executor.bind(generate_impl, extend_impl, remix_impl)
+load_model_impl, unload_model_impl, warmup_impl = executor.bind(load_model_impl, unload_model_impl, warmup_impl, control=True)
+
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(service_bp)
 
 
 @app.route("/load", methods=["POST"])
 def load_route():
-    success = load_model_impl()
+    success = readiness.load(load_model_impl, warmup_impl)
     if success:
         return jsonify(success=True, message="AudioLDM loaded")
     else:
@@ -26,7 +36,7 @@ def load_route():
 
 @app.route("/unload", methods=["POST"])
 def unload_route():
-    success = unload_model_impl()
+    success = readiness.unload(unload_model_impl)
     if success:
         return jsonify(success=True, message="AudioLDM unloaded")
     else:
@@ -36,7 +46,7 @@ def unload_route():
 @app.route("/generate", methods=["POST"])
 def generate_route():
     data = request.json or {}
-    prompt = data.get("prompt", "")
+    prompt = data.get("contentPrompt") or data.get("prompt", "")
     output_path = data.get("outputPath")
     if not output_path:
         return jsonify(success=False, error="outputPath required"), 400
@@ -52,12 +62,12 @@ def extend_route():
     source = data.get("sourcePath")
     output = data.get("outputPath")
     dur = data.get("extendDuration", 30.0)
-    prompt = data.get("prompt", "")
+    prompt = data.get("contentPrompt") or data.get("prompt", "")
     if not source or not output:
         return jsonify(success=False, error="sourcePath and outputPath required"), 400
     duration = extend_impl(source, output, dur, prompt)
     if duration > 0:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error="Extension failed"), 500
 
 
@@ -66,14 +76,16 @@ def remix_route():
     data = request.json or {}
     source = data.get("sourcePath")
     output = data.get("outputPath")
-    prompt = data.get("prompt", "")
+    prompt = data.get("contentPrompt") or data.get("prompt", "")
     if not source or not output:
         return jsonify(success=False, error="sourcePath and outputPath required"), 400
     duration = remix_impl(source, output, prompt)
     if duration > 0:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error="Remix failed"), 500
 
 
 if __name__ == "__main__":
+    readiness.start_preload(load_model_impl, warmup_impl)
+    readiness.mark_serving()
     app.run(host="0.0.0.0", port=5000)
@@ -1,12 +1,12 @@
 import os
 import gc
 import torch
-import numpy as np
-import soundfile as sf
-import librosa
 
 from diffusers import AudioLDMPipeline
-from pydub import AudioSegment
+from common import extend
+from common import model_store
+from common.audio_sink import write_audio
+from common.readiness import WARMUP_DURATION
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 OUTPUT_FOLDER = "/app/output"
@@ -22,7 +22,9 @@ def load_model_impl():
         if model is not None:
             return True
         print("Loading AudioLDMPipeline…")
-        model = AudioLDMPipeline.from_pretrained(
+        model = model_store.load_diffusers(
+            "audioldm-m-full",
+            AudioLDMPipeline,
             "cvssp/audioldm-m-full",
             torch_dtype=torch.float16,
         )
@@ -51,28 +53,23 @@ def unload_model_impl():
         return False
 
 
+def warmup_impl():
+    """Korte synthetische generatie zodat de eerste echte request niet de
+    eenmalige initialisatiekosten betaalt."""
+    model("warmup", num_inference_steps=2, audio_length_in_s=WARMUP_DURATION)
+
+
 def generate_impl(prompt: str, output_path: str) -> float:
     """Genereer audio voor een gegeven prompt en sla op."""
     global model
     try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
         if model is None:
             if not load_model_impl():
                 return 0.0
         out = model(prompt, num_inference_steps=10, audio_length_in_s=30.0)
         audio = out.audios[0].cpu().numpy()
-        sf.write(output_path, audio, samplerate=16000)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=audio, sr=16000)
+        saved = write_audio(audio, 16000, output_path)
+        duration = saved["duration"]
         print(f"Saved {output_path}, duration={duration:.2f}s")
         return duration
     except Exception as e:
@@ -84,26 +81,13 @@ def extend_impl(source_path: str, output_path: str, extend_duration: float, prom
     """Voeg extra audio toe aan een bestaand bestand."""
     global model
     try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
         if model is None:
             if not load_model_impl():
                 return 0.0
-        original, sr = librosa.load(source_path, sr=16000)
         out = model(prompt, num_inference_steps=10, audio_length_in_s=extend_duration)
         extension = out.audios[0].cpu().numpy()
-        combined = np.concatenate([original, extension])
-        sf.write(output_path, combined, samplerate=16000)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=combined, sr=16000)
+        saved = extend.append(source_path, extension, 16000, output_path)
+        duration = saved["duration"]
         print(f"Extended saved to {output_path}, duration={duration:.2f}s")
         return duration
     except Exception as e:
@@ -115,38 +99,16 @@ def remix_impl(source_path: str, output_path: str, prompt: str) -> float:
     """Maak een remix gebaseerd op de prompt."""
     global model
     try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
         if model is None:
             if not load_model_impl():
                 return 0.0
         remix_prompt = f"Remix of: {prompt}"
         out = model(remix_prompt, num_inference_steps=10, audio_length_in_s=30.0)
         remix = out.audios[0].cpu().numpy()
-        sf.write(output_path, remix, samplerate=16000)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=remix, sr=16000)
+        saved = write_audio(remix, 16000, output_path)
+        duration = saved["duration"]
         print(f"Remix saved to {output_path}, duration={duration:.2f}s")
         return duration
     except Exception as e:
         print(f"Error during remix: {e}")
         return 0.0
-
-
-def convert_to_mp3(wav_path, mp3_path):
-    """Converteer een WAV-bestand naar MP3-formaat."""
-    try:
-        sound = AudioSegment.from_wav(wav_path)
-        sound.export(mp3_path, format="mp3")
-        print(f"Converted {wav_path} to {mp3_path}")
-    except Exception as e:
-        print(f"❌ Fout bij conversie naar mp3: {e}")
-
@@ -2,31 +2,41 @@ import os
 import gc
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-
-from app_impl import (
-    load_model_impl,
-    unload_model_impl,
-    generate_impl,
-    extend_impl,
-    remix_impl,
+from common import executor, readiness
+from common.lazy import lazy_import
+from common.service import service_bp
+
+load_model_impl, unload_model_impl, warmup_impl, generate_impl, extend_impl, remix_impl = lazy_import(
+    "app_impl",
+    "load_model_impl",
+    "unload_model_impl",
+    "warmup_impl",
+    "generate_impl",
+    "extend_impl",
+    "remix_impl",
 )
 
+# Al het model-werk loopt via één inference-thread; load/unload sluiten achteraan aan
+generate_impl, extend_impl, remix_impl = executor.bind(generate_impl, extend_impl, remix_impl)
+load_model_impl, unload_model_impl, warmup_impl = executor.bind(load_model_impl, unload_model_impl, warmup_impl, control=True)
+
 OUTPUT_FOLDER = "/app/output"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(service_bp)
 
 @app.route('/load', methods=['POST'])
 def load_route():
-    success = load_model_impl()
+    success = readiness.load(load_model_impl, warmup_impl)
     if success:
         return jsonify(success=True, message='Bark models loaded')
     return jsonify(success=False, error='Failed to load Bark models'), 500
 
 @app.route('/unload', methods=['POST'])
 def unload_route():
-    success = unload_model_impl()
+    success = readiness.unload(unload_model_impl)
     if success:
         return jsonify(success=True, message='Bark models unloaded')
     return jsonify(success=False, error='Failed to unload Bark models'), 500
@@ -50,7 +60,7 @@ def generate_route():
         ok, duration = generate_impl(content, style, vocals, output)
 
     if ok:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Generation failed'), 500
 
 @app.route('/generate/extend', methods=['POST'])
@@ -68,7 +78,7 @@ def extend_route():
 
     ok, duration = extend_impl(source, output, dur, content, style, vocals)
     if ok:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Extension failed'), 500
 
 @app.route('/generate/remix', methods=['POST'])
@@ -85,8 +95,10 @@ def remix_route():
 
     ok, duration = remix_impl(source, output, content, style, vocals)
     if ok:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Remix failed'), 500
 
 if __name__ == '__main__':
+    readiness.start_preload(load_model_impl, warmup_impl)
+    readiness.mark_serving()
     app.run(host='0.0.0.0', port=5000)
@@ -1,11 +1,12 @@
 import os
 import gc
 import torch
-import numpy as np
-import soundfile as sf
-import librosa
 from bark import generate_audio, preload_models, SAMPLE_RATE
-from pydub import AudioSegment
+from bark.generation import CACHE_DIR
+from common import extend
+from common import model_store
+from common.audio_sink import write_audio
+from common.readiness import WARMUP_DURATION
 
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 OUTPUT_FOLDER = '/app/output'
@@ -20,7 +21,11 @@ def load_model_impl():
         return True
     try:
         print('Preloading Bark models...')
-        preload_models()
+        # Bark downloadt zelf naar CACHE_DIR; die map komt in de model store
+        model_store.attach_cache('bark', CACHE_DIR)
+        with model_store.mmap_torch_load():
+            preload_models()
+        model_store.seal('bark', source='suno/bark')
         models_loaded = True
         print('Bark models loaded.')
         return True
@@ -44,23 +49,18 @@ def unload_model_impl():
         print(f'Error unloading Bark models: {e}')
         return False
 
+def warmup_impl():
+    """Korte synthetische generatie zodat de eerste echte request niet de
+    eenmalige initialisatiekosten betaalt."""
+    generate_audio("warmup", silent=True)
+
+
 def generate_impl(content_prompt, style_prompt, has_vocals, output_path):
     """Generate audio with Bark."""
     if not models_loaded:
         if not load_model_impl():
             return False, 0.0
     try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-            
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-        
         prompt = content_prompt
         if style_prompt:
             prompt += f' in the style of {style_prompt}'
@@ -70,20 +70,8 @@ def generate_impl(content_prompt, style_prompt, has_vocals, output_path):
         print(f'Generating with Bark: {prompt}')
         wav = generate_audio(prompt)
         
-        # Sla op naar het volledige pad
-        sf.write(full_output_path, wav, samplerate=SAMPLE_RATE)
-        
-        # Controleer of het bestand is opgeslagen
-        if os.path.exists(full_output_path):
-            print(f"Successfully saved file to {full_output_path}")
-            
-            # MP3 conversie
-            mp3_path = full_output_path.replace(".wav", ".mp3")
-            convert_to_mp3(full_output_path, mp3_path)
-        else:
-            print(f"Failed to save file to {full_output_path}")
-            
-        duration = librosa.get_duration(y=wav, sr=SAMPLE_RATE)
+        saved = write_audio(wav, SAMPLE_RATE, output_path)
+        duration = saved["duration"]
         return True, duration
     except Exception as e:
         print(f'Error generating Bark audio: {e}')
@@ -95,7 +83,8 @@ def extend_impl(source_path, output_path, extend_duration, content_prompt, style
         if not load_model_impl():
             return False, 0.0
     try:
-        original, sr = librosa.load(source_path, sr=SAMPLE_RATE)
+        # Alleen het einde van de bron dient als history
+        history = extend.read_tail(source_path, sr=SAMPLE_RATE)
         prompt = content_prompt
         if style_prompt:
             prompt += f' in the style of {style_prompt}'
@@ -103,11 +92,9 @@ def extend_impl(source_path, output_path, extend_duration, content_prompt, style
             prompt += '. Instrumental only, no vocals.'
         prompt += ' Continuation.'
         print(f'Extending with Bark: {prompt}')
-        continuation = generate_audio(prompt, history_prompt=[original])
-        extended = np.concatenate([original, continuation])
-        sf.write(output_path, extended, samplerate=SAMPLE_RATE)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=extended, sr=SAMPLE_RATE)
+        continuation = generate_audio(prompt, history_prompt=[history])
+        saved = extend.append(source_path, continuation, SAMPLE_RATE, output_path)
+        duration = saved["duration"]
         return True, duration
     except Exception as e:
         print(f'Error extending Bark audio: {e}')
@@ -126,20 +113,9 @@ def remix_impl(source_path, output_path, content_prompt, style_prompt, has_vocal
             prompt += '. Instrumental only, no vocals.'
         print(f'Remixing with Bark: {prompt}')
         remix = generate_audio(prompt)
-        sf.write(output_path, remix, samplerate=SAMPLE_RATE)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=remix, sr=SAMPLE_RATE)
+        saved = write_audio(remix, SAMPLE_RATE, output_path)
+        duration = saved["duration"]
         return True, duration
     except Exception as e:
         print(f'Error remixing Bark audio: {e}')
         return False, 0.0
-
-def convert_to_mp3(wav_path, mp3_path):
-    """Converteer WAV-bestand naar MP3."""
-    try:
-        sound = AudioSegment.from_wav(wav_path)
-        sound.export(mp3_path, format="mp3")
-        print(f"Converted {wav_path} to {mp3_path}")
-    except Exception as e:
-        print(f"❌ Fout bij conversie naar mp3: {e}")
-
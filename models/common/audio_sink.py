@@ -0,0 +1,81 @@
+"""Eén plek om modeloutput weg te schrijven.
+
+Alle model services geven hun tensor of array plus sample rate aan
+`write_audio`. Die doet één dtype-conversie, schrijft het primaire bestand
+(meestal WAV) synchroon en laat de overige formaten op de achtergrond
+encoderen. De duur wordt uit de vorm van de array berekend.
+"""
+import os
+import time
+
+import numpy as np
+import soundfile as sf
+
+from common import metrics
+from common.encoder import encode_async
+
+OUTPUT_FOLDER = "/app/output"
+DEFAULT_FORMATS = ("wav", "mp3")
+
+
+def resolve_output_path(output_path):
+    """Relatieve paden horen in de gedeelde output directory."""
+    if not os.path.isabs(output_path):
+        output_path = os.path.join(OUTPUT_FOLDER, output_path)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    return output_path
+
+
+def to_frames(audio):
+    """Zet een tensor/array om naar float32 met vorm (samples[, kanalen]).
+
+    Er wordt alleen gekopieerd als dat nodig is: een float32 numpy array
+    gaat ongewijzigd door, (kanalen, samples) wordt een getransponeerde view.
+    """
+    if hasattr(audio, "detach"):
+        audio = audio.detach().cpu().numpy()
+    data = np.asarray(audio, dtype=np.float32)
+    if data.ndim == 2 and data.shape[0] < data.shape[1]:
+        data = data.T
+    return data
+
+
+def write_audio(audio, sample_rate, output_path, formats=DEFAULT_FORMATS, normalize=False):
+    """Schrijf `audio` weg en geef paden, duur, groottes en timings terug."""
+    start = time.perf_counter()
+    path = resolve_output_path(output_path)
+    data = to_frames(audio)
+    if normalize:
+        peak = float(np.abs(data).max()) if data.size else 0.0
+        if peak > 0:
+            data = data / peak
+    convert_seconds = time.perf_counter() - start
+
+    stem, ext = os.path.splitext(path)
+    primary = ext.lstrip(".").lower() or "wav"
+    write_start = time.perf_counter()
+    sf.write(path, data, samplerate=sample_rate, format=primary.upper())
+    write_seconds = time.perf_counter() - write_start
+
+    encodes = {}
+    for fmt in formats:
+        if fmt == primary:
+            continue
+        encodes[fmt] = encode_async(data, sample_rate, f"{stem}.{fmt}", fmt)
+
+    duration = data.shape[0] / float(sample_rate)
+    metrics.CONVERT_SECONDS.observe(convert_seconds)
+    metrics.WRITE_SECONDS.observe(write_seconds, format=primary)
+    metrics.record_audio(duration)
+    size = os.path.getsize(path)
+    print(f"Saved {path} ({size} bytes, {duration:.2f}s audio) in {write_seconds:.3f}s")
+    return {
+        "path": path,
+        "duration": duration,
+        "sampleRate": sample_rate,
+        "channels": 1 if data.ndim == 1 else data.shape[1],
+        "bytes": size,
+        "convertSeconds": convert_seconds,
+        "writeSeconds": write_seconds,
+        "encodes": encodes,
+    }
@@ -0,0 +1,38 @@
+"""config.yml voor de model services.
+
+Zelfde interface als backend/config.py. config.yml wordt via
+docker-compose op /app/config.yml gemount; zonder bestand (of zonder
+PyYAML in het image) gelden de standaardwaarden.
+"""
+import os
+
+CONFIG_PATH = os.environ.get("CONFIG_PATH", "/app/config.yml")
+
+_config = None
+
+
+def load_config(path=None):
+    """Lees config.yml één keer in en cache het resultaat."""
+    global _config
+    if _config is not None and path is None:
+        return _config
+    path = path or CONFIG_PATH
+    try:
+        import yaml
+        with open(path) as f:
+            data = yaml.safe_load(f) or {}
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Config {path} niet gelezen, standaardwaarden worden gebruikt: {e}")
+        data = {}
+    _config = data
+    return data
+
+
+def get_setting(key, default=None):
+    """Haal een waarde op via een pad met punten, bv. 'models.musicgen.duration'."""
+    value = load_config()
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return default if value is None else value
@@ -0,0 +1,117 @@
+"""Achtergrond-encoder voor afgeleide audioformaten (MP3, OGG, FLAC).
+
+De encoder werkt direct vanuit de numpy array die het model heeft
+opgeleverd en stuurt de PCM-data via een pipe naar ffmpeg. Er wordt dus
+geen WAV teruggelezen van schijf en de request-thread hoeft niet op de
+encode te wachten. Alleen een verlengde track (common/extend.py) staat
+niet in het geheugen; dan krijgt de encoder het pad van de WAV en leest
+ffmpeg die zelf.
+"""
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from common import metrics
+
+ENCODE_PENDING = "pending"
+ENCODE_DONE = "done"
+ENCODE_FAILED = "failed"
+
+ENCODER_WORKERS = int(os.environ.get("ENCODER_WORKERS", "2"))
+# Aantal encode-statussen dat bewaard blijft voor /encodes/<naam>
+MAX_TRACKED = 1000
+
+_executor = ThreadPoolExecutor(max_workers=ENCODER_WORKERS, thread_name_prefix="encoder")
+_status = OrderedDict()
+_lock = threading.Lock()
+
+
+def to_pcm16(audio):
+    """Zet een array om naar interleaved 16-bit PCM bytes en geef (bytes, kanalen)."""
+    audio = np.asarray(audio)
+    if audio.ndim == 2 and audio.shape[0] < audio.shape[1]:
+        # (kanalen, samples) -> (samples, kanalen)
+        audio = audio.T
+    channels = 1 if audio.ndim == 1 else audio.shape[1]
+    if audio.dtype == np.int16:
+        pcm = audio
+    else:
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    return np.ascontiguousarray(pcm).tobytes(), channels
+
+
+def _format_of(path):
+    return os.path.splitext(path)[1].lstrip(".")
+
+
+def encode(audio, sample_rate, path, fmt=None):
+    """Encodeer `audio` (een array of het pad van een audiobestand) synchroon naar `path` via ffmpeg."""
+    fmt = fmt or _format_of(path)
+    if isinstance(audio, str):
+        data = None
+        source = ["-i", audio]
+    else:
+        data, channels = to_pcm16(audio)
+        source = ["-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0"]
+    # Eerst naar een tijdelijk bestand, zodat lezers nooit een half bestand zien
+    tmp_path = f"{path}.part"
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", *source, "-f", fmt, tmp_path]
+    result = subprocess.run(cmd, input=data, capture_output=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(result.stderr.decode(errors="replace").strip() or "ffmpeg failed")
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def _set_status(path, **fields):
+    name = os.path.basename(path)
+    with _lock:
+        status = _status.setdefault(name, {})
+        status.update(fields)
+        _status.move_to_end(name)
+        while len(_status) > MAX_TRACKED:
+            _status.popitem(last=False)
+
+
+def _run(audio, sample_rate, path, fmt):
+    start = time.perf_counter()
+    try:
+        size = encode(audio, sample_rate, path, fmt)
+    except Exception as e:
+        print(f"❌ Fout bij conversie naar {fmt or path}: {e}")
+        elapsed = time.perf_counter() - start
+        metrics.ENCODE_SECONDS.observe(elapsed, format=fmt or _format_of(path), status="error")
+        _set_status(path, state=ENCODE_FAILED, error=str(e), seconds=elapsed)
+        return
+    elapsed = time.perf_counter() - start
+    metrics.ENCODE_SECONDS.observe(elapsed, format=fmt or _format_of(path), status="ok")
+    print(f"Encoded {path} in {elapsed:.2f}s")
+    _set_status(path, state=ENCODE_DONE, size=size, seconds=elapsed)
+
+
+def encode_async(audio, sample_rate, path, fmt=None):
+    """Plan een encode op de achtergrond en geef de huidige status terug."""
+    _set_status(path, state=ENCODE_PENDING, error=None, queuedAt=time.time())
+    _executor.submit(_run, audio, sample_rate, path, fmt)
+    return encode_status(path)
+
+
+def encode_status(name):
+    with _lock:
+        status = _status.get(os.path.basename(name))
+        return dict(status) if status is not None else None
+
+
+def pending_encodes():
+    with _lock:
+        return sum(1 for status in _status.values() if status.get("state") == ENCODE_PENDING)
+
+
+metrics.QUEUE_DEPTH.set_function(pending_encodes, queue="encoder")
@@ -0,0 +1,136 @@
+"""Eén inference-thread per model service.
+
+De Flask server handelt requests in meerdere threads af. Zonder
+coördinatie liepen generaties tegelijk op hetzelfde model, groeide de
+rij wachtende requests onbegrensd en kon een /unload het model vrijgeven
+terwijl er nog een generatie liep. Al het model-werk (load, warmup,
+generate, unload) loopt daarom via één executor-thread die het model
+bezit; HTTP-handlers zetten werk in de rij en wachten op het resultaat.
+
+De rij is begrensd op INFERENCE_MAX_QUEUE wachtende generaties. Zit hij
+vol, dan gooit `submit()` een ExecutorBusy met de positie die het request
+gekregen zou hebben en een geschatte wachttijd; service.py maakt daar
+een 429 met Retry-After van. Load en unload worden nooit geweigerd, maar
+sluiten wel achteraan in dezelfde rij aan.
+
+    generate_impl, extend_impl = executor.bind(generate_impl, extend_impl)
+    load_model_impl, unload_model_impl = executor.bind(load_model_impl, unload_model_impl, control=True)
+"""
+import functools
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from common import metrics
+
+MAX_QUEUE = int(os.environ.get("INFERENCE_MAX_QUEUE", "8"))
+# Wachttijd per request als er nog niets gemeten is
+DEFAULT_TASK_SECONDS = 10.0
+
+REJECTED = metrics.Counter(
+    "model_inference_rejected_total", "Requests geweigerd omdat de inference-wachtrij vol zat",
+)
+
+
+class ExecutorBusy(Exception):
+    """De inference-wachtrij zit vol; het request is niet uitgevoerd."""
+
+    def __init__(self, position, max_queue, retry_after):
+        super().__init__(f"Inference-wachtrij zit vol ({max_queue} wachtend), probeer het over {retry_after}s opnieuw")
+        self.position = position
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """Voert model-werk één voor één uit op een eigen thread."""
+
+    def __init__(self, max_queue=MAX_QUEUE, name="inference"):
+        self._max_queue = max(1, max_queue)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Wachtende generaties (de limiet) en het totaal inclusief load/unload en de lopende taak
+        self._waiting = 0
+        self._outstanding = 0
+        # Voortschrijdend gemiddelde van de duur van een generatie, voor Retry-After
+        self._task_seconds = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, control=False, **kwargs):
+        """Voer `fn` uit op de executor-thread en geef het resultaat terug.
+
+        Zonder `control` telt de taak mee voor de limiet en kan hij met
+        ExecutorBusy geweigerd worden.
+        """
+        if threading.current_thread() is self._thread:
+            # Aanroep vanuit een taak die al op de executor draait
+            return fn(*args, **kwargs)
+        future = Future()
+        with self._lock:
+            if not control and self._waiting >= self._max_queue:
+                position = self._outstanding + 1
+                REJECTED.inc()
+                raise ExecutorBusy(position, self._max_queue, self._retry_after(position))
+            if not control:
+                self._waiting += 1
+            self._outstanding += 1
+        self._queue.put((fn, args, kwargs, control, future))
+        return future.result()
+
+    def _retry_after(self, position):
+        seconds = self._task_seconds or DEFAULT_TASK_SECONDS
+        return max(1, math.ceil(seconds * (position - 1)))
+
+    def pending(self):
+        """Aantal taken in de rij, inclusief de taak die nu loopt."""
+        with self._lock:
+            return self._outstanding
+
+    def _run(self):
+        while True:
+            fn, args, kwargs, control, future = self._queue.get()
+            if not control:
+                with self._lock:
+                    self._waiting -= 1
+            start = time.perf_counter()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._outstanding -= 1
+                if not control:
+                    self._task_seconds = elapsed if self._task_seconds is None else 0.8 * self._task_seconds + 0.2 * elapsed
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """De executor van deze service; de thread start pas bij het eerste gebruik."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = InferenceExecutor()
+            metrics.QUEUE_DEPTH.set_function(_executor.pending, queue="inference")
+        return _executor
+
+
+def bind(*fns, control=False):
+    """Geef voor elke functie een variant die op de executor-thread draait."""
+
+    def wrap(fn):
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            return get_executor().submit(fn, *args, control=control, **kwargs)
+
+        # functools.wraps neemt ook `prepare` van een lazy functie over (zie readiness.load)
+        return call
+
+    return tuple(wrap(fn) for fn in fns)
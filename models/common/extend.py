@@ -0,0 +1,272 @@
+"""Tracks verlengen zonder de hele bron in te lezen of te herschrijven.
+
+Voor een vervolg is alleen het einde van de bron nodig. `read_tail()`
+seekt in het bestand en leest alleen de laatste seconden; alleen dat stuk
+wordt eventueel geresampled.
+
+`Splice` zet het vervolg achter de bron in `output_path`, met een
+crossfade van audio.crossfade_duration (ms, config.yml) over de naad.
+Een nieuwe output wordt direct geschreven. Bestaat de output al (ook
+als het de bron zelf is), dan gaat alles naar `<output>.part` en pas
+bij `close()` met os.replace op zijn plek, zoals de encoder doet; een
+mislukte extend laat het bestaande bestand dan heel. Voor een WAV wordt
+de bron door de kernel gekopieerd (shutil.copyfile gebruikt sendfile)
+en daarna met soundfile in 'r+' vanaf het begin van de crossfade
+overschreven. Voor andere formaten gaat de bron blok voor blok naar een
+nieuwe WAV. In het geheugen staan alleen de crossfade-staart van de bron
+en het blok dat geschreven wordt.
+
+De crossfade is equal-power, behalve als de staart van de bron en het
+begin van het vervolg sterk correleren: daar zou equal-power tot +3 dB
+opleveren en wordt lineair gefade (zie `crossfade_gains()`).
+
+Het vervolg mag in stukken binnenkomen (`write()` per blok, daarna
+`close()`); `append()` doet het in één keer. Het vervolg wordt naar de
+sample rate en het aantal kanalen van de bron omgezet, zodat de bron
+nooit zelf geresampled hoeft te worden.
+
+    tail = extend.read_tail(source_path, sr=SAMPLE_RATE)
+    extension = model(prompt, history=tail)
+    return extend.append(source_path, extension, SAMPLE_RATE, output_path)["duration"]
+"""
+import math
+import os
+import shutil
+import time
+
+import numpy as np
+import soundfile as sf
+
+from common import config, metrics
+from common.audio_sink import DEFAULT_FORMATS, OUTPUT_FOLDER, resolve_output_path, to_frames
+from common.encoder import encode_async
+
+# Seconden aan het einde van de bron die als context voor een vervolg dienen
+CONTEXT_SECONDS = float(config.get_setting("audio.extend_context", 10))
+CROSSFADE_SECONDS = float(config.get_setting("audio.crossfade_duration", 1000)) / 1000.0
+BLOCK_FRAMES = 64 * 1024
+
+
+def source_path(path):
+    """Relatieve bronnen zijn eerdere outputs in de gedeelde output directory."""
+    if not os.path.isabs(path) and not os.path.exists(path):
+        return os.path.join(OUTPUT_FOLDER, path)
+    return path
+
+
+def _resample(audio, orig_sr, target_sr):
+    if orig_sr == target_sr or not len(audio):
+        return audio
+    import librosa
+
+    return np.ascontiguousarray(librosa.resample(audio.T, orig_sr=orig_sr, target_sr=target_sr).T, dtype=np.float32)
+
+
+def _match_channels(audio, channels):
+    """Vorm (frames, kanalen) met het aantal kanalen van de bron."""
+    if audio.ndim == 1:
+        audio = audio[:, None]
+    if audio.shape[1] == channels:
+        return audio
+    mono = audio.mean(axis=1, keepdims=True)
+    return mono if channels == 1 else np.repeat(mono, channels, axis=1)
+
+
+def read_tail(path, seconds=CONTEXT_SECONDS, sr=None):
+    """Lees de laatste `seconds` van de bron als mono float32.
+
+    Met `sr` wordt alleen het gelezen stuk naar die sample rate omgezet.
+    """
+    with sf.SoundFile(source_path(path)) as f:
+        frames = int(math.ceil(seconds * f.samplerate))
+        if f.frames > frames:
+            f.seek(f.frames - frames)
+        tail = f.read(frames, dtype="float32", always_2d=True)
+        file_sr = f.samplerate
+    tail = tail.mean(axis=1) if tail.shape[1] > 1 else tail[:, 0]
+    return _resample(tail, file_sr, sr or file_sr)
+
+
+# Vanaf deze correlatie tussen bronstaart en vervolg wordt lineair gefade
+CORRELATED = 0.5
+
+
+def correlation(a, b):
+    """Genormaliseerde correlatie (-1..1) van twee even lange stukken audio; 0 bij stilte."""
+    a, b = a.ravel(), b.ravel()
+    energy = float(np.sqrt(np.dot(a, a) * np.dot(b, b)))
+    return float(np.dot(a, b)) / energy if energy > 0 else 0.0
+
+
+def crossfade_gains(start, count, length, linear=False):
+    """Gains (uit, in) voor frames start..start+count van een crossfade van `length` frames.
+
+    Equal-power (cos/sin, cos² + sin² = 1) houdt het vermogen alleen
+    gelijk voor ongecorreleerde signalen; daar zakt een lineaire fade in
+    het midden 3 dB weg. Voor gecorreleerd materiaal (een vervolg van
+    dezelfde track) tellen de amplitudes op en geeft equal-power in het
+    midden tot +3 dB (0,707 + 0,707); daar houdt een lineaire fade
+    (uit + in = 1) het niveau gelijk.
+    """
+    t = (np.arange(start, start + count, dtype=np.float32) + 0.5) / np.float32(length)
+    if linear:
+        return (1 - t)[:, None], t[:, None]
+    t *= np.float32(np.pi / 2)
+    return np.cos(t)[:, None], np.sin(t)[:, None]
+
+
+def _copy_blocks(src, dst, frames):
+    """Kopieer de eerste `frames` frames van `src` blok voor blok naar `dst`."""
+    remaining = frames
+    while remaining > 0:
+        block = src.read(min(BLOCK_FRAMES, remaining), dtype="float32", always_2d=True)
+        if not len(block):
+            break
+        dst.write(block)
+        remaining -= len(block)
+
+
+class Splice:
+    """Schrijft bron + vervolg naar `output_path`, met een crossfade over de naad.
+
+    `sample_rate` is die van het vervolg; de output krijgt de sample rate
+    en kanalen van de bron. `crossfade` in seconden, standaard
+    audio.crossfade_duration. `close()` geeft hetzelfde resultaat als
+    write_audio; `abort()` gooit een onvoltooide output weg en laat de
+    bron ongemoeid.
+
+    De eerste crossfade-lengte van het vervolg wordt vastgehouden tot hij
+    compleet is: pas dan is de correlatie met de staart van de bron bekend
+    en daarmee de vorm van de fade.
+    """
+
+    def __init__(self, source, sample_rate, output_path, crossfade=None, formats=DEFAULT_FORMATS):
+        start = time.perf_counter()
+        self._sample_rate = sample_rate
+        self._formats = formats
+        src_path = source_path(source)
+        self.path = resolve_output_path(output_path)
+        info = sf.info(src_path)
+        self.sr, self.channels = info.samplerate, info.channels
+        seconds = CROSSFADE_SECONDS if crossfade is None else crossfade
+        fade = min(int(round(seconds * self.sr)), info.frames)
+        # Frames van de bron die ongewijzigd blijven
+        self._kept = info.frames - fade
+        self._written = 0
+
+        self._stem, ext = os.path.splitext(self.path)
+        self._primary = ext.lstrip(".").lower() or "wav"
+        # Een bestaand bestand (ook de bron zelf) mag een mislukte extend niet half overschreven achterlaten
+        self._tmp = f"{self.path}.part" if os.path.exists(self.path) else self.path
+        if self._primary == "wav" and info.format == "WAV":
+            # Bron en output zijn allebei WAV: alleen vanaf de crossfade schrijven
+            shutil.copyfile(src_path, self._tmp)
+            self._file = sf.SoundFile(self._tmp, "r+")
+            self._file.seek(self._kept)
+            self._tail = self._file.read(fade, dtype="float32", always_2d=True)
+            self._file.seek(self._kept)
+        else:
+            self._file = sf.SoundFile(self._tmp, "w", samplerate=self.sr, channels=self.channels,
+                                      format=self._primary.upper())
+            with sf.SoundFile(src_path) as src:
+                _copy_blocks(src, self._file, self._kept)
+                self._tail = src.read(fade, dtype="float32", always_2d=True)
+        self._fade = len(self._tail)
+        self._faded = 0
+        # Begin van het vervolg tot de vorm van de crossfade vastligt
+        self._head = []
+        self._head_frames = 0
+        self.linear = None if self._fade else False
+        self._convert_seconds = 0.0
+        self._write_seconds = time.perf_counter() - start
+
+    def write(self, audio):
+        """Schrijf het volgende stuk van het vervolg."""
+        start = time.perf_counter()
+        data = _match_channels(_resample(to_frames(audio), self._sample_rate, self.sr), self.channels)
+        write_start = time.perf_counter()
+        self._convert_seconds += write_start - start
+        if self.linear is None:
+            self._head.append(data)
+            self._head_frames += len(data)
+            if self._head_frames >= self._fade:
+                self._flush_head()
+        else:
+            self._write_frames(data)
+        self._write_seconds += time.perf_counter() - write_start
+
+    def _flush_head(self):
+        head = np.concatenate(self._head) if self._head else np.zeros((0, self.channels), dtype=np.float32)
+        self._head = []
+        n = min(len(head), self._fade)
+        self.linear = correlation(self._tail[:n], head[:n]) >= CORRELATED
+        self._write_frames(head)
+
+    def _write_frames(self, data):
+        if self._faded < self._fade:
+            n = min(self._fade - self._faded, len(data))
+            fade_out, fade_in = crossfade_gains(self._faded, n, self._fade, self.linear)
+            self._file.write(self._tail[self._faded:self._faded + n] * fade_out + data[:n] * fade_in)
+            self._faded += n
+            data = data[n:]
+        if len(data):
+            self._file.write(data)
+        self._written += len(data)
+
+    def close(self):
+        """Rond de splice af en geef paden, duur, groottes en timings terug."""
+        write_start = time.perf_counter()
+        if self.linear is None:
+            self._flush_head()
+        if self._faded < self._fade:
+            # Het vervolg was korter dan de crossfade: de rest van de bron uitfaden
+            fade_out, _ = crossfade_gains(self._faded, self._fade - self._faded, self._fade, self.linear)
+            self._file.write(self._tail[self._faded:] * fade_out)
+        self._file.close()
+        if self._tmp != self.path:
+            os.replace(self._tmp, self.path)
+        self._write_seconds += time.perf_counter() - write_start
+
+        encodes = {}
+        for fmt in self._formats:
+            if fmt == self._primary:
+                continue
+            # De encoder leest de volledige track zelf van schijf
+            encodes[fmt] = encode_async(self.path, self.sr, f"{self._stem}.{fmt}", fmt)
+
+        appended = (self._faded + self._written) / float(self.sr)
+        duration = (self._kept + self._fade + self._written) / float(self.sr)
+        metrics.CONVERT_SECONDS.observe(self._convert_seconds)
+        metrics.WRITE_SECONDS.observe(self._write_seconds, format=self._primary)
+        metrics.record_audio(appended)
+        size = os.path.getsize(self.path)
+        print(f"Appended {appended:.2f}s to {self.path} ({size} bytes, {duration:.2f}s audio) in {self._write_seconds:.3f}s")
+        return {
+            "path": self.path,
+            "duration": duration,
+            "sampleRate": self.sr,
+            "channels": self.channels,
+            "bytes": size,
+            "convertSeconds": self._convert_seconds,
+            "writeSeconds": self._write_seconds,
+            "crossfade": "none" if not self._fade else "linear" if self.linear else "equal-power",
+            "encodes": encodes,
+        }
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp)
+        except OSError:
+            pass
+
+
+def append(source, extension, sample_rate, output_path, crossfade=None, formats=DEFAULT_FORMATS):
+    """Schrijf bron + `extension` naar `output_path`; zelfde resultaat als write_audio."""
+    splice = Splice(source, sample_rate, output_path, crossfade, formats)
+    try:
+        splice.write(extension)
+    except BaseException:
+        splice.abort()
+        raise
+    return splice.close()
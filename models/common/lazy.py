@@ -0,0 +1,53 @@
+"""Uitgestelde import van de model-implementatie.
+
+app_impl.py importeert torch, transformers, diffusers enz.; dat kost bij
+een koude container al snel tientallen seconden. app.py haalt de
+functies daarom op via `lazy_import()`: de HTTP-laag (en /healthz,
+/readyz, /metrics) is dan binnen een seconde bereikbaar en de zware
+import gebeurt pas bij de eerste load of generatie. De importtijd wordt
+als startup-fase "imports" gerapporteerd.
+
+    load_model_impl, generate_impl = lazy_import("app_impl", "load_model_impl", "generate_impl")
+"""
+import importlib
+import threading
+import time
+
+from common import readiness
+
+_modules = {}
+_import_lock = threading.Lock()
+
+
+def _module(name):
+    module = _modules.get(name)
+    if module is not None:
+        return module
+    with _import_lock:
+        module = _modules.get(name)
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            readiness.record_phase("imports", time.perf_counter() - start)
+            _modules[name] = module
+    return module
+
+
+def _proxy(module_name, name):
+    def call(*args, **kwargs):
+        return getattr(_module(module_name), name)(*args, **kwargs)
+
+    call.__name__ = call.__qualname__ = name
+    # readiness.load() importeert vooraf, zodat de laadtijd zonder imports gemeten wordt
+    call.prepare = lambda: _module(module_name)
+    return call
+
+
+def is_imported(module_name):
+    """Is `module_name` al via een lazy functie geïmporteerd?"""
+    return module_name in _modules
+
+
+def lazy_import(module_name, *names):
+    """Geef voor elke naam een functie die `module_name` pas bij de eerste aanroep importeert."""
+    return tuple(_proxy(module_name, name) for name in names)
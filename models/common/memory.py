@@ -0,0 +1,143 @@
+"""Geheugengebruik van een model service, voor de memory governor van de gateway.
+
+`sample()` meet het geheugen waar het model in terechtkomt. Met CUDA
+(alleen als de service torch al gebruikt) is dat het hele device via
+torch.cuda.mem_get_info. Anders is het de cgroup van de container (v2
+memory.current/memory.max, v1 memory.usage_in_bytes/limit_in_bytes, min
+de inactieve page cache) of, zonder limiet, het host-geheugen uit
+/proc/meminfo. `scope` zegt of dat budget gedeeld wordt met de andere
+services ("device", "host") of alleen van deze container is ("cgroup");
+alleen in het eerste geval maakt het ontladen van een ander model ruimte.
+
+De footprint van het model wordt gemeten rond `readiness.load()`: het
+geheugen van het proces (CUDA reserved, anders RSS) na laden en warmup
+min dat ervoor. De meting blijft na een unload staan, zodat de gateway
+bij de volgende load weet hoeveel ruimte er nodig is.
+"""
+import os
+import sys
+import threading
+import time
+
+from common import metrics
+
+# Te overschrijven voor een andere mount (of voor tests op een nagemaakte cgroup)
+CGROUP_ROOT = os.environ.get("CGROUP_ROOT", "/sys/fs/cgroup")
+MEMINFO_PATH = os.environ.get("MEMINFO_PATH", "/proc/meminfo")
+# cgroup v1 meldt "geen limiet" als een absurd groot getal
+UNLIMITED = 1 << 60
+
+FOOTPRINT_BYTES = metrics.Gauge("model_memory_footprint_bytes", "Gemeten geheugen van het geladen model")
+
+_footprint = {"bytes": None, "measuredAt": None}
+_lock = threading.Lock()
+# Zie set_loaded_check(); None betekent readiness.is_ready()
+loaded_check = None
+
+
+def _cuda():
+    # Torch niet zelf importeren: zonder torch is er ook geen model op de GPU
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return torch.cuda
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _stat_field(text, name):
+    for line in (text or "").splitlines():
+        key, _, value = line.partition(" ")
+        if key == name:
+            return int(value)
+    return 0
+
+
+def _cgroup():
+    """(gebruikt, limiet) van de cgroup van de container, of None zonder limiet."""
+    for usage_name, limit_name, stat_name, inactive in (
+        ("memory.current", "memory.max", "memory.stat", "inactive_file"),
+        ("memory/memory.usage_in_bytes", "memory/memory.limit_in_bytes", "memory/memory.stat", "total_inactive_file"),
+    ):
+        limit = _read(os.path.join(CGROUP_ROOT, limit_name))
+        usage = _read(os.path.join(CGROUP_ROOT, usage_name))
+        if limit is None or usage is None:
+            continue
+        limit = limit.strip()
+        if limit == "max" or int(limit) >= UNLIMITED:
+            return None
+        # Inactieve page cache geeft de kernel terug voordat de OOM-killer komt
+        used = int(usage) - _stat_field(_read(os.path.join(CGROUP_ROOT, stat_name)), inactive)
+        return max(0, used), int(limit)
+    return None
+
+
+def _meminfo():
+    fields = {}
+    for line in (_read(MEMINFO_PATH) or "").splitlines():
+        name, _, value = line.partition(":")
+        parts = value.split()
+        if parts:
+            fields[name] = int(parts[0]) * 1024
+    if "MemTotal" not in fields or "MemAvailable" not in fields:
+        return None
+    return fields["MemTotal"] - fields["MemAvailable"], fields["MemTotal"]
+
+
+def process_bytes():
+    """Geheugen van dit proces: CUDA reserved als het model op de GPU staat, anders RSS."""
+    cuda = _cuda()
+    if cuda is not None:
+        return cuda.memory_reserved()
+    return metrics.process_rss_bytes()
+
+
+def sample():
+    """Gebruikt en totaal geheugen van het budget waar het model in staat."""
+    cuda = _cuda()
+    if cuda is not None:
+        free, total = cuda.mem_get_info()
+        device, scope, used = "cuda", "device", total - free
+    else:
+        device = "cpu"
+        measured = _cgroup()
+        scope = "cgroup"
+        if measured is None:
+            measured = _meminfo()
+            scope = "host"
+        used, total = measured if measured is not None else (None, None)
+    return {"device": device, "scope": scope, "used": used, "total": total, "process": process_bytes()}
+
+
+def record_footprint(nbytes):
+    nbytes = max(0, int(nbytes))
+    with _lock:
+        _footprint.update(bytes=nbytes, measuredAt=time.time())
+    FOOTPRINT_BYTES.set(nbytes)
+    print(f"Model-footprint: {nbytes / (1024 * 1024):.0f} MB")
+
+
+def footprint():
+    with _lock:
+        return dict(_footprint)
+
+
+def set_loaded_check(fn):
+    """Voor services met meer dan één model (musicgen): staat er een model in het geheugen?"""
+    global loaded_check
+    loaded_check = fn
+
+
+def report(loaded):
+    """Response van /memory: de sample, de footprint en of er een model geladen is."""
+    measured = footprint()
+    return dict(
+        success=True, loaded=loaded, footprint=measured["bytes"], footprintMeasuredAt=measured["measuredAt"],
+        **sample(),
+    )
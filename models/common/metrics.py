@@ -0,0 +1,262 @@
+"""Eenvoudige Prometheus-metrics zonder extra dependency.
+
+Counters, gauges en histogrammen met labels, plus `render()` dat alles in
+het Prometheus tekstformaat (versie 0.0.4) teruggeeft. Gauges kunnen een
+functie krijgen die pas bij het scrapen wordt aangeroepen, bv. voor RSS of
+CUDA-geheugen.
+"""
+import math
+import os
+import sys
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Standaard buckets voor latencies in seconden; generaties duren lang
+LATENCY_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+FAST_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+RATIO_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 5, 10, 20)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} verwacht labels {self.labelnames}, kreeg {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        samples = self._samples()
+        if not samples:
+            return None
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, value in samples:
+            extra = None
+            if isinstance(name, tuple):
+                name, extra = name
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        """Laat de waarde pas bij het scrapen berekenen; `fn` mag None teruggeven."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def value(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            fn = self._functions.get(key)
+            if fn is None:
+                return self._values.get(key, 0)
+        return fn()
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                value = fn()
+            except Exception:
+                value = None
+            if value is not None:
+                values[key] = value
+        return [(self.name, key, value) for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                samples.append(((f"{self.name}_bucket", ("le", _format_value(float(bound)))), key, bucket_count))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+def render():
+    with _registry_lock:
+        metrics = list(_registry)
+    # Metrics zonder samples (bv. CUDA zonder GPU) worden overgeslagen
+    blocks = [metric.render() for metric in metrics]
+    return "\n".join(block for block in blocks if block) + "\n"
+
+
+def process_rss_bytes():
+    """Huidig resident geheugen van dit proces; valt terug op de piek via getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _cuda_stat(name):
+    # Torch niet zelf importeren: alleen rapporteren als de service het al gebruikt
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return getattr(torch.cuda, name)()
+
+
+# Metrics die elke model service rapporteert
+REQUEST_SECONDS = Histogram(
+    "model_request_seconds", "Wall-clock duur van model requests",
+    ("operation", "status"),
+)
+LOAD_SECONDS = Histogram(
+    "model_load_seconds", "Duur van het laden van het model (zonder warmup)",
+    ("status",),
+)
+REALTIME_FACTOR = Histogram(
+    "model_realtime_factor", "Seconden audio per seconde wall-clock tijd",
+    ("operation",), buckets=RATIO_BUCKETS,
+)
+AUDIO_SECONDS = Counter(
+    "model_audio_seconds_total", "Totaal gegenereerde seconden audio",
+    ("operation",),
+)
+INFLIGHT = Gauge("model_inflight_requests", "Requests die nu worden uitgevoerd")
+QUEUE_DEPTH = Gauge("model_queue_depth", "Wachtende items in de interne wachtrijen", ("queue",))
+WRITE_SECONDS = Histogram(
+    "audio_write_seconds", "Duur van het schrijven van het primaire audiobestand",
+    ("format",), buckets=FAST_BUCKETS,
+)
+CONVERT_SECONDS = Histogram(
+    "audio_convert_seconds", "Duur van de dtype/vorm-conversie voor het schrijven",
+    buckets=FAST_BUCKETS,
+)
+ENCODE_SECONDS = Histogram(
+    "audio_encode_seconds", "Duur van achtergrond-encodes",
+    ("format", "status"), buckets=FAST_BUCKETS + (30, 60),
+)
+RSS_BYTES = Gauge("process_resident_memory_bytes", "Resident geheugen van het proces")
+CUDA_ALLOCATED = Gauge("cuda_memory_allocated_bytes", "Door torch gealloceerd CUDA-geheugen")
+CUDA_RESERVED = Gauge("cuda_memory_reserved_bytes", "Door torch gereserveerd CUDA-geheugen")
+
+RSS_BYTES.set_function(process_rss_bytes)
+CUDA_ALLOCATED.set_function(lambda: _cuda_stat("memory_allocated"))
+CUDA_RESERVED.set_function(lambda: _cuda_stat("memory_reserved"))
+
+# Geproduceerde audio van het lopende request, per thread
+_current = threading.local()
+
+
+def begin_request():
+    _current.audio_seconds = 0.0
+
+
+def record_audio(seconds):
+    """Tel geschreven audio mee voor de real-time factor van het lopende request."""
+    _current.audio_seconds = getattr(_current, "audio_seconds", 0.0) + seconds
+
+
+def end_request(operation, status, elapsed):
+    REQUEST_SECONDS.observe(elapsed, operation=operation, status=status)
+    audio = getattr(_current, "audio_seconds", 0.0)
+    _current.audio_seconds = 0.0
+    if audio > 0 and elapsed > 0:
+        AUDIO_SECONDS.inc(audio, operation=operation)
+        REALTIME_FACTOR.observe(audio / elapsed, operation=operation)
@@ -0,0 +1,346 @@
+"""Lokale model store voor checkpoints.
+
+Zonder store haalt elke load de gewichten via de hub (of een cache in de
+container die bij een rebuild verdwijnt) en leest ze volledig in RAM in.
+De store houdt per checkpoint één map bij in $MODEL_STORE (een gedeeld
+volume), in een formaat dat met mmap gelezen kan worden:
+
+    $MODEL_STORE/<naam>/manifest.json   bron plus grootte en sha256 per bestand
+    $MODEL_STORE/<naam>/...             de checkpoint-bestanden
+
+Een lege store wordt één keer gevuld (`ensure`): eerst in een tijdelijke
+map, daarna met een atomaire rename, onder een file lock zodat services
+die hetzelfde checkpoint delen het niet tegelijk ophalen. Alleen dan
+wordt de hub gebruikt. De checksums worden één keer per proces volledig
+gecontroleerd; een herlaad na een unload controleert alleen grootte en
+mtime en duurt daardoor seconden.
+
+Diffusers-pipelines worden als safetensors opgeslagen (`load_diffusers`),
+MusicGen houdt de zipfile-checkpoints van audiocraft aan en leest ze via
+`torch.load(mmap=True)` (`load_musicgen`). Libraries met een eigen
+download-cache (bark, jukebox) krijgen die cache in de store
+(`attach_cache` en `seal`).
+"""
+import contextlib
+import fcntl
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+import time
+
+from common import metrics
+
+STORE_DIR = os.environ.get("MODEL_STORE", "/app/model_store")
+MANIFEST = "manifest.json"
+_HASH_CHUNK = 8 << 20
+
+# Laden uit de store: safetensors met mmap, model opbouwen zonder eerst willekeurige gewichten te alloceren
+MMAP_KWARGS = {"use_safetensors": True, "low_cpu_mem_usage": True, "local_files_only": True}
+# Bestanden van een audiocraft MusicGen checkpoint op de hub
+MUSICGEN_FILES = ("state_dict.bin", "compression_state_dict.bin")
+
+STORE_SECONDS = metrics.Histogram(
+    "model_store_seconds", "Duur van model store operaties (verify, populate)",
+    ("operation", "status"),
+)
+
+# Naam -> handtekening (bestand, grootte, mtime) van de laatste geslaagde verificatie
+_verified = {}
+_thread_lock = threading.Lock()
+_patch_lock = threading.Lock()
+
+
+def enabled():
+    return bool(STORE_DIR)
+
+
+def entry_path(name):
+    return os.path.join(STORE_DIR, name)
+
+
+def _has_manifest(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def _files(root):
+    found = []
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for filename in files:
+            if filename.startswith(".") or (directory == root and filename == MANIFEST):
+                continue
+            found.append(os.path.relpath(os.path.join(directory, filename), root))
+    return sorted(found)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _signature(root, files):
+    signature = []
+    for rel in files:
+        st = os.stat(os.path.join(root, rel))
+        signature.append((rel, st.st_size, st.st_mtime_ns))
+    return tuple(signature)
+
+
+def _write_manifest(root, source=None):
+    files = _files(root)
+    manifest = {
+        "source": source,
+        "created": time.time(),
+        "files": {
+            rel: {"bytes": os.path.getsize(os.path.join(root, rel)), "sha256": _sha256(os.path.join(root, rel))}
+            for rel in files
+        },
+    }
+    tmp = os.path.join(root, f".{MANIFEST}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(root, MANIFEST))
+    return _signature(root, files)
+
+
+def verify(name):
+    """Controleer de bestanden van `name` tegen het manifest."""
+    path = entry_path(name)
+    start = time.perf_counter()
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            expected = json.load(f)["files"]
+        files = sorted(expected)
+        for rel in files:
+            if os.path.getsize(os.path.join(path, rel)) != expected[rel]["bytes"]:
+                raise ValueError(f"{rel} heeft een afwijkende grootte")
+        signature = _signature(path, files)
+        if _verified.get(name) == signature:
+            return True
+        for rel in files:
+            if _sha256(os.path.join(path, rel)) != expected[rel]["sha256"]:
+                raise ValueError(f"checksum van {rel} klopt niet")
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Model store: {name} ongeldig: {e}")
+        _verified.pop(name, None)
+        STORE_SECONDS.observe(time.perf_counter() - start, operation="verify", status="error")
+        return False
+    _verified[name] = signature
+    elapsed = time.perf_counter() - start
+    STORE_SECONDS.observe(elapsed, operation="verify", status="ok")
+    print(f"Model store: {name} geverifieerd in {elapsed:.1f}s")
+    return True
+
+
+def discard(name):
+    """Verwijder een (corrupte of halve) entry; eerst hernoemen zodat niemand hem nog half ziet."""
+    path = entry_path(name)
+    _verified.pop(name, None)
+    if not os.path.lexists(path):
+        return
+    trash = os.path.join(STORE_DIR, f".discard-{name}-{os.getpid()}-{int(time.time())}")
+    os.rename(path, trash)
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def _exclusive(name):
+    # Thread lock binnen het proces, flock tussen containers die de store delen
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with _thread_lock, open(os.path.join(STORE_DIR, f".{name}.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def ensure(name, populate, source=None):
+    """Geef het pad van een geverifieerde entry; vul de store eerst als hij leeg is.
+
+    `populate(path)` schrijft de checkpoint-bestanden in een lege map.
+    Geeft None terug als de store uitgeschakeld is (MODEL_STORE="").
+    """
+    if not enabled():
+        return None
+    path = entry_path(name)
+    if _has_manifest(path) and verify(name):
+        return path
+    with _exclusive(name):
+        # Een andere service kan de store intussen gevuld hebben
+        if _has_manifest(path):
+            if verify(name):
+                return path
+            discard(name)
+        print(f"Model store: {name} ontbreekt, ophalen van {source or 'de hub'}")
+        tmp = os.path.join(STORE_DIR, f".tmp-{name}-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        start = time.perf_counter()
+        try:
+            populate(tmp)
+            signature = _write_manifest(tmp, source)
+            discard(name)
+            os.rename(tmp, path)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            STORE_SECONDS.observe(time.perf_counter() - start, operation="populate", status="error")
+            raise
+        elapsed = time.perf_counter() - start
+        STORE_SECONDS.observe(elapsed, operation="populate", status="ok")
+        # Net zelf gehasht: geen tweede volledige controle nodig
+        _verified[name] = signature
+        print(f"Model store: {name} opgeslagen in {elapsed:.1f}s")
+    return path
+
+
+def load(name, populate, load_local, load_remote=None, source=None):
+    """Laad `name` uit de store; de hub wordt alleen gebruikt om een lege store te vullen.
+
+    Lukt het laden van een geverifieerde entry niet (bv. na een
+    library-upgrade), dan wordt de entry één keer opnieuw opgebouwd.
+    `load_remote` is de oude route voor als de store uitgeschakeld of
+    niet beschrijfbaar is.
+    """
+    try:
+        path = ensure(name, populate, source)
+    except OSError as e:
+        if load_remote is None:
+            raise
+        print(f"Model store niet bruikbaar voor {name} ({e}), direct laden")
+        return load_remote()
+    if path is None:
+        if load_remote is None:
+            raise RuntimeError("Model store is uitgeschakeld en er is geen andere bron")
+        return load_remote()
+    try:
+        return load_local(path)
+    except Exception as e:
+        print(f"Model store: laden van {name} mislukt ({e}), entry wordt opnieuw opgebouwd")
+        with _exclusive(name):
+            discard(name)
+        return load_local(ensure(name, populate, source))
+
+
+@contextlib.contextmanager
+def mmap_torch_load():
+    """Laat torch.load binnen dit blok checkpoints via mmap lezen.
+
+    Libraries als audiocraft en bark roepen zelf torch.load aan; met mmap
+    staan de gewichten in de page cache in plaats van een tweede keer in
+    het proces-RAM. Oudere torch-versies (< 2.1) en checkpoints in het
+    oude, niet-zip formaat worden gewoon ingelezen.
+    """
+    import torch
+
+    original = torch.load
+    if "mmap" not in inspect.signature(original).parameters:
+        yield
+        return
+
+    def load(f, *args, **kwargs):
+        if not isinstance(f, (str, os.PathLike)) or "mmap" in kwargs:
+            return original(f, *args, **kwargs)
+        try:
+            return original(f, *args, mmap=True, **kwargs)
+        except RuntimeError:
+            return original(f, *args, **kwargs)
+
+    with _patch_lock:
+        torch.load = load
+        try:
+            yield
+        finally:
+            torch.load = original
+
+
+def load_diffusers(name, pipeline_cls, repo_id, load_local=None, load_remote=None, **kwargs):
+    """Laad een diffusers-pipeline uit de store; de eerste keer wordt hij als safetensors bewaard."""
+
+    def populate(path):
+        pipeline = pipeline_cls.from_pretrained(repo_id, low_cpu_mem_usage=True, **kwargs)
+        pipeline.save_pretrained(path, safe_serialization=True)
+        del pipeline
+
+    if load_local is None:
+        def load_local(path):
+            return pipeline_cls.from_pretrained(path, **MMAP_KWARGS, **kwargs)
+
+    if load_remote is None:
+        def load_remote():
+            return pipeline_cls.from_pretrained(repo_id, **kwargs)
+
+    return load(name, populate, load_local, load_remote, source=repo_id)
+
+
+def load_musicgen(name, repo_id, seed_dir=None, **kwargs):
+    """Laad een audiocraft MusicGen checkpoint uit de store.
+
+    `seed_dir` is een eventuele lokale kopie (bv. in het image gebakken)
+    die bij een lege store in plaats van de hub gebruikt wordt.
+    """
+    from audiocraft.models import MusicGen
+
+    def populate(path):
+        for filename in MUSICGEN_FILES:
+            target = os.path.join(path, filename)
+            seed = os.path.join(seed_dir, filename) if seed_dir else None
+            if seed and os.path.isfile(seed):
+                shutil.copyfile(seed, target)
+                continue
+            from huggingface_hub import hf_hub_download
+            # Direct in de tijdelijke map downloaden: geen tweede kopie in de hub-cache
+            downloaded = hf_hub_download(repo_id=repo_id, filename=filename, cache_dir=os.path.join(path, ".hub"))
+            shutil.move(os.path.realpath(downloaded), target)
+        shutil.rmtree(os.path.join(path, ".hub"), ignore_errors=True)
+
+    def load_local(path):
+        with mmap_torch_load():
+            return MusicGen.get_pretrained(path, **kwargs)
+
+    return load(name, populate, load_local, lambda: MusicGen.get_pretrained(repo_id, **kwargs), source=repo_id)
+
+
+def attach_cache(name, cache_dir):
+    """Laat de download-cache van een library in de store landen via een symlink.
+
+    Voor libraries die hun checkpoints zelf ophalen (bark, jukebox). Na de
+    eerste geslaagde load legt `seal()` de checksums vast; een latere
+    afwijking gooit de cache weg zodat de library opnieuw downloadt.
+    """
+    if not enabled():
+        return None
+    path = entry_path(name)
+    with _exclusive(name):
+        if _has_manifest(path) and not verify(name):
+            discard(name)
+        os.makedirs(path, exist_ok=True)
+    if os.path.islink(cache_dir):
+        if os.path.realpath(cache_dir) == os.path.realpath(path):
+            return path
+        os.unlink(cache_dir)
+    elif os.path.isdir(cache_dir):
+        # Eerder gedownloade bestanden meenemen in de store
+        for entry in os.listdir(cache_dir):
+            if not os.path.exists(os.path.join(path, entry)):
+                shutil.move(os.path.join(cache_dir, entry), os.path.join(path, entry))
+        shutil.rmtree(cache_dir)
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    os.symlink(path, cache_dir)
+    return path
+
+
+def seal(name, source=None):
+    """Leg de checksums van een via `attach_cache` gevulde entry vast."""
+    path = entry_path(name)
+    if not enabled() or not os.path.isdir(path) or _has_manifest(path):
+        return
+    with _exclusive(name):
+        if not _has_manifest(path):
+            _verified[name] = _write_manifest(path, source)
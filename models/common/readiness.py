@@ -0,0 +1,184 @@
+"""Laad- en warmup-status van een model service.
+
+Alle loads lopen via `load()`, zodat een /load request tijdens een
+achtergrond-preload op dezelfde load wacht in plaats van het model een
+tweede keer te laden. Na het laden draait een optionele korte warmup
+generatie, zodat het eerste echte request geen eenmalige
+initialisatiekosten meer betaalt.
+
+Preload bij het starten van de container wordt bepaald door PRELOAD:
+"1" altijd, "0" nooit, "auto" (standaard) alleen als MODEL_NAME gelijk is
+aan models.default_model in config.yml.
+
+De koude start wordt per fase gemeten: "http" (processtart tot de
+HTTP-laag luistert), "imports" (uitgestelde import van app_impl, zie
+common.lazy), "load" (gewichten laden) en "warmup". De tijden staan in
+/readyz, in `model_startup_phase_seconds` en in één logregel zodra het
+model voor het eerst klaar is. Het geheugen dat laden en warmup samen
+innemen wordt de footprint van het model (zie common.memory).
+"""
+import os
+import threading
+import time
+
+from common import config, memory, metrics
+
+STATE_IDLE = "idle"
+STATE_LOADING = "loading"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+PRELOAD = os.environ.get("PRELOAD", "auto").lower()
+MODEL_NAME = os.environ.get("MODEL_NAME", "")
+# Lengte van de warmup generatie in seconden audio
+WARMUP_DURATION = float(os.environ.get("WARMUP_DURATION", "1"))
+
+WARMUP_SECONDS = metrics.Histogram("model_warmup_seconds", "Duur van de warmup generatie na het laden", ("status",))
+STARTUP_PHASE_SECONDS = metrics.Gauge(
+    "model_startup_phase_seconds", "Duur van de fasen van de koude start", ("phase",),
+)
+
+
+def _process_start_time():
+    """Starttijd van het proces (epoch), zodat ook de interpreter-opstart meetelt."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Veld 22 is de starttijd in clock ticks na het booten; de naam (veld 2) kan spaties bevatten
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_START = _process_start_time()
+
+_state = {
+    "state": STATE_IDLE, "error": None, "loadSeconds": None, "warmupSeconds": None,
+    "readySince": None, "phases": {},
+}
+_state_lock = threading.Lock()
+# Serialiseert loads: een tweede load wacht tot de eerste klaar is
+_load_lock = threading.Lock()
+
+
+def _set(**fields):
+    with _state_lock:
+        _state.update(fields)
+
+
+def status():
+    with _state_lock:
+        return dict(_state, phases=dict(_state["phases"]))
+
+
+def record_phase(phase, seconds):
+    """Leg de duur van een startup-fase vast (de laatste meting telt)."""
+    STARTUP_PHASE_SECONDS.set(seconds, phase=phase)
+    with _state_lock:
+        _state["phases"][phase] = seconds
+
+
+def mark_serving():
+    """Aanroepen vlak voor app.run(): de HTTP-laag is vanaf nu bereikbaar."""
+    seconds = time.time() - PROCESS_START
+    record_phase("http", seconds)
+    print(f"HTTP-laag klaar na {seconds:.2f}s")
+
+
+def _startup_report():
+    phases = status()["phases"]
+    order = ["http", "imports", "load", "warmup"]
+    parts = [f"{name} {phases[name]:.2f}s" for name in order if name in phases]
+    return ", ".join(parts)
+
+
+def is_ready():
+    with _state_lock:
+        return _state["state"] == STATE_READY
+
+
+def load(load_fn, warmup_fn=None):
+    """Laad het model (en warm het op) tenzij dat al gebeurd is."""
+    with _load_lock:
+        if is_ready():
+            return True
+        _set(state=STATE_LOADING, error=None)
+        first_ready = _state["readySince"] is None and "load" not in _state["phases"]
+        start = time.perf_counter()
+        try:
+            prepare = getattr(load_fn, "prepare", None)
+            if prepare is not None:
+                # Uitgestelde imports apart meten (fase "imports")
+                prepare()
+                start = time.perf_counter()
+            # Na de imports, zodat torch (en dus CUDA) al meetelt
+            baseline = memory.process_bytes()
+            ok = load_fn()
+        except Exception as e:
+            ok = False
+            _set(error=str(e))
+        load_seconds = time.perf_counter() - start
+        metrics.LOAD_SECONDS.observe(load_seconds, status="ok" if ok else "error")
+        if not ok:
+            _set(state=STATE_FAILED, loadSeconds=load_seconds)
+            return False
+        _set(loadSeconds=load_seconds)
+        record_phase("load", load_seconds)
+
+        if warmup_fn is not None:
+            _set(state=STATE_WARMING)
+            start = time.perf_counter()
+            try:
+                warmup_fn()
+                warmup_status = "ok"
+            except Exception as e:
+                # Een mislukte warmup maakt het model niet onbruikbaar
+                print(f"Warmup gefaald: {e}")
+                warmup_status = "error"
+            warmup_seconds = time.perf_counter() - start
+            WARMUP_SECONDS.observe(warmup_seconds, status=warmup_status)
+            _set(warmupSeconds=warmup_seconds)
+            record_phase("warmup", warmup_seconds)
+        memory.record_footprint(memory.process_bytes() - baseline)
+        _set(state=STATE_READY, readySince=time.time())
+        print(f"Model klaar (laden {load_seconds:.1f}s, warmup {_state['warmupSeconds'] or 0:.1f}s)")
+        if first_ready:
+            record_phase("total", time.time() - PROCESS_START)
+            print(f"Startup: {_startup_report()}, totaal {_state['phases']['total']:.2f}s sinds processtart")
+        return True
+
+
+def unload(unload_fn):
+    """Ontlaad het model; wacht eerst op een eventueel lopende load."""
+    with _load_lock:
+        ok = unload_fn()
+        if ok:
+            _set(state=STATE_IDLE, readySince=None)
+        return ok
+
+
+def _default_model():
+    return config.get_setting("models.default_model")
+
+
+def should_preload(name=None):
+    """Moet `name` (standaard MODEL_NAME) bij het starten geladen worden?"""
+    name = name or MODEL_NAME
+    if PRELOAD in ("1", "true", "yes"):
+        return True
+    if PRELOAD in ("0", "false", "no"):
+        return False
+    return bool(name) and name == _default_model()
+
+
+def start_preload(load_fn, warmup_fn=None):
+    """Start de preload op de achtergrond als dat voor deze service aan staat."""
+    if not should_preload():
+        return None
+    print(f"Preload van {MODEL_NAME or 'model'} gestart")
+    t = threading.Thread(target=load, args=(load_fn, warmup_fn), name="model-preload", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,108 @@
+"""Routes die elke model service gemeen heeft.
+
+Registreer in app.py met `app.register_blueprint(service_bp)`. Naast de
+routes hieronder meet de blueprint ook de duur van elk load/generate/
+extend/remix request voor /metrics. /healthz zegt alleen dat het proces
+leeft; /readyz geeft 200 zodra het model geladen en opgewarmd is;
+/memory geeft het geheugengebruik en de gemeten footprint van het model
+voor de memory governor van de gateway (zie common.memory). Een
+volle inference-wachtrij (zie common.executor) wordt een 429 met
+Retry-After en de positie die het request gekregen zou hebben.
+"""
+import time
+
+from flask import Blueprint, Response, g, jsonify, request
+
+from common import memory, metrics, readiness
+from common.encoder import encode_status
+from common.executor import ExecutorBusy
+
+service_bp = Blueprint("service", __name__)
+
+
+def _operation(path):
+    # De services gebruiken verschillende paden (/extend, /generate/extend, ...)
+    path = path.rstrip("/")
+    if path.endswith("/unload"):
+        return "unload"
+    if path.endswith("/load"):
+        return "load"
+    for operation in ("extend", "remix", "generate"):
+        if operation in path:
+            return operation
+    return None
+
+
+@service_bp.before_app_request
+def _start_timer():
+    operation = _operation(request.path)
+    if operation is None:
+        return
+    g.metrics_operation = operation
+    g.metrics_start = time.perf_counter()
+    metrics.INFLIGHT.inc()
+    metrics.begin_request()
+
+
+@service_bp.after_app_request
+def _record_request(response):
+    operation = g.pop("metrics_operation", None)
+    if operation is None:
+        return response
+    elapsed = time.perf_counter() - g.pop("metrics_start")
+    metrics.INFLIGHT.dec()
+    status = "ok" if response.status_code < 400 else "error"
+    metrics.end_request(operation, status, elapsed)
+    return response
+
+
+@service_bp.teardown_app_request
+def _record_exception(exc):
+    # Alleen bij een onafgehandelde exceptie staat de operatie hier nog
+    operation = g.pop("metrics_operation", None)
+    if operation is None:
+        return
+    elapsed = time.perf_counter() - g.pop("metrics_start")
+    metrics.INFLIGHT.dec()
+    metrics.end_request(operation, "error", elapsed)
+
+
+@service_bp.app_errorhandler(ExecutorBusy)
+def _executor_busy(e):
+    response = jsonify(
+        success=False, error=str(e), queuePosition=e.position, maxQueue=e.max_queue, retryAfter=e.retry_after,
+    )
+    response.status_code = 429
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+@service_bp.route("/healthz", methods=["GET"])
+def healthz_route():
+    return jsonify(success=True, status="ok")
+
+
+@service_bp.route("/readyz", methods=["GET"])
+def readyz_route():
+    status = readiness.status()
+    code = 200 if status["state"] == readiness.STATE_READY else 503
+    return jsonify(success=code == 200, **status), code
+
+
+@service_bp.route("/memory", methods=["GET"])
+def memory_route():
+    loaded = memory.loaded_check() if memory.loaded_check is not None else readiness.is_ready()
+    return jsonify(memory.report(loaded))
+
+
+@service_bp.route("/metrics", methods=["GET"])
+def metrics_route():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@service_bp.route("/encodes/<path:name>", methods=["GET"])
+def encode_status_route(name):
+    status = encode_status(name)
+    if status is None:
+        return jsonify(success=False, error="Unknown encode"), 404
+    return jsonify(success=True, name=name, **status)
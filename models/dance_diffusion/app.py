@@ -2,32 +2,42 @@ import os
 import gc
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from common import executor, readiness
+from common.lazy import lazy_import
+from common.service import service_bp
 
-from app_impl import (
-    load_model_impl,
-    unload_model_impl,
-    generate_impl,
-    extend_impl,
-    remix_impl,
+load_model_impl, unload_model_impl, warmup_impl, generate_impl, extend_impl, remix_impl = lazy_import(
+    "app_impl",
+    "load_model_impl",
+    "unload_model_impl",
+    "warmup_impl",
+    "generate_impl",
+    "extend_impl",
+    "remix_impl",
 )
 
+# Al het model-werk loopt via één inference-thread; load/unload sluiten achteraan aan
+generate_impl, extend_impl, remix_impl = executor.bind(generate_impl, extend_impl, remix_impl)
+load_model_impl, unload_model_impl, warmup_impl = executor.bind(load_model_impl, unload_model_impl, warmup_impl, control=True)
+
 OUTPUT_FOLDER = "/app/output"
 if not os.path.isdir(OUTPUT_FOLDER):
     os.makedirs(OUTPUT_FOLDER)
 
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(service_bp)
 
 @app.route('/load', methods=['POST'])
 def load_route():
-    success = load_model_impl()
+    success = readiness.load(load_model_impl, warmup_impl)
     if success:
         return jsonify(success=True, message='DanceDiffusion model loaded')
     return jsonify(success=False, error='Failed to load model'), 500
 
 @app.route('/unload', methods=['POST'])
 def unload_route():
-    success = unload_model_impl()
+    success = readiness.unload(unload_model_impl)
     if success:
         return jsonify(success=True, message='DanceDiffusion model unloaded')
     return jsonify(success=False, error='Failed to unload model'), 500
@@ -41,7 +51,7 @@ def generate_route():
         return jsonify(success=False, error='outputPath required'), 400
     duration = generate_impl(output)
     if duration > 0:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Generation failed'), 500
 
 @app.route('/generate/extend', methods=['POST'])
@@ -54,7 +64,7 @@ def extend_route():
         return jsonify(success=False, error='sourcePath and outputPath required'), 400
     duration = extend_impl(source, output, extend_duration)
     if duration > 0:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Extension failed'), 500
 
 @app.route('/generate/remix', methods=['POST'])
@@ -66,8 +76,10 @@ def remix_route():
         return jsonify(success=False, error='sourcePath and outputPath required'), 400
     duration = remix_impl(source, output)
     if duration > 0:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Remix failed'), 500
 
 if __name__ == '__main__':
+    readiness.start_preload(load_model_impl, warmup_impl)
+    readiness.mark_serving()
     app.run(host='0.0.0.0', port=5000)
@@ -1,11 +1,11 @@
 import os
 import gc
 import torch
-import numpy as np
-import soundfile as sf
-import librosa
 from diffusers import DanceDiffusionPipeline
-from pydub import AudioSegment
+from common import extend
+from common import model_store
+from common.audio_sink import write_audio
+from common.readiness import WARMUP_DURATION
 
 # Global pipeline instance
 model = None
@@ -21,7 +21,9 @@ def load_model_impl():
         return True
     try:
         print('Loading DanceDiffusion pipeline...')
-        model = DanceDiffusionPipeline.from_pretrained(
+        model = model_store.load_diffusers(
+            'dance-diffusion-unlocked-250k',
+            DanceDiffusionPipeline,
             'harmonai/unlocked-250k',
             torch_dtype=torch.float16,
         ).to(device)
@@ -47,6 +49,12 @@ def unload_model_impl():
         print(f'Error unloading pipeline: {e}')
         return False
 
+def warmup_impl():
+    """Korte synthetische generatie zodat de eerste echte request niet de
+    eenmalige initialisatiekosten betaalt."""
+    model(num_inference_steps=2, audio_length_in_s=WARMUP_DURATION)
+
+
 def generate_impl(output_path: str) -> float:
     """Generate a new track."""
     global model
@@ -57,9 +65,8 @@ def generate_impl(output_path: str) -> float:
         result = model(audio_length_in_s=30.0)
         audio = result.audios[0].cpu().numpy()
         sr = model.unet.sample_rate
-        sf.write(output_path, audio, samplerate=sr)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=audio, sr=sr)
+        saved = write_audio(audio, sr, output_path)
+        duration = saved["duration"]
         print(f'Saved {output_path}, duration={duration:.2f}s')
         return duration
     except Exception as e:
@@ -73,13 +80,10 @@ def extend_impl(source_path: str, output_path: str, extend_duration: float) -> f
         if not load_model_impl():
             return 0.0
     try:
-        original, sr = librosa.load(source_path, sr=model.unet.sample_rate)
         result = model(audio_length_in_s=extend_duration)
         extension = result.audios[0].cpu().numpy()
-        combined = np.concatenate([original, extension])
-        sf.write(output_path, combined, samplerate=sr)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=combined, sr=sr)
+        saved = extend.append(source_path, extension, model.unet.sample_rate, output_path)
+        duration = saved["duration"]
         print(f'Extended saved to {output_path}, duration={duration:.2f}s')
         return duration
     except Exception as e:
@@ -90,13 +94,3 @@ def remix_impl(source_path: str, output_path: str) -> float:
     """Remix by generating a fresh sample (unconditional)."""
     # Since DanceDiffusion is unconditional, remix == generate
     return generate_impl(output_path)
-
-def convert_to_mp3(wav_path, mp3_path):
-    """Converteer WAV-bestand naar MP3."""
-    try:
-        sound = AudioSegment.from_wav(wav_path)
-        sound.export(mp3_path, format="mp3")
-        print(f"Converted {wav_path} to {mp3_path}")
-    except Exception as e:
-        print(f"❌ Fout bij conversie naar mp3: {e}")
-
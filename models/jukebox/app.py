@@ -1,19 +1,27 @@
 import os
 import gc
-import torch
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from common import executor, readiness
+from common.lazy import lazy_import
+from common.service import service_bp
 
-from app_impl import (
-    load_model_impl,
-    unload_model_impl,
-    generate_impl,
-    extend_impl,
-    remix_impl,
+load_model_impl, unload_model_impl, generate_impl, extend_impl, remix_impl = lazy_import(
+    "app_impl",
+    "load_model_impl",
+    "unload_model_impl",
+    "generate_impl",
+    "extend_impl",
+    "remix_impl",
 )
 
+# Al het model-werk loopt via één inference-thread; load/unload sluiten achteraan aan
+generate_impl, extend_impl, remix_impl = executor.bind(generate_impl, extend_impl, remix_impl)
+load_model_impl, unload_model_impl = executor.bind(load_model_impl, unload_model_impl, control=True)
+
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(service_bp)
 
 OUTPUT_FOLDER = '/app/output'
 if not os.path.isdir(OUTPUT_FOLDER):
@@ -21,13 +29,14 @@ if not os.path.isdir(OUTPUT_FOLDER):
 
 @app.route('/load', methods=['POST'])
 def load_route():
-    if load_model_impl():
+    # Geen warmup: één Jukebox-window samplen duurt al minuten
+    if readiness.load(load_model_impl):
         return jsonify(success=True, message='Jukebox model loaded')
     return jsonify(success=False, error='Failed to load Jukebox model'), 500
 
 @app.route('/unload', methods=['POST'])
 def unload_route():
-    if unload_model_impl():
+    if readiness.unload(unload_model_impl):
         return jsonify(success=True, message='Jukebox model unloaded')
     return jsonify(success=False, error='Failed to unload Jukebox model'), 500
 
@@ -42,7 +51,7 @@ def generate_route():
         return jsonify(success=False, error='outputPath required'), 400
     ok, duration = generate_impl(content, style, vocals, output)
     if ok:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Generation failed'), 500
 
 @app.route('/generate/extend', methods=['POST'])
@@ -58,7 +67,7 @@ def extend_route():
         return jsonify(success=False, error='sourceTrackPath and outputPath required'), 400
     ok, duration = extend_impl(source, output, dur, content, style, vocals)
     if ok:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Extension failed'), 500
 
 @app.route('/generate/remix', methods=['POST'])
@@ -73,8 +82,10 @@ def remix_route():
         return jsonify(success=False, error='sourceTrackPath and outputPath required'), 400
     ok, duration = remix_impl(source, output, content, style, vocals)
     if ok:
-        return jsonify(success=True, duration=duration, outputPath=output_path)
+        return jsonify(success=True, duration=duration, outputPath=output)
     return jsonify(success=False, error='Remix failed'), 500
 
 if __name__ == '__main__':
+    readiness.start_preload(load_model_impl)
+    readiness.mark_serving()
     app.run(host='0.0.0.0', port=5000)
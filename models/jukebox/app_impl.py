@@ -2,15 +2,15 @@ import os
 import gc
 import torch
 import numpy as np
-import soundfile as sf
-import librosa
 
 # Jukebox imports
 import jukebox
 from jukebox.make_models import make_model
 from jukebox.hparams import Hyperparams
 from jukebox.sample import sample_single_window
-from pydub import AudioSegment
+from common import extend
+from common import model_store
+from common.audio_sink import write_audio
 
 # Global handles
 model = None
@@ -19,6 +19,8 @@ vqvae = None
 hps = None
 
 SAMPLE_RATE = 44100
+# Jukebox downloadt zijn checkpoints zelf naar ~/.cache/jukebox
+JUKEBOX_CACHE = os.path.expanduser('~/.cache/jukebox')
 OUTPUT_FOLDER = '/app/output'
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
@@ -35,7 +37,10 @@ def load_model_impl():
         hps.name = 'samples'
         hps.levels = 3
         hps.hop_fraction = [0.5, 0.5, 0.125]
-        vqvae, priors = make_model(hps, device='cuda' if torch.cuda.is_available() else 'cpu')
+        model_store.attach_cache('jukebox', JUKEBOX_CACHE)
+        with model_store.mmap_torch_load():
+            vqvae, priors = make_model(hps, device='cuda' if torch.cuda.is_available() else 'cpu')
+        model_store.seal('jukebox', source='openaipublic.azureedge.net/jukebox')
         prior = priors[2]
         model = {'vqvae': vqvae, 'prior': prior}
         print('Jukebox model loaded.')
@@ -60,66 +65,61 @@ def unload_model_impl():
         print(f'Error unloading Jukebox: {e}')
         return False
 
+def _sample(content_prompt, style_prompt, has_vocals):
+    """Sample ~30s audio met Jukebox en geef de ruwe array terug."""
+    metas = [{
+        'artist': 'AI',
+        'genre': style_prompt or 'unknown',
+        'total_length': 30,
+        'offset': 0,
+        'lyrics': content_prompt if has_vocals else ''
+    }]
+    zs = [torch.zeros(1, 0, dtype=torch.long) for _ in range(hps.levels)]
+    codes = sample_single_window(
+        zs=zs,
+        conditioning={},
+        chunk_size=32,
+        sampling_kwargs={
+            'temp': 0.7,
+            'fp16': True,
+            'top_k': 200,
+            'top_p': 0.95
+        },
+        hps=hps,
+        metas=metas,
+        priors=[prior],
+        vqvae=vqvae,
+        sample_tokens=hps.sr * 30 // int(hps.hop_fraction[-1] * hps.sr),
+        device='cuda' if torch.cuda.is_available() else 'cpu'
+    )
+    with torch.no_grad():
+        audio = vqvae.decode(codes, sample_rate=hps.sr)
+    return audio.squeeze().cpu().numpy()
+
 def generate_impl(content_prompt, style_prompt, has_vocals, output_path):
     """Generate ~30s of music with Jukebox."""
     global model, prior, vqvae, hps
     if model is None and not load_model_impl():
         return False, 0.0
     try:
-        metas = [{
-            'artist': 'AI',
-            'genre': style_prompt or 'unknown',
-            'total_length': 30,
-            'offset': 0,
-            'lyrics': content_prompt if has_vocals else ''
-        }]
-        zs = [torch.zeros(1, 0, dtype=torch.long) for _ in range(hps.levels)]
-        codes = sample_single_window(
-            zs=zs,
-            conditioning={},
-            chunk_size=32,
-            sampling_kwargs={
-                'temp': 0.7,
-                'fp16': True,
-                'top_k': 200,
-                'top_p': 0.95
-            },
-            hps=hps,
-            metas=metas,
-            priors=[prior],
-            vqvae=vqvae,
-            sample_tokens=hps.sr * 30 // int(hps.hop_fraction[-1] * hps.sr),
-            device='cuda' if torch.cuda.is_available() else 'cpu'
-        )
-        with torch.no_grad():
-            audio = vqvae.decode(codes, sample_rate=hps.sr)
-        audio_np = audio.squeeze().cpu().numpy()
-        audio_np = audio_np / np.abs(audio_np).max()
-        sf.write(output_path, audio_np, samplerate=SAMPLE_RATE)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=audio_np, sr=SAMPLE_RATE)
+        audio_np = _sample(content_prompt, style_prompt, has_vocals)
+        saved = write_audio(audio_np, SAMPLE_RATE, output_path, normalize=True)
+        duration = saved["duration"]
         return True, duration
     except Exception as e:
         print(f'Error generating with Jukebox: {e}')
         return False, 0.0
 
 def extend_impl(source_path, output_path, extend_duration, content_prompt, style_prompt, has_vocals):
-    """Extend by crossfading new segment onto existing audio."""
-    ok, _ = generate_impl(content_prompt + ' continue', style_prompt, has_vocals, output_path + '.new.wav')
-    if not ok:
+    """Extend by crossfading a new segment onto the existing audio (common/extend.py)."""
+    global model
+    if model is None and not load_model_impl():
         return False, 0.0
     try:
-        orig, _ = librosa.load(source_path, sr=SAMPLE_RATE)
-        new, _ = librosa.load(output_path + '.new.wav', sr=SAMPLE_RATE)
-        fade = min(len(orig), len(new), SAMPLE_RATE)
-        fade_out = np.linspace(1, 0, fade)
-        fade_in = np.linspace(0, 1, fade)
-        mix = orig[-fade:] * fade_out + new[:fade] * fade_in
-        combined = np.concatenate([orig[:-fade], mix, new[fade:]])
-        sf.write(output_path, combined, samplerate=SAMPLE_RATE)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        os.remove(output_path + '.new.wav')
-        duration = librosa.get_duration(y=combined, sr=SAMPLE_RATE)
+        new = _sample(content_prompt + ' continue', style_prompt, has_vocals)
+        new = new / np.abs(new).max()
+        saved = extend.append(source_path, new, SAMPLE_RATE, output_path)
+        duration = saved["duration"]
         return True, duration
     except Exception as e:
         print(f'Error extending audio with Jukebox: {e}')
@@ -128,12 +128,3 @@ def extend_impl(source_path, output_path, extend_duration, content_prompt, style
 def remix_impl(source_path, output_path, content_prompt, style_prompt, has_vocals):
     """Remix by re-generating full audio based on prompt."""
     return generate_impl(f"Remix of: {content_prompt}", style_prompt, has_vocals, output_path)
-
-def convert_to_mp3(wav_path, mp3_path):
-    try:
-        sound = AudioSegment.from_wav(wav_path)
-        sound.export(mp3_path, format="mp3")
-        print(f"Converted {wav_path} to {mp3_path}")
-    except Exception as e:
-        print(f"❌ Fout bij conversie naar mp3: {e}")
-
@@ -1,110 +1,240 @@
 import os
-import gc
-from flask import Flask, request, jsonify
+import threading
+import time
+from flask import Blueprint, Flask, request, jsonify
 from flask_cors import CORS
-import torch
-
-# Import model-specific load and generate implementations
-from app_impl import load_model_impl, generate_impl, remix_impl, extend_impl
+from common import memory, metrics, readiness
+from common.executor import ExecutorBusy
+from common.lazy import is_imported, lazy_import
+from common.service import service_bp
+import params as generation_params
+from personas import PERSONAS, ROOT_PERSONA
+
+# De gedeelde engine (torch, audiocraft) wordt pas bij de eerste load geïmporteerd (zie common.lazy)
+acquire, release, holds, warmup, engine_status, generate_impl, extend_impl = lazy_import(
+    "app_impl",
+    "acquire",
+    "release",
+    "holds",
+    "warmup",
+    "status",
+    "generate_impl",
+    "extend_impl",
+)
 
 OUTPUT_FOLDER = "/app/output"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-model = None
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(service_bp)
+
+
+# Moest het checkpoint bij de laatste root-load echt geladen worden?
+_root_loaded_now = False
+
+
+def load_model_impl():
+    """Load van de root-persona; loopt via readiness (preload, /readyz, startup-fasen)."""
+    global _root_loaded_now
+    _root_loaded_now = acquire(ROOT_PERSONA)
+    return True
+
+
+def warmup_impl():
+    # Een checkpoint dat een andere persona al geladen had is al opgewarmd
+    if _root_loaded_now:
+        warmup(ROOT_PERSONA)
 
-@app.route("/generate", methods=["POST"])
-def generate_route():
-    data = request.json
-    prompt = data.get("prompt", "")
-    output_path = data.get("outputPath")
-    if not output_path:
-        return jsonify(success=False, error="outputPath required"), 400
-    duration = generate_impl(prompt, output_path)
-    return jsonify(success=True, duration=duration, outputPath=output_path)
-
-
-@app.route("/load", methods=["POST"])
-def load_route():
-    global model
-    success = load_model_impl()
-    if success:
-        return jsonify(success=True, message="Model loaded successfully")
-    else:
-        return jsonify(success=False, error="Failed to load model"), 500
-
-
-@app.route("/unload", methods=["POST"])
-def unload_route():
-    """Een vereenvoudigde unload functie die niet afhankelijk is van app_impl."""
+
+def unload_model_impl():
+    return release(ROOT_PERSONA)
+
+
+# Zo meet readiness de import van de engine als aparte fase
+load_model_impl.prepare = acquire.prepare
+
+
+def load_persona(name):
+    """Laad een persona; de root-persona gaat via readiness."""
+    if name == ROOT_PERSONA:
+        return readiness.load(load_model_impl, warmup_impl)
+    acquire.prepare()
+    baseline = memory.process_bytes()
+    start = time.perf_counter()
     try:
-        # Probeer globale variabelen op te ruimen
-        global model
-        model = None
-        
-        # Ruim torch geheugen op
-        import gc
-        gc.collect()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-            
-        print("Unload routine completed")
-        return jsonify(success=True, message="Model unloaded successfully")
+        loaded_now = acquire(name)
     except Exception as e:
-        print(f"Error in unload route: {str(e)}")
-        return jsonify(success=False, error=f"Error: {str(e)}"), 500
-
-
-@app.route("/remix", methods=["POST"])
-def remix_route():
-    data = request.json
-    content_prompt = data.get("contentPrompt", "")
-    style_prompt = data.get("stylePrompt", "")
-    has_vocals = data.get("hasVocals", True)
-    output_path = data.get("outputPath")
-    source_track_path = data.get("sourceTrackPath")
-
-    if not output_path:
-        return jsonify({'success': False, 'error': 'Output path is required'}), 400
-
-    success, duration = remix_impl(source_track_path, output_path, content_prompt, style_prompt, has_vocals)
-
-    if success:
-        return jsonify({
-            'success': True,
-            'message': 'Remix generated successfully',
-            'duration': duration
-        })
-    else:
-        return jsonify({'success': False, 'error': 'Failed to generate remix'}), 500
-
-
-@app.route("/extend", methods=["POST"])
-def extend_route():
-    data = request.json
-    source_track_path = data.get("sourceTrackPath")
-    output_path = data.get("outputPath")
-    extend_duration = data.get("extendDuration", 30)
-    content_prompt = data.get("contentPrompt", "")
-    style_prompt = data.get("stylePrompt", "")
-    has_vocals = data.get("hasVocals", True)
-
-    if not source_track_path or not output_path:
-        return jsonify({'success': False, 'error': 'Source track path and output path are required'}), 400
-
-    success, duration = extend_impl(source_track_path, output_path, extend_duration, content_prompt, style_prompt, has_vocals)
-
-    if success:
-        return jsonify({
-            'success': True,
-            'message': 'Track extended successfully',
-            'duration': duration
-        })
-    else:
-        return jsonify({'success': False, 'error': 'Failed to extend track'}), 500
+        print(f"Error loading persona {name}: {e}")
+        metrics.LOAD_SECONDS.observe(time.perf_counter() - start, status="error")
+        return False
+    if loaded_now:
+        # Alleen meten en opwarmen als het checkpoint echt geladen moest worden
+        metrics.LOAD_SECONDS.observe(time.perf_counter() - start, status="ok")
+        start = time.perf_counter()
+        try:
+            warmup(name)
+            readiness.WARMUP_SECONDS.observe(time.perf_counter() - start, status="ok")
+        except Exception as e:
+            print(f"Warmup gefaald: {e}")
+            readiness.WARMUP_SECONDS.observe(time.perf_counter() - start, status="error")
+        # Eén checkpoint extra; de gateway rekent per service met de laatst gemeten footprint
+        memory.record_footprint(memory.process_bytes() - baseline)
+    return True
+
+
+def unload_persona(name):
+    if name == ROOT_PERSONA:
+        return readiness.unload(unload_model_impl)
+    return release(name)
+
+
+def persona_ready(name):
+    if name == ROOT_PERSONA:
+        return readiness.is_ready()
+    # /readyz mag de engine niet importeren; zolang dat niet gebeurd is, is er niets geladen
+    return is_imported("app_impl") and holds(name)
+
+
+def checkpoint_loaded(name=None):
+    """Staat het checkpoint van persona `name` (zonder naam: een checkpoint) in het geheugen?"""
+    if not is_imported("app_impl"):
+        return False
+    checkpoints = engine_status()
+    if name is None:
+        return any(c["loaded"] for c in checkpoints.values())
+    return checkpoints[PERSONAS[name].checkpoint]["loaded"]
+
+
+# /memory van de service meldt of de engine iets geladen heeft, niet alleen de root-persona
+memory.set_loaded_check(checkpoint_loaded)
+
+
+def persona_blueprint(persona, blueprint_name, readyz=True):
+    """Routes van één persona; dezelfde paden als de oorspronkelijke services."""
+    bp = Blueprint(blueprint_name, __name__)
+
+    @bp.route("/load", methods=["POST"])
+    def load_route():
+        if load_persona(persona.name):
+            return jsonify(success=True, message=f"{persona.name} loaded successfully")
+        return jsonify(success=False, error=f"Failed to load {persona.name}"), 500
+
+    @bp.route("/unload", methods=["POST"])
+    def unload_route():
+        if unload_persona(persona.name):
+            return jsonify(success=True, message=f"{persona.name} unloaded successfully")
+        return jsonify(success=False, error=f"Failed to unload {persona.name}"), 500
+
+    if readyz:
+        @bp.route("/readyz", methods=["GET"])
+        def readyz_route():
+            if persona_ready(persona.name):
+                return jsonify(status="ready", persona=persona.name, checkpoint=persona.checkpoint)
+            return jsonify(status="idle", persona=persona.name, checkpoint=persona.checkpoint), 503
+
+        @bp.route("/memory", methods=["GET"])
+        def memory_route():
+            # De gateway vraagt het geheugen per persona op; `loaded` zegt of
+            # een load van deze persona nog een checkpoint zou toevoegen
+            return jsonify(memory.report(checkpoint_loaded(persona.name)))
+
+    def _ensure_loaded():
+        return persona_ready(persona.name) or load_persona(persona.name)
+
+    @bp.route("/generate", methods=["POST"])
+    def generate_route():
+        data = request.json or {}
+        output_path = data.get("outputPath")
+        if not output_path:
+            return jsonify(success=False, error="outputPath required"), 400
+        try:
+            params = generation_params.from_request(data, duration=persona.duration)
+        except ValueError as e:
+            return jsonify(success=False, error=str(e)), 400
+        try:
+            if not _ensure_loaded():
+                return jsonify(success=False, error="Model not loaded"), 500
+            duration = generate_impl(persona.name, persona.generate_prompt(data), output_path, params)
+        except ExecutorBusy:
+            raise  # 429 via common.service
+        except Exception as e:
+            print(f"Error generating music: {e}")
+            return jsonify(success=False, error="Generation failed"), 500
+        return jsonify(success=True, message="Music generated successfully", duration=duration, outputPath=output_path)
+
+    @bp.route("/extend", methods=["POST"])
+    @bp.route("/generate/extend", methods=["POST"])
+    def extend_route():
+        data = request.json or {}
+        source_track_path = data.get("sourceTrackPath")
+        output_path = data.get("outputPath")
+        if not source_track_path or not output_path:
+            return jsonify(success=False, error="Source track path and output path are required"), 400
+        try:
+            params = generation_params.from_request(data, duration_field="extendDuration", duration=30)
+        except ValueError as e:
+            return jsonify(success=False, error=str(e)), 400
+        try:
+            if not _ensure_loaded():
+                return jsonify(success=False, error="Model not loaded"), 500
+            duration = extend_impl(persona.name, source_track_path, persona.extend_prompt(data), output_path, params)
+        except ExecutorBusy:
+            raise  # 429 via common.service
+        except Exception as e:
+            print(f"Error extending track: {e}")
+            return jsonify(success=False, error="Failed to extend track"), 500
+        return jsonify(success=True, message="Track extended successfully", duration=duration, outputPath=output_path)
+
+    @bp.route("/remix", methods=["POST"])
+    @bp.route("/generate/remix", methods=["POST"])
+    def remix_route():
+        data = request.json or {}
+        output_path = data.get("outputPath")
+        if not output_path:
+            return jsonify(success=False, error="Output path is required"), 400
+        try:
+            params = generation_params.from_request(data, duration=persona.duration)
+        except ValueError as e:
+            return jsonify(success=False, error=str(e)), 400
+        try:
+            if not _ensure_loaded():
+                return jsonify(success=False, error="Model not loaded"), 500
+            duration = generate_impl(persona.name, persona.remix_prompt(data), output_path, params)
+        except ExecutorBusy:
+            raise  # 429 via common.service
+        except Exception as e:
+            print(f"Error remixing track: {e}")
+            return jsonify(success=False, error="Failed to generate remix"), 500
+        return jsonify(success=True, message="Remix generated successfully", duration=duration, outputPath=output_path)
+
+    return bp
+
+
+# Elke persona onder /personas/<naam>; de paden zonder prefix zijn de root-persona (musicgen)
+for persona in PERSONAS.values():
+    app.register_blueprint(persona_blueprint(persona, f"persona_{persona.name}"), url_prefix=f"/personas/{persona.name}")
+app.register_blueprint(persona_blueprint(PERSONAS[ROOT_PERSONA], "root", readyz=False))
+
+
+@app.route("/personas", methods=["GET"])
+def personas_route():
+    checkpoints = engine_status() if is_imported("app_impl") else {}
+    return jsonify(
+        personas={
+            name: {"checkpoint": p.checkpoint, "duration": p.duration, "ready": persona_ready(name)}
+            for name, p in PERSONAS.items()
+        },
+        checkpoints=checkpoints,
+        defaults=generation_params.defaults(),
+    )
+
 
 if __name__ == "__main__":
+    readiness.start_preload(load_model_impl, warmup_impl)
+    # De andere persona's volgen dezelfde PRELOAD-regels met hun eigen naam
+    for persona in PERSONAS.values():
+        if persona.name != ROOT_PERSONA and readiness.should_preload(persona.name):
+            threading.Thread(target=load_persona, args=(persona.name,), name=f"preload-{persona.name}", daemon=True).start()
+    readiness.mark_serving()
     app.run(host="0.0.0.0", port=5000)
-
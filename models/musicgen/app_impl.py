@@ -1,245 +1,189 @@
-import os
+"""Gedeelde MusicGen engine voor alle persona's (zie personas.py).
+
+Per checkpoint (melody, small) staat er hoogstens één model in het
+geheugen, ongeacht hoeveel persona's het gebruiken. Een persona houdt
+zijn checkpoint vast met `acquire()` en laat het los met `release()`;
+het checkpoint wordt pas ontladen als geen enkele persona het nog
+vasthoudt. Alle generaties lopen via de batcher van het checkpoint, dus
+prompts van verschillende persona's worden samen gegenereerd. Laden en
+ontladen lopen over dezelfde batcher-thread, zodat een checkpoint nooit
+onder een lopende generatie vandaan wordt gehaald.
+
+Laden kan minuten duren en ontladen wacht op de lopende batch. Dat
+gebeurt daarom buiten `_lock`: het checkpoint wordt onder de lock als
+bezig gemarkeerd, en pas het resultaat wordt onder de lock gepubliceerd.
+`holds()` en `status()` (achter /readyz en /memory) wachten dus nooit op
+een load; een tweede acquire of release van hetzelfde checkpoint wacht
+wel tot de eerste klaar is.
+"""
 import gc
-import torch
-import numpy as np
-import soundfile as sf
-import librosa
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from audiocraft.models import MusicGen
-from pydub import AudioSegment
+import os
+import threading
 
-app = Flask(__name__)
-CORS(app)
+import torch
 
-model = None
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+from batcher import MicroBatcher
+from common import metrics
+from common import extend
+from common import model_store
+from common.audio_sink import write_audio
+from common.readiness import WARMUP_DURATION
+import params as generation_params
+from personas import PERSONAS
 
+SAMPLE_RATE = 32000
 OUTPUT_FOLDER = '/app/output'
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+# Checkpoint -> (naam in de model store, repo op de hub)
+CHECKPOINTS = {
+    "melody": ("musicgen-melody", "facebook/musicgen-melody"),
+    "small": ("musicgen-small", "facebook/musicgen-small"),
+}
+# Requests binnen dit venster (en met dezelfde duur) worden samen gegenereerd
+BATCH_WINDOW_MS = int(os.environ.get("BATCH_WINDOW_MS", "50"))
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+# Wachtende prompts per checkpoint voordat requests met 429 geweigerd worden
+BATCH_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_QUEUE", "32"))
 
-def load_model_impl():
-    """Laad het MusicGen model."""
-    global model
-    try:
-        if model is not None:
-            return True
-        print("Loading MusicGen model...")
-        model = MusicGen.get_pretrained('melody')
-        model.set_generation_params(duration=30)
-        print("MusicGen model loaded successfully.")
-        return True
-    except Exception as e:
-        print(f"Error loading MusicGen model: {e}")
-        return False
-
-
-def generate_impl(content_prompt, output_path):
-    """Genereer muziek met MusicGen."""
-    global model
-    try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-        
-        if model is None and not load_model_impl():
-            return 0
-            
-        print(f"Generating music with prompt: {content_prompt}")
-        
-        print("Generating audio with model...")
-        audio_output = model.generate([content_prompt])
-        print(f"Generated audio tensor shape: {audio_output.shape}")
-        
-        print("Converting to NumPy array...")
-        audio_numpy = audio_output.cpu().numpy()[0, 0]
-        print(f"NumPy array shape: {audio_numpy.shape}, dtype: {audio_numpy.dtype}")
-        
-        # Probeer verschillende manieren om het bestand op te slaan
-        print(f"Writing to WAV file: {full_output_path}")
-        try:
-            # Methode 1: soundfile
-            try:
-                sf.write(full_output_path, audio_numpy, samplerate=32000)
-                print("File written successfully using soundfile")
-            except Exception as sf_error:
-                print(f"Error with soundfile: {sf_error}")
-                
-                # Methode 2: scipy.io.wavfile als fallback
-                try:
-                    from scipy.io import wavfile
-                    wavfile.write(full_output_path, 32000, audio_numpy)
-                    print("File written successfully using scipy.io.wavfile")
-                except Exception as scipy_error:
-                    print(f"Error with scipy.io.wavfile: {scipy_error}")
-                    
-                    # Methode 3: directe schrijven als fallback
-                    try:
-                        # Converteer naar 16-bit integers als het samples zijn
-                        if audio_numpy.dtype == np.float32 or audio_numpy.dtype == np.float64:
-                            audio_numpy = (audio_numpy * 32767).astype(np.int16)
-                        
-                        with open(full_output_path, 'wb') as f:
-                            # Eenvoudige WAV header
-                            f.write(b'RIFF')
-                            f.write((36 + len(audio_numpy) * 2).to_bytes(4, 'little'))
-                            f.write(b'WAVE')
-                            f.write(b'fmt ')
-                            f.write((16).to_bytes(4, 'little'))
-                            f.write((1).to_bytes(2, 'little'))  # PCM
-                            f.write((1).to_bytes(2, 'little'))  # Mono
-                            f.write((32000).to_bytes(4, 'little'))  # Sample rate
-                            f.write((32000 * 2).to_bytes(4, 'little'))  # Byte rate
-                            f.write((2).to_bytes(2, 'little'))  # Block align
-                            f.write((16).to_bytes(2, 'little'))  # Bits per sample
-                            f.write(b'data')
-                            f.write((len(audio_numpy) * 2).to_bytes(4, 'little'))
-                            # Schrijf audio data
-                            f.write(audio_numpy.tobytes())
-                        print("File written successfully using manual writing")
-                    except Exception as manual_error:
-                        print(f"Error with manual writing: {manual_error}")
-        except Exception as write_error:
-            print(f"Error writing file: {write_error}")
-            import traceback
-            traceback.print_exc()
-        
-        # Controleer of het bestand is opgeslagen
-        if os.path.exists(full_output_path):
-            file_size = os.path.getsize(full_output_path)
-            print(f"Successfully saved file to {full_output_path}, size: {file_size} bytes")
-            
-            # Ook MP3 opslaan
-            mp3_path = full_output_path.replace(".wav", ".mp3")
-            try:
-                convert_to_mp3(full_output_path, mp3_path)
-                if os.path.exists(mp3_path):
-                    print(f"Successfully converted to MP3: {mp3_path}")
-                else:
-                    print(f"Failed to convert to MP3")
-            except Exception as mp3_error:
-                print(f"Error converting to MP3: {mp3_error}")
-        else:
-            print(f"Failed to save file to {full_output_path}")
-            
-        # Lijst alle bestanden in de output directory
-        print(f"Files in {OUTPUT_FOLDER}:")
-        try:
-            for file in os.listdir(OUTPUT_FOLDER):
-                print(f" - {file}")
-        except Exception as ls_error:
-            print(f"Error listing files: {ls_error}")
-            
-        duration = librosa.get_duration(y=audio_numpy, sr=32000)
-        return duration
-    except Exception as e:
-        print(f"Error generating music: {e}")
-        import traceback
-        traceback.print_exc()
-        return 0
-
-
-def remix_impl(source_track_path, output_path, content_prompt, style_prompt, has_vocals):
-    """Maak een remix van een track."""
-    global model
-    try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-        
-        if model is None and not load_model_impl():
-            return False, 0
-            
-        combined_prompt = f"Remix of: {content_prompt}"
-        if style_prompt:
-            combined_prompt += f" in the style of {style_prompt}"
-        if not has_vocals:
-            combined_prompt += ". Instrumental only, no vocals."
-            
-        print(f"Remixing track with prompt: {combined_prompt}")
-        audio_output = model.generate([combined_prompt])
-        audio_numpy = audio_output.cpu().numpy()[0, 0]
-        
-        sf.write(full_output_path, audio_numpy, samplerate=32000)
-        convert_to_mp3(full_output_path, full_output_path.replace(".wav", ".mp3"))
-        
-        duration = librosa.get_duration(y=audio_numpy, sr=32000)
-        return True, duration
-    except Exception as e:
-        print(f"Error remixing track: {e}")
-        return False, 0
-
-def unload_model_impl():
-    """Unload het model en maak geheugen vrij."""
-    global model
+# Geladen modellen per checkpoint en de persona's die ze vasthouden
+models = {}
+holders = {checkpoint: set() for checkpoint in CHECKPOINTS}
+# Checkpoints die nu geladen of ontladen worden: "loading" of "unloading"
+pending = {}
+_lock = threading.Condition()
+
+
+def _generate_batch(checkpoint, prompts, params):
+    """Genereer een batch prompts in één model.generate call.
+
+    Draait alleen op de batcher-thread van het checkpoint: de volledige
+    set parameters wordt voor elke batch opnieuw gezet, zodat niets van
+    een vorig request (bv. de duur van een extend) blijft hangen.
+    """
+    model = models.get(checkpoint)
+    if model is None:
+        raise RuntimeError(f"MusicGen {checkpoint} is niet geladen")
+    model.set_generation_params(**dict(params))
+    return model.generate(prompts).cpu().numpy()
+
+
+batchers = {
+    checkpoint: MicroBatcher(
+        lambda prompts, params, checkpoint=checkpoint: _generate_batch(checkpoint, prompts, params),
+        window=BATCH_WINDOW_MS / 1000,
+        max_batch=BATCH_MAX_SIZE,
+        name=f"musicgen-batcher-{checkpoint}",
+        max_pending=BATCH_MAX_PENDING,
+    )
+    for checkpoint in CHECKPOINTS
+}
+metrics.QUEUE_DEPTH.set_function(lambda: sum(b.pending() for b in batchers.values()), queue="batcher")
+
+
+def _checkpoint(persona_name):
+    return PERSONAS[persona_name].checkpoint
+
+
+def _load_checkpoint(checkpoint):
+    # Draait op de batcher-thread van het checkpoint; acquire() publiceert het model
+    store_name, repo_id = CHECKPOINTS[checkpoint]
+    return model_store.load_musicgen(store_name, repo_id)
+
+
+def _drop_checkpoint(checkpoint):
+    # Draait op de batcher-thread, dus nooit tijdens een generatie
+    with _lock:
+        models.pop(checkpoint, None)
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def acquire(persona_name):
+    """Laat de persona zijn checkpoint vasthouden en laad het zo nodig.
+
+    Geeft True terug als het checkpoint hiervoor geladen moest worden
+    (dan is een warmup zinvol), False als het al in het geheugen stond.
+    """
+    checkpoint = _checkpoint(persona_name)
+    with _lock:
+        _lock.wait_for(lambda: checkpoint not in pending)
+        if checkpoint in models:
+            holders[checkpoint].add(persona_name)
+            return False
+        pending[checkpoint] = "loading"
+    print(f"Loading MusicGen {checkpoint} checkpoint for {persona_name}...")
+    model = None
     try:
-        if model is None:
+        model = batchers[checkpoint].run(_load_checkpoint, checkpoint)
+    finally:
+        with _lock:
+            del pending[checkpoint]
+            if model is not None:
+                models[checkpoint] = model
+                holders[checkpoint].add(persona_name)
+            _lock.notify_all()
+    print(f"MusicGen {checkpoint} loaded successfully.")
+    return True
+
+
+def release(persona_name):
+    """Laat het checkpoint van de persona los; ontlaad het als niemand het nog gebruikt."""
+    checkpoint = _checkpoint(persona_name)
+    with _lock:
+        _lock.wait_for(lambda: checkpoint not in pending)
+        holders[checkpoint].discard(persona_name)
+        if holders[checkpoint] or checkpoint not in models:
             return True
-        model = None
-        gc.collect()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        print("Model unloaded successfully.")
-        return True
-    except Exception as e:
-        print(f"Error unloading model: {e}")
-        return False
-
-def extend_impl(source_track_path, output_path, extend_duration, content_prompt, style_prompt, has_vocals):
-    """Verleng een track."""
-    global model
-    try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-        
-        if model is None and not load_model_impl():
-            return False, 0
-            
-        original_audio, sr = librosa.load(source_track_path, sr=32000)
-        combined_prompt = f"{content_prompt} Continuation of the previous section, maintain the same style and theme."
-        print(f"Extending track with prompt: {combined_prompt}")
-        
-        model.set_generation_params(duration=extend_duration)
-        extension_audio = model.generate([combined_prompt]).cpu().numpy()[0, 0]
-        extended_audio = np.concatenate([original_audio, extension_audio])
-        
-        sf.write(full_output_path, extended_audio, samplerate=32000)
-        convert_to_mp3(full_output_path, full_output_path.replace(".wav", ".mp3"))
-        
-        duration = librosa.get_duration(y=extended_audio, sr=32000)
-        return True, duration
-    except Exception as e:
-        print(f"Error extending track: {e}")
-        return False, 0
-
-
-def convert_to_mp3(wav_path, mp3_path):
+        pending[checkpoint] = "unloading"
     try:
-        sound = AudioSegment.from_wav(wav_path)
-        sound.export(mp3_path, format="mp3")
-        print(f"Converted {wav_path} to {mp3_path}")
-    except Exception as e:
-        print(f"❌ Fout bij conversie naar mp3: {e}")
+        batchers[checkpoint].run(_drop_checkpoint, checkpoint)
+    finally:
+        with _lock:
+            del pending[checkpoint]
+            _lock.notify_all()
+    print(f"MusicGen {checkpoint} unloaded successfully.")
+    return True
+
+
+def holds(persona_name):
+    checkpoint = _checkpoint(persona_name)
+    with _lock:
+        return persona_name in holders[checkpoint] and checkpoint in models
+
+
+def warmup(persona_name):
+    """Korte synthetische generatie zodat de eerste echte request niet de
+    eenmalige initialisatiekosten betaalt."""
+    params = generation_params.freeze(dict(generation_params.defaults(), duration=WARMUP_DURATION))
+    batchers[_checkpoint(persona_name)].submit("warmup", params, bounded=False)
+
+
+def status():
+    with _lock:
+        return {
+            checkpoint: {
+                "loaded": checkpoint in models,
+                "pending": pending.get(checkpoint),
+                "personas": sorted(holders[checkpoint]),
+            }
+            for checkpoint in CHECKPOINTS
+        }
+
+
+def generate_impl(persona_name, prompt, output_path, params):
+    """Genereer audio voor een prompt van de persona; geeft de duur terug.
+
+    `params` komt uit params.from_request en bevat alle generatieparameters.
+    """
+    print(f"[{persona_name}] Generating music with prompt: {prompt}")
+    audio = batchers[_checkpoint(persona_name)].submit(prompt, params)
+    return write_audio(audio, SAMPLE_RATE, output_path)["duration"]
+
+
+def extend_impl(persona_name, source_track_path, prompt, output_path, params):
+    """Verleng een track met een vervolg op basis van de prompt."""
+    print(f"[{persona_name}] Extending track with prompt: {prompt}")
+    extension_audio = batchers[_checkpoint(persona_name)].submit(prompt, params)[0]
+    return extend.append(source_track_path, extension_audio, SAMPLE_RATE, output_path)["duration"]
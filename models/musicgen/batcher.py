@@ -0,0 +1,134 @@
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from common.executor import REJECTED, ExecutorBusy
+
+# Markeert een control-taak (load/unload) in de rij in plaats van een prompt
+_CONTROL = object()
+
+
+class MicroBatcher:
+    """Bundelt gelijktijdige prompts tot één model.generate([...]) call.
+
+    Requests die binnen `window` seconden na elkaar binnenkomen en dezelfde
+    generatieparameters vragen worden samen gegenereerd (maximaal
+    `max_batch` per keer). `params` moet hashbaar zijn (zie params.freeze).
+    `generate_fn(prompts, params)` moet een array met vorm
+    [batch, channels, samples] teruggeven; elke caller krijgt zijn eigen rij.
+    Alle model-calls lopen via één dispatcher-thread, dus de parameters
+    van een batch kunnen niet door een ander request overschreven worden.
+    Laden en ontladen gaan via `run()` over dezelfde thread, zodat een
+    unload nooit midden in een generatie valt.
+
+    Er wachten hoogstens `max_pending` prompts; daarboven gooit `submit()`
+    een ExecutorBusy (429 met Retry-After, zie common.service).
+    """
+
+    def __init__(self, generate_fn, window=0.05, max_batch=8, name="musicgen-batcher", max_pending=32):
+        self._generate_fn = generate_fn
+        self._window = window
+        self._max_batch = max(1, max_batch)
+        self._max_pending = max(1, max_pending)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        # Voortschrijdend gemiddelde van de duur van een batch, voor Retry-After
+        self._batch_seconds = None
+        # Requests met andere parameters dan de huidige batch wachten hier op hun beurt
+        self._carry = []
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt, params, bounded=True):
+        """Genereer audio voor één prompt; blokkeert tot de batch klaar is.
+
+        `bounded=False` (warmup) telt niet mee voor de limiet.
+        """
+        with self._lock:
+            if bounded and self._waiting >= self._max_pending:
+                position = self._waiting + 1
+                # Wachtende prompts gaan per max_batch tegelijk
+                batches_ahead = (self._waiting + self._max_batch - 1) // self._max_batch
+                retry_after = max(1, math.ceil((self._batch_seconds or 10.0) * batches_ahead))
+                REJECTED.inc()
+                raise ExecutorBusy(position, self._max_pending, retry_after)
+            self._waiting += 1
+        future = Future()
+        self._queue.put((prompt, params, future))
+        return future.result()
+
+    def run(self, fn, *args):
+        """Voer `fn` uit op de dispatcher-thread, tussen twee batches in."""
+        if threading.current_thread() is self._thread:
+            return fn(*args)
+        future = Future()
+        self._queue.put(((fn, args), _CONTROL, future))
+        return future.result()
+
+    def pending(self):
+        """Aantal prompts dat nog op een batch wacht."""
+        with self._lock:
+            return self._waiting
+
+    def _next_request(self):
+        if self._carry:
+            return self._carry.pop(0)
+        return self._queue.get()
+
+    def _collect(self):
+        first = self._next_request()
+        batch = [first]
+        params = first[1]
+        if params is _CONTROL:
+            return batch, params
+        deadline = time.monotonic() + self._window
+        # Eerst de requests die al klaarstaan met dezelfde parameters
+        for item in list(self._carry):
+            if len(batch) >= self._max_batch:
+                break
+            if item[1] == params:
+                self._carry.remove(item)
+                batch.append(item)
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[1] == params:
+                batch.append(item)
+            else:
+                self._carry.append(item)
+        return batch, params
+
+    def _run(self):
+        while True:
+            batch, params = self._collect()
+            if params is _CONTROL:
+                (fn, args), _, future = batch[0]
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+                continue
+            with self._lock:
+                self._waiting -= len(batch)
+            prompts = [prompt for prompt, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                audio = self._generate_fn(prompts, params)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._batch_seconds = elapsed if self._batch_seconds is None else 0.8 * self._batch_seconds + 0.2 * elapsed
+            print(f"Generated batch of {len(batch)} prompt(s), params={dict(params)}")
+            for i, (_, _, future) in enumerate(batch):
+                future.set_result(audio[i])
@@ -0,0 +1,58 @@
+"""Generatieparameters per request.
+
+Elke generatie krijgt een volledige set parameters mee; de batcher zet
+die vlak voor model.generate() op het model en alleen prompts met exact
+dezelfde set komen in één batch. Er blijft dus geen duur of temperature
+van een vorig request op het gedeelde model hangen.
+
+Standaardwaarden komen uit models.musicgen in config.yml, een request
+kan ze overschrijven met duration, temperature, topK, topP en cfgCoef.
+"""
+from common.config import get_setting
+
+# Request-veld -> (argument van set_generation_params, type, minimum, maximum)
+FIELDS = {
+    "duration": ("duration", float, 0.5, 300),
+    "temperature": ("temperature", float, 0.01, 5),
+    "topK": ("top_k", int, 0, 2048),
+    "topP": ("top_p", float, 0, 1),
+    "cfgCoef": ("cfg_coef", float, 0, 20),
+}
+# Standaarden van audiocraft voor wat niet in config.yml staat
+BUILTIN_DEFAULTS = {"duration": 30, "temperature": 1.0, "top_k": 250, "top_p": 0.0, "cfg_coef": 3.0}
+
+
+def defaults():
+    """Standaardparameters uit config.yml (models.musicgen)."""
+    return {
+        name: kind(get_setting(f"models.musicgen.{name}", BUILTIN_DEFAULTS[name]))
+        for name, kind, _, _ in FIELDS.values()
+    }
+
+
+def from_request(data, duration_field="duration", duration=None):
+    """Bouw de parameters voor één request; ValueError bij een ongeldige waarde.
+
+    `duration_field` is het veld met de duur (extend gebruikt
+    extendDuration); `duration` is de standaard als dat veld ontbreekt.
+    """
+    params = defaults()
+    if duration is not None:
+        params["duration"] = float(duration)
+    for field, (name, kind, low, high) in FIELDS.items():
+        value = data.get(duration_field if field == "duration" else field)
+        if value is None or value == "":
+            continue
+        try:
+            value = kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} moet een getal zijn")
+        if not low <= value <= high:
+            raise ValueError(f"{field} moet tussen {low} en {high} liggen")
+        params[name] = value
+    return freeze(params)
+
+
+def freeze(params):
+    """Hashbare vorm, zodat de batcher op de volledige set kan groeperen."""
+    return tuple(sorted(params.items()))
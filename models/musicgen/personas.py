@@ -0,0 +1,81 @@
+"""MusicGen-personas.
+
+musicgen, musiclm, musicgpt, stable_audio en mousai waren vijf losse
+services die elk hun eigen kopie van MusicGen laadden. Ze draaien nu als
+persona's op de gedeelde engine in app_impl.py: één kopie per checkpoint
+en één batcher per checkpoint, zodat requests van verschillende
+persona's samen gegenereerd kunnen worden. Een persona bepaalt alleen de
+samenstelling van de prompt, het checkpoint en eventueel een eigen
+standaardduur; de overige standaardparameters komen uit models.musicgen
+in config.yml (zie params.py).
+
+Dit bestand importeert geen torch; app.py bouwt de routes hiermee op
+voordat de engine geladen is.
+"""
+
+CONTINUATION = " Continuation of the previous section, maintain the same style and theme."
+
+
+def compose(content_prompt, style_prompt="", has_vocals=True):
+    prompt = content_prompt
+    if style_prompt:
+        prompt += f" in the style of {style_prompt}"
+    if not has_vocals:
+        prompt += ". Instrumental only, no vocals."
+    return prompt
+
+
+class Persona:
+    """Promptregels en standaardinstellingen van één oorspronkelijke service.
+
+    `raw_prompt`: /generate gebruikt de prompt ongewijzigd (zoals musicgen
+    en musiclm deden) in plaats van content, stijl en vocals samen te
+    stellen. Gateway en frontend sturen contentPrompt; het oude veld
+    "prompt" werkt nog als terugval. `styled_extend`: stijl en vocals tellen ook mee in de
+    prompt van /extend. `duration` None betekent models.musicgen.duration.
+    """
+
+    def __init__(self, name, checkpoint="melody", duration=None, raw_prompt=False,
+                 styled_extend=True, continuation=CONTINUATION):
+        self.name = name
+        self.checkpoint = checkpoint
+        self.duration = duration
+        self.raw_prompt = raw_prompt
+        self.styled_extend = styled_extend
+        self.continuation = continuation
+
+    def generate_prompt(self, data):
+        if data.get("isRemix") and data.get("sourceTrackPath"):
+            return self.remix_prompt(data)
+        if self.raw_prompt:
+            return data.get("contentPrompt") or data.get("prompt", "")
+        return compose(data.get("contentPrompt", ""), data.get("stylePrompt", ""), data.get("hasVocals", True))
+
+    def extend_prompt(self, data):
+        prompt = data.get("contentPrompt", "")
+        if self.styled_extend:
+            prompt = compose(prompt, data.get("stylePrompt", ""), data.get("hasVocals", True))
+        return prompt + self.continuation
+
+    def remix_prompt(self, data):
+        return compose(
+            f"Remix of: {data.get('contentPrompt', '')}",
+            data.get("stylePrompt", ""),
+            data.get("hasVocals", True),
+        )
+
+
+PERSONAS = {
+    persona.name: persona
+    for persona in (
+        Persona("musicgen", raw_prompt=True, styled_extend=False),
+        Persona("musiclm", raw_prompt=True, styled_extend=False),
+        Persona("musicgpt"),
+        Persona("stable_audio"),
+        # Mousai draaide op het kleinere checkpoint, met een kortere vervolgprompt
+        Persona("mousai", checkpoint="small", continuation=" Continuation."),
+    )
+}
+
+# Persona achter de routes zonder prefix (/generate, /load, ...) en /readyz van de service
+ROOT_PERSONA = "musicgen"
@@ -1,5 +0,0 @@
-from app_impl import app
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
-
@@ -2,24 +2,38 @@ import os
 import gc
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import torch
-
-# Import model-specific load and generate implementations
-from app_impl import load_model_impl, generate_impl, extend_impl, remix_impl
+from common import executor, readiness
+from common.lazy import lazy_import
+from common.service import service_bp
+
+# Import model-specific load and generate implementations (lazily, see common.lazy)
+load_model_impl, unload_model_impl, warmup_impl, generate_impl, extend_impl, remix_impl = lazy_import(
+    "app_impl",
+    "load_model_impl",
+    "unload_model_impl",
+    "warmup_impl",
+    "generate_impl",
+    "extend_impl",
+    "remix_impl",
+)
+
+# Al het model-werk loopt via één inference-thread; load/unload sluiten achteraan aan
+generate_impl, extend_impl, remix_impl = executor.bind(generate_impl, extend_impl, remix_impl)
+load_model_impl, unload_model_impl, warmup_impl = executor.bind(load_model_impl, unload_model_impl, warmup_impl, control=True)
 
 OUTPUT_FOLDER = "/app/output"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 model = None
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 app = Flask(__name__)
 CORS(app)
+app.register_blueprint(service_bp)
 
 
 @app.route("/generate", methods=["POST"])
 def generate_route():
     data = request.json
-    prompt = data.get("prompt", "")
+    prompt = data.get("contentPrompt") or data.get("prompt", "")
     output_path = data.get("outputPath")
     if not output_path:
         return jsonify(success=False, error="outputPath required"), 400
@@ -33,7 +47,7 @@ def generate_route():
 @app.route("/load", methods=["POST"])
 def load_route():
     global model
-    success = load_model_impl()
+    success = readiness.load(load_model_impl, warmup_impl)
     if success:
         return jsonify(success=True, message="Model loaded successfully")
     else:
@@ -42,14 +56,10 @@ def load_route():
 
 @app.route("/unload", methods=["POST"])
 def unload_route():
-    global model
-    if model is None:
-        return jsonify(success=False, error="No model loaded"), 400
-    model = None
-    gc.collect()
-    if torch.cuda.is_available():
-        torch.cuda.empty_cache()
-    return jsonify(success=True, message="Model unloaded successfully")
+    # Via app_impl: daar staat het model, niet in deze module
+    if readiness.unload(unload_model_impl):
+        return jsonify(success=True, message="Model unloaded successfully")
+    return jsonify(success=False, error="Failed to unload model"), 500
 
 
 @app.route("/extend", methods=["POST"])
@@ -76,6 +86,7 @@ def extend_route():
 
 
 @app.route("/remix", methods=["POST"])
+@app.route("/generate/remix", methods=["POST"])
 def remix_route():
     data = request.json
     source_track_path = data.get("sourceTrackPath")
@@ -96,5 +107,7 @@ def remix_route():
 
 
 if __name__ == "__main__":
+    readiness.start_preload(load_model_impl, warmup_impl)
+    readiness.mark_serving()
     app.run(host="0.0.0.0", port=5000)
 
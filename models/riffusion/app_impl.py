@@ -1,5 +1,3 @@
-import soundfile as sf
-import librosa
 import numpy as np
 import torch
 from riffusion.riffusion_pipeline import RiffusionPipeline
@@ -7,7 +5,10 @@ from riffusion.datatypes import InferenceInput
 from PIL import Image
 import os
 import gc
-from pydub import AudioSegment
+from common import extend
+from common import model_store
+from common.audio_sink import write_audio
+from common.readiness import WARMUP_DURATION
 
 model = None
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -15,15 +16,33 @@ OUTPUT_FOLDER = '/app/output'
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 
+def _load_local_checkpoint(path):
+    # De getracede UNet van riffusion wordt alleen van de hub geladen; uit de store de gewone UNet
+    return RiffusionPipeline.load_checkpoint(
+        checkpoint=path,
+        device=device,
+        use_traced_unet=False,
+        local_files_only=True,
+        low_cpu_mem_usage=True,
+    )
+
+
 def load_model_impl():
     global model
     try:
         if model is not None:
             return True
         print("Loading Riffusion model...")
-        model = RiffusionPipeline.load_checkpoint(
-            checkpoint="riffusion/riffusion-model-v1",
-            device=device,
+        model = model_store.load_diffusers(
+            "riffusion-model-v1",
+            RiffusionPipeline,
+            "riffusion/riffusion-model-v1",
+            load_local=_load_local_checkpoint,
+            load_remote=lambda: RiffusionPipeline.load_checkpoint(
+                checkpoint="riffusion/riffusion-model-v1",
+                device=device,
+            ),
+            torch_dtype=torch.float16,
         )
         print("Model loaded successfully.")
         return True
@@ -48,19 +67,23 @@ def unload_model_impl():
         return False
 
 
+def warmup_impl():
+    """Korte synthetische generatie zodat de eerste echte request niet de
+    eenmalige initialisatiekosten betaalt."""
+    inference_input = InferenceInput(
+        prompt="warmup",
+        alpha=0.5,
+        start=None,
+        end=None,
+        num_inference_steps=2,
+        guidance_scale=7.5,
+    )
+    model.riffuse(inference_input, init_image=Image.new('RGB', (512, 512)))
+
+
 def generate_impl(prompt, output_path):
     global model
     try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
         if model is None and not load_model_impl():
             return 0
 
@@ -76,9 +99,8 @@ def generate_impl(prompt, output_path):
         image = model.riffuse(inference_input, init_image=Image.new('RGB', (512, 512)))
         audio_numpy = torch.tensor(image).cpu().numpy()
 
-        sf.write(output_path, audio_numpy, samplerate=32000)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=audio_numpy, sr=32000)
+        saved = write_audio(audio_numpy, 32000, output_path)
+        duration = saved["duration"]
         return duration
     except Exception as e:
         print(f"Error generating music: {str(e)}")
@@ -88,20 +110,9 @@ def generate_impl(prompt, output_path):
 def extend_impl(source_track_path, output_path, extend_duration, content_prompt, style_prompt, has_vocals):
     global model
     try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
         if model is None and not load_model_impl():
             return 0
 
-        original_audio, sr = librosa.load(source_track_path, sr=32000)
         combined_prompt = content_prompt
         if style_prompt:
             combined_prompt += f" in the style of {style_prompt}"
@@ -119,11 +130,8 @@ def extend_impl(source_track_path, output_path, extend_duration, content_prompt,
 
         image = model.riffuse(inference_input, init_image=Image.new('RGB', (512, 512)))
         extension = torch.tensor(image).cpu().numpy()
-        extended_audio = np.concatenate([original_audio, extension])
-
-        sf.write(output_path, extended_audio, samplerate=32000)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=extended_audio, sr=32000)
+        saved = extend.append(source_track_path, extension, 32000, output_path)
+        duration = saved["duration"]
         return duration
     except Exception as e:
         print(f"Error extending track: {str(e)}")
@@ -133,20 +141,12 @@ def extend_impl(source_track_path, output_path, extend_duration, content_prompt,
 def remix_impl(source_track_path, output_path, content_prompt, style_prompt, has_vocals):
     global model
     try:
-        # Maak absoluut pad
-        if not os.path.isabs(output_path):
-            full_output_path = os.path.join(OUTPUT_FOLDER, output_path)
-        else:
-            full_output_path = output_path
-        
-        print(f"Will save to: {full_output_path}")
-        
-        # Zorg dat de output directory bestaat
-        os.makedirs(OUTPUT_FOLDER, exist_ok=True)
         if model is None and not load_model_impl():
             return 0
 
-        original_audio, sr = librosa.load(source_track_path, sr=32000, duration=10)
+        # De pipeline krijgt alleen de prompt; de bron hoeft niet gedecodeerd te worden
+        if not os.path.exists(extend.source_path(source_track_path)):
+            raise FileNotFoundError(source_track_path)
         combined_prompt = f"Remix of: {content_prompt}"
         if style_prompt:
             combined_prompt += f" in the style of {style_prompt}"
@@ -165,20 +165,9 @@ def remix_impl(source_track_path, output_path, content_prompt, style_prompt, has
         image = model.riffuse(inference_input, init_image=Image.new('RGB', (512, 512)))
         remix_audio = torch.tensor(image).cpu().numpy()
 
-        sf.write(output_path, remix_audio, samplerate=32000)
-        convert_to_mp3(output_path, output_path.replace(".wav", ".mp3"))
-        duration = librosa.get_duration(y=remix_audio, sr=32000)
+        saved = write_audio(remix_audio, 32000, output_path)
+        duration = saved["duration"]
         return duration
     except Exception as e:
         print(f"Error remixing track: {str(e)}")
         return 0
-
-
-def convert_to_mp3(wav_path, mp3_path):
-    try:
-        sound = AudioSegment.from_wav(wav_path)
-        sound.export(mp3_path, format="mp3")
-        print(f"Converted {wav_path} to {mp3_path}")
-    except Exception as e:
-        print(f"❌ Fout bij conversie naar mp3: {e}")
-
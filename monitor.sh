@@ -93,6 +93,16 @@ else
   echo -e "${RED}Frontend: Error (${FRONTEND_STATUS})${NC}"
 fi
 
+# Gateway metrics (volledige set via http://localhost:5000/metrics)
+echo -e "\n${BLUE}Gateway Metrics:${NC}"
+echo -e "----------------"
+GATEWAY_METRICS=$(curl -s http://localhost:5000/metrics)
+if [[ $? -eq 0 && ! -z "$GATEWAY_METRICS" ]]; then
+  echo "$GATEWAY_METRICS" | grep -E '^(gateway_jobs_total|gateway_jobs_queued|gateway_models_loaded|gateway_model_requests_total)' | sed 's/^/  /'
+else
+  echo -e "${YELLOW}[WARNING] Could not retrieve gateway metrics.${NC}"
+fi
+
 echo -e "\n${BLUE}Last Generated Tracks:${NC}"
 echo -e "----------------------"
 ls -lt output | head -n 6 | tail -n 5 | awk '{print $9, $6, $7, $8}'
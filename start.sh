@@ -3,12 +3,13 @@
 # AI Music Generation Web App Startup Script
 
 # Set up required directories
-mkdir -p uploads models output
-mkdir -p models/musicgen models/musicgpt models/jukebox models/audioldm models/riffusion
-mkdir -p models/bark models/musiclm models/mousai models/stable_audio models/dance_diffusion
+mkdir -p uploads models output model_store
+# musicgpt, musiclm, mousai en stable_audio zijn persona's in de musicgen service
+mkdir -p models/musicgen models/jukebox models/audioldm models/riffusion
+mkdir -p models/bark models/dance_diffusion
 
 # Copy model files if they don't exist
-for model in musicgen musicgpt jukebox audioldm riffusion bark musiclm mousai stable_audio dance_diffusion; do
+for model in musicgen jukebox audioldm riffusion bark dance_diffusion; do
   if [ ! -f "models/$model/app.py" ]; then
     echo "Setting up $model container..."
     cp models/musicgen/app.py models/$model/app.py 2>/dev/null || :
@@ -0,0 +1,17 @@
+"""Unit tests voor de pure-Python onderdelen van gateway en model services.
+
+De modules worden geïmporteerd zoals in de containers: `common` uit
+models/, de gateway-modules uit backend/ en de batcher uit
+models/musicgen/. Niets hier heeft torch, een GPU of een draaiende
+service nodig; wel pytest, numpy, soundfile en flask (uit de
+requirements van backend en model services).
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Buiten de containers is er geen /app/config.yml; de config.yml van de repo gebruiken
+os.environ.setdefault("CONFIG_PATH", os.path.join(ROOT, "config.yml"))
+sys.path[:0] = [os.path.join(ROOT, "models"), os.path.join(ROOT, "backend"), os.path.join(ROOT, "models", "musicgen")]
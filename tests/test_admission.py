@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from admission import Admission, AdmissionDenied, TokenBucket, requested_duration
+from jobs import JOB_DONE, Job, JobQueue
+
+GROUPS = {"musicgen": "musicgen", "musiclm": "musicgen"}
+
+
+def _job(model, result=None, error=None):
+    job = Job("generate", model, {})
+    job.result, job.error = result, error
+    return job
+
+
+def test_token_bucket_refills_at_rate_up_to_burst():
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.updated
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(0.5)
+    # Kijken neemt geen token
+    assert bucket.wait(now + 0.5) == 0
+    assert bucket.take(now + 0.5) == 0
+    assert bucket.take(now + 100) == 0
+    assert bucket.tokens == pytest.approx(1)
+
+
+def test_rate_limit_per_client_and_peek_without_consuming():
+    admission = Admission(rate_per_minute=60, burst=2)
+    admission.check_rate("a", consume=False)
+    admission.check_rate("a")
+    admission.check_rate("a")
+    with pytest.raises(AdmissionDenied) as denied:
+        admission.check_rate("a")
+    assert denied.value.status == 429 and denied.value.retry_after == 1
+    with pytest.raises(AdmissionDenied):
+        admission.check_rate("a", consume=False)
+    admission.check_rate("b")
+
+
+def test_rate_limit_zero_disables_it():
+    admission = Admission(rate_per_minute=0)
+    for _ in range(100):
+        admission.check_rate("a")
+
+
+def test_queue_cap_is_per_service_and_counts_only_waiting_jobs():
+    admission = Admission(rate_per_minute=0, max_queued_per_model=2, max_running_per_model=1, groups=GROUPS,
+                          default_job_seconds=10)
+    admission.admit("musicgen")
+    admission.admit("musiclm")
+    with pytest.raises(AdmissionDenied) as denied:
+        admission.admit("musicgen")
+    # Twee wachtend, één tegelijk, 10s per job
+    assert denied.value.retry_after == 20
+    assert denied.value.details == {"queued": 2, "maxQueued": 2}
+    admission.admit("bark")
+
+    # Een gestarte job telt niet meer mee in de wachtrij
+    assert admission.try_start(_job("musicgen"))
+    admission.admit("musicgen")
+    with pytest.raises(AdmissionDenied) as denied:
+        admission.admit("musicgen")
+    assert denied.value.retry_after == 30
+
+
+def test_cancel_returns_the_queue_slot():
+    admission = Admission(rate_per_minute=0, max_queued_per_model=1)
+    admission.admit("bark")
+    admission.cancel("bark")
+    admission.admit("bark")
+
+
+def test_running_cap_blocks_start_until_release():
+    admission = Admission(rate_per_minute=0, max_running_per_model=1, groups=GROUPS)
+    first, second = _job("musicgen"), _job("musiclm")
+    for _ in (first, second):
+        admission.admit("musicgen")
+    admission.start(first)
+    assert not admission.try_start(second)
+
+    started = threading.Event()
+    t = threading.Thread(target=lambda: (admission.start(second), started.set()), daemon=True)
+    t.start()
+    assert not started.wait(0.05)
+    admission.release(first)
+    assert started.wait(5)
+    stats = admission.stats()["services"]["musicgen"]
+    assert (stats["queued"], stats["running"]) == (0, 1)
+
+
+def test_async_path_with_more_jobs_than_running_slots_finishes():
+    # Zoals _dispatch_generate_async: plek nemen, dan de model call en het afronden in de default executor
+    admission = Admission(rate_per_minute=0, max_running_per_model=2)
+    peak = []
+
+    async def dispatch(job):
+        await admission.start_async(job)
+        peak.append(admission.stats()["services"]["bark"]["running"])
+        await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.01)
+        return {"duration": 1}
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        # Minder threads dan wachtende jobs
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=4))
+        tasks = []
+        jobs = JobQueue({"generate": dispatch}, dispatcher=lambda coro: tasks.append(loop.create_task(coro)))
+        submitted = []
+        for _ in range(8):
+            admission.admit("bark")
+            job = jobs.submit("generate", "bark", {})
+            job.add_done_callback(admission.release)
+            submitted.append(job)
+        await asyncio.wait_for(asyncio.gather(*tasks), 10)
+        return submitted
+
+    submitted = asyncio.run(main())
+    assert all(job.status == JOB_DONE for job in submitted)
+    assert max(peak) == 2
+    stats = admission.stats()["services"]["bark"]
+    assert (stats["queued"], stats["running"]) == (0, 0)
+
+
+def test_cancelled_async_waiter_does_not_take_a_slot():
+    admission = Admission(rate_per_minute=0, max_running_per_model=1)
+    first, second, third = _job("bark"), _job("bark"), _job("bark")
+    for _ in range(3):
+        admission.admit("bark")
+
+    async def main():
+        await admission.start_async(first)
+        waiting = asyncio.ensure_future(admission.start_async(second))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        admission.cancel("bark")
+        admission.release(first)
+        await asyncio.wait_for(admission.start_async(third), 5)
+
+    asyncio.run(main())
+    stats = admission.stats()["services"]["bark"]
+    assert (stats["queued"], stats["running"]) == (0, 1)
+
+
+def test_model_limits_override_defaults():
+    admission = Admission(rate_per_minute=0, max_queued_per_model=64, max_running_per_model=8,
+                          model_limits={"jukebox": {"queued": 1, "running": 1}})
+    assert (admission.queue_limit("jukebox"), admission.running_limit("jukebox")) == (1, 1)
+    assert (admission.queue_limit("bark"), admission.running_limit("bark")) == (64, 8)
+
+
+def test_release_learns_job_seconds_per_service_and_ratio_per_model():
+    admission = Admission(rate_per_minute=0, groups=GROUPS)
+    job = _job("musiclm", result={"duration": 10})
+    admission.admit("musiclm")
+    admission.start(job)
+    admission.release(job)
+    stats = admission.stats()
+    assert set(stats["services"]) == {"musicgen"}
+    assert stats["services"]["musicgen"]["avgJobSeconds"] is not None
+    assert set(stats["models"]) == {"musiclm"}
+
+    # Jobs die nooit gestart zijn of faalden leren niets
+    never_started, failed = _job("bark"), _job("bark", error="kapot")
+    admission.admit("bark")
+    admission.admit("bark")
+    admission.release(never_started)
+    admission.start(failed)
+    admission.release(failed)
+    assert admission.stats()["services"]["bark"] == dict(
+        queued=0, running=0, maxQueued=64, maxRunning=8, avgJobSeconds=None,
+    )
+
+
+def test_cost_limits():
+    admission = Admission(rate_per_minute=0, max_duration=60, max_job_seconds=100)
+    with pytest.raises(AdmissionDenied) as denied:
+        admission.admit("bark", duration=61)
+    assert denied.value.status == 400
+
+    admission._compute_ratio["bark"] = 2.0
+    admission.admit("bark", duration=50)
+    with pytest.raises(AdmissionDenied) as denied:
+        admission.admit("bark", duration=51)
+    assert denied.value.details["estimatedSeconds"] == 102
+
+
+def test_requested_duration():
+    assert requested_duration({"duration": "12.5"}) == 12.5
+    assert requested_duration({"extendDuration": 8}) == 8
+    assert requested_duration({"duration": "lang"}) is None
+    assert requested_duration({}) is None
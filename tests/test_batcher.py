@@ -0,0 +1,122 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batcher import MicroBatcher
+from common.executor import ExecutorBusy
+
+# Bevroren parameters zoals params.freeze() ze maakt
+SHORT = (("duration", 5.0),)
+LONG = (("duration", 30.0),)
+
+
+class Model:
+    """generate_fn die elke batch onthoudt; rij i bevat de index van de prompt."""
+
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def __call__(self, prompts, params):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append((list(prompts), params))
+        return np.array([[[float(prompt)]] for prompt in prompts])
+
+
+def _submit_all(batcher, items):
+    """Submit (prompt, params) tegelijk vanuit eigen threads; geeft de threads en resultaten terug."""
+    results = {}
+
+    def run(prompt, params):
+        try:
+            results[prompt] = batcher.submit(prompt, params)
+        except Exception as e:
+            results[prompt] = e
+
+    threads = [threading.Thread(target=run, args=item, daemon=True) for item in items]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_concurrent_prompts_with_equal_params_share_a_batch():
+    model = Model()
+    batcher = MicroBatcher(model, window=0.5, max_batch=4)
+    threads, results = _submit_all(batcher, [(i, SHORT) for i in range(4)])
+    for t in threads:
+        t.join(5)
+
+    assert len(model.batches) == 1
+    assert sorted(model.batches[0][0]) == [0, 1, 2, 3]
+    # Elke caller krijgt zijn eigen rij terug
+    assert {prompt: float(audio[0][0]) for prompt, audio in results.items()} == {i: float(i) for i in range(4)}
+
+
+def test_batches_are_split_by_params_and_max_batch():
+    gate = threading.Event()
+    model = Model(gate)
+    batcher = MicroBatcher(model, window=0.2, max_batch=2)
+    # De eerste batch blijft hangen tot alles in de rij staat
+    threads, _ = _submit_all(batcher, [(0, SHORT)])
+    _wait_until(lambda: batcher.pending() == 0)
+    more, _ = _submit_all(batcher, [(1, SHORT), (2, LONG), (3, SHORT), (4, SHORT), (5, LONG)])
+    _wait_until(lambda: batcher.pending() == 5)
+    gate.set()
+    for t in threads + more:
+        t.join(5)
+
+    assert all(len(prompts) <= 2 for prompts, _ in model.batches)
+    for prompts, params in model.batches:
+        assert all((SHORT if p in (0, 1, 3, 4) else LONG) == params for p in prompts)
+    assert sorted(p for prompts, _ in model.batches for p in prompts) == [0, 1, 2, 3, 4, 5]
+
+
+def test_full_queue_raises_executor_busy():
+    gate = threading.Event()
+    model = Model(gate)
+    batcher = MicroBatcher(model, window=0, max_batch=2, max_pending=2)
+    running, _ = _submit_all(batcher, [(0, SHORT)])
+    _wait_until(lambda: batcher.pending() == 0)
+    waiting, _ = _submit_all(batcher, [(1, SHORT), (2, SHORT)])
+    _wait_until(lambda: batcher.pending() == 2)
+
+    with pytest.raises(ExecutorBusy) as busy:
+        batcher.submit(3, SHORT)
+    assert busy.value.position == 3
+    assert busy.value.retry_after >= 1
+    # Warmup telt niet mee voor de limiet
+    warmup = threading.Thread(target=batcher.submit, args=(4, SHORT), kwargs={"bounded": False}, daemon=True)
+    warmup.start()
+    _wait_until(lambda: batcher.pending() == 3)
+    gate.set()
+    for t in running + waiting + [warmup]:
+        t.join(5)
+    assert batcher.pending() == 0
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def fail(prompts, params):
+        raise RuntimeError("CUDA out of memory")
+
+    batcher = MicroBatcher(fail, window=0.2, max_batch=4)
+    threads, results = _submit_all(batcher, [(0, SHORT), (1, SHORT)])
+    for t in threads:
+        t.join(5)
+    assert all(isinstance(e, RuntimeError) for e in results.values())
+    assert batcher.pending() == 0
+
+
+def test_run_executes_between_batches_on_the_dispatcher_thread():
+    batcher = MicroBatcher(Model(), window=0)
+    assert batcher.run(threading.current_thread) is batcher._thread
+    assert batcher.run(lambda x: x + 1, 1) == 2
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+
+import app_impl  # noqa: E402
+from common import model_store  # noqa: E402
+
+
+@pytest.fixture
+def slow_store(monkeypatch):
+    """Een checkpoint laden duurt tot `release` gezet wordt."""
+    started, release = threading.Event(), threading.Event()
+
+    def load_musicgen(store_name, repo_id):
+        started.set()
+        assert release.wait(5)
+        return object()
+
+    monkeypatch.setattr(model_store, "load_musicgen", load_musicgen)
+    yield started, release
+    release.set()
+    for persona in ("musicgen", "musiclm"):
+        app_impl.release(persona)
+
+
+def test_status_and_holds_answer_during_a_load(slow_store):
+    started, release = slow_store
+    loader = threading.Thread(target=app_impl.acquire, args=("musicgen",), daemon=True)
+    loader.start()
+    assert started.wait(5)
+
+    begin = time.monotonic()
+    assert app_impl.status()["melody"]["pending"] == "loading"
+    assert not app_impl.holds("musicgen")
+    assert time.monotonic() - begin < 0.5
+
+    # Een tweede persona op hetzelfde checkpoint wacht op de load en laadt niet opnieuw
+    second = []
+    waiter = threading.Thread(target=lambda: second.append(app_impl.acquire("musiclm")), daemon=True)
+    waiter.start()
+    release.set()
+    loader.join(5)
+    waiter.join(5)
+    assert second == [False]
+    assert app_impl.status()["melody"] == {"loaded": True, "pending": None, "personas": ["musicgen", "musiclm"]}
+
+
+def test_failed_load_leaves_nothing_behind(monkeypatch):
+    def load_musicgen(store_name, repo_id):
+        raise RuntimeError("checkpoint kapot")
+
+    monkeypatch.setattr(model_store, "load_musicgen", load_musicgen)
+    with pytest.raises(RuntimeError):
+        app_impl.acquire("mousai")
+    assert app_impl.status()["small"] == {"loaded": False, "pending": None, "personas": []}
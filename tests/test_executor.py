@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from common.executor import ExecutorBusy, InferenceExecutor
+
+
+def _blocked(executor):
+    """Zet een taak op de executor die loopt tot de teruggegeven event gezet wordt."""
+    running, release = threading.Event(), threading.Event()
+
+    def task():
+        running.set()
+        release.wait(5)
+        return "done"
+
+    t = threading.Thread(target=executor.submit, args=(task,))
+    t.start()
+    assert running.wait(5)
+    return release, t
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def _submit_in_background(executor, fn):
+    results = []
+    t = threading.Thread(target=lambda: results.append(executor.submit(fn)))
+    t.start()
+    return t, results
+
+
+def test_submit_returns_result_and_raises_errors():
+    executor = InferenceExecutor(max_queue=2)
+    assert executor.submit(lambda x: x * 2, 21) == 42
+    with pytest.raises(ValueError):
+        executor.submit(lambda: (_ for _ in ()).throw(ValueError("kapot")))
+    assert executor.pending() == 0
+
+
+def test_full_queue_rejects_with_position_and_retry_after():
+    executor = InferenceExecutor(max_queue=1)
+    release, running = _blocked(executor)
+    waiting, results = _submit_in_background(executor, lambda: "waiting")
+    _wait_until(lambda: executor.pending() == 2)
+
+    with pytest.raises(ExecutorBusy) as busy:
+        executor.submit(lambda: "rejected")
+    assert busy.value.position == 3
+    assert busy.value.max_queue == 1
+    assert busy.value.retry_after >= 1
+
+    release.set()
+    running.join(5)
+    waiting.join(5)
+    assert results == ["waiting"]
+    assert executor.pending() == 0
+
+
+def test_control_tasks_are_never_rejected():
+    executor = InferenceExecutor(max_queue=1)
+    release, running = _blocked(executor)
+    waiting, _ = _submit_in_background(executor, lambda: None)
+    _wait_until(lambda: executor.pending() == 2)
+
+    results = []
+    control = threading.Thread(target=lambda: results.append(executor.submit(lambda: "load", control=True)))
+    control.start()
+    release.set()
+    for t in (running, waiting, control):
+        t.join(5)
+    assert results == ["load"]
+
+
+def test_nested_submit_runs_inline():
+    executor = InferenceExecutor(max_queue=1)
+    assert executor.submit(lambda: executor.submit(lambda: "inner")) == "inner"
+
+
+def test_service_turns_executor_busy_into_429():
+    flask = pytest.importorskip("flask")
+    from common.service import service_bp
+
+    app = flask.Flask(__name__)
+    app.register_blueprint(service_bp)
+
+    @app.route("/generate", methods=["POST"])
+    def generate():
+        raise ExecutorBusy(position=5, max_queue=4, retry_after=12)
+
+    response = app.test_client().post("/generate")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "12"
+    assert response.get_json()["queuePosition"] == 5
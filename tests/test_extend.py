@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+sf = pytest.importorskip("soundfile")
+
+from common import extend  # noqa: E402
+
+SR = 8000
+
+
+def _write(path, audio, sr=SR):
+    sf.write(str(path), np.asarray(audio, dtype=np.float32).reshape(len(audio), -1), sr, subtype="FLOAT")
+    return str(path)
+
+
+def _noise(seed, frames):
+    return np.random.default_rng(seed).standard_normal(frames).astype(np.float32) * 0.1
+
+
+def test_crossfade_gains():
+    fade_out, fade_in = extend.crossfade_gains(0, 100, 100)
+    np.testing.assert_allclose(fade_out[:, 0] ** 2 + fade_in[:, 0] ** 2, 1, rtol=1e-5)
+    fade_out, fade_in = extend.crossfade_gains(0, 100, 100, linear=True)
+    np.testing.assert_allclose(fade_out[:, 0] + fade_in[:, 0], 1, rtol=1e-5)
+    # Een stuk van de fade is hetzelfde als dat stuk uit de hele fade
+    part, _ = extend.crossfade_gains(40, 10, 100)
+    whole, _ = extend.crossfade_gains(0, 100, 100)
+    np.testing.assert_array_equal(part, whole[40:50])
+
+
+def test_correlation():
+    tone = np.sin(np.linspace(0, 20, 1000, dtype=np.float32))
+    assert extend.correlation(tone, tone * 0.5) == pytest.approx(1)
+    assert extend.correlation(tone, -tone) == pytest.approx(-1)
+    assert abs(extend.correlation(_noise(1, 8000), _noise(2, 8000))) < 0.1
+    assert extend.correlation(tone, np.zeros_like(tone)) == 0
+
+
+def test_correlated_continuation_keeps_its_level(tmp_path):
+    source = _write(tmp_path / "source.wav", np.full(2 * SR, 0.5))
+    result = extend.append(source, np.full(2 * SR, 0.5, dtype=np.float32), SR, str(tmp_path / "out.wav"),
+                           crossfade=0.5, formats=("wav",))
+    audio, _ = sf.read(result["path"])
+    assert result["crossfade"] == "linear"
+    assert result["duration"] == pytest.approx(3.5)
+    np.testing.assert_allclose(audio, 0.5, rtol=1e-5)
+
+
+def test_uncorrelated_continuation_uses_equal_power(tmp_path):
+    source = _write(tmp_path / "source.wav", _noise(1, 2 * SR))
+    result = extend.append(source, _noise(2, 2 * SR), SR, str(tmp_path / "out.wav"), crossfade=0.5,
+                           formats=("wav",))
+    audio, _ = sf.read(result["path"])
+    assert result["crossfade"] == "equal-power"
+    # Het deel voor de crossfade is de bron, het deel erna het vervolg
+    np.testing.assert_array_equal(audio[:int(1.5 * SR)], _noise(1, 2 * SR)[:int(1.5 * SR)])
+    np.testing.assert_array_equal(audio[2 * SR:], _noise(2, 2 * SR)[int(0.5 * SR):])
+
+
+def test_continuation_in_blocks_matches_a_single_write(tmp_path):
+    source = _write(tmp_path / "source.wav", _noise(1, 2 * SR))
+    continuation = _noise(2, 2 * SR)
+    whole = extend.append(source, continuation, SR, str(tmp_path / "whole.wav"), crossfade=0.5, formats=("wav",))
+    splice = extend.Splice(source, SR, str(tmp_path / "blocks.wav"), crossfade=0.5, formats=("wav",))
+    # Blokken kleiner dan de crossfade: de vorm ligt pas vast als die compleet is
+    for start in range(0, len(continuation), 1000):
+        splice.write(continuation[start:start + 1000])
+    blocks = splice.close()
+    np.testing.assert_array_equal(sf.read(whole["path"])[0], sf.read(blocks["path"])[0])
+
+
+def test_continuation_is_converted_to_the_source_format(tmp_path):
+    pytest.importorskip("librosa")
+    source = _write(tmp_path / "source.wav", np.zeros((SR, 2)))
+    result = extend.append(source, np.zeros(SR // 2, dtype=np.float32), SR // 2, str(tmp_path / "out.wav"),
+                           crossfade=0.1, formats=("wav",))
+    assert (result["sampleRate"], result["channels"]) == (SR, 2)
+    assert result["duration"] == pytest.approx(1.9)
+
+
+def test_short_continuation_fades_out_the_rest_of_the_source(tmp_path):
+    source = _write(tmp_path / "source.wav", np.full(SR, 0.5))
+    result = extend.append(source, np.zeros(100, dtype=np.float32), SR, str(tmp_path / "out.wav"), crossfade=0.5,
+                           formats=("wav",))
+    audio, _ = sf.read(result["path"])
+    assert len(audio) == SR
+    assert abs(audio[-1]) < 0.01
+
+
+def test_abort_in_place_leaves_the_source_untouched(tmp_path):
+    source = _write(tmp_path / "source.wav", _noise(1, 2 * SR))
+    before = open(source, "rb").read()
+    splice = extend.Splice(source, SR, source, crossfade=0.5, formats=("wav",))
+    splice.write(_noise(2, SR))
+    splice.abort()
+    assert open(source, "rb").read() == before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["source.wav"]
+
+
+def test_in_place_extend_replaces_the_source(tmp_path):
+    source = _write(tmp_path / "source.wav", _noise(1, 2 * SR))
+    result = extend.append(source, _noise(2, SR), SR, source, crossfade=0.5, formats=("wav",))
+    assert result["duration"] == pytest.approx(2.5)
+    assert sf.info(source).frames == int(2.5 * SR)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["source.wav"]
+
+
+def test_read_tail(tmp_path):
+    source = _write(tmp_path / "source.wav", np.stack([np.arange(SR), -np.arange(SR)], axis=1) / SR)
+    tail = extend.read_tail(source, seconds=0.25)
+    assert tail.shape == (SR // 4,)
+    # Stereo wordt naar mono gemiddeld
+    np.testing.assert_allclose(tail, 0)
+
+
+def test_new_output_is_written_directly(tmp_path):
+    source = _write(tmp_path / "source.wav", _noise(1, 2 * SR))
+    output = str(tmp_path / "out.wav")
+    splice = extend.Splice(source, SR, output, crossfade=0.5, formats=("wav",))
+    splice.write(_noise(2, SR))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out.wav", "source.wav"]
+    splice.abort()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["source.wav"]
+
+
+def test_existing_output_survives_an_abort(tmp_path):
+    source = _write(tmp_path / "source.wav", _noise(1, 2 * SR))
+    output = _write(tmp_path / "out.wav", _noise(3, SR))
+    before = open(output, "rb").read()
+    splice = extend.Splice(source, SR, output, crossfade=0.5, formats=("wav",))
+    splice.write(_noise(2, SR))
+    assert (tmp_path / "out.wav.part").exists()
+    splice.abort()
+    assert open(output, "rb").read() == before
+
+
+def test_no_crossfade_is_reported_as_none(tmp_path):
+    source = _write(tmp_path / "source.wav", np.full(SR, 0.5))
+    result = extend.append(source, np.full(SR, 0.5, dtype=np.float32), SR, str(tmp_path / "out.wav"), crossfade=0,
+                           formats=("wav",))
+    assert result["crossfade"] == "none"
+    assert result["duration"] == pytest.approx(2)
@@ -0,0 +1,33 @@
+from gen_cache import GenerationCache
+
+
+def _cache(tmp_path):
+    return GenerationCache(str(tmp_path / ".cache"), max_bytes=1 << 20, expected=(".wav",))
+
+
+def test_key_ignores_output_and_client_bookkeeping(tmp_path):
+    cache = _cache(tmp_path)
+    payload = {"contentPrompt": "lofi", "duration": 10, "hasVocals": True}
+    key = cache.key("generate", "musicgen", dict(payload, outputPath="a.wav", sessionId="alice"))
+    assert key == cache.key("generate", "musicgen", dict(payload, outputPath="b.wav", sessionId="bob", noCache=False))
+    assert key == cache.key("generate", "musicgen", dict(payload, userId="u1", clientId="c1", requestId="r1"))
+    assert key != cache.key("generate", "musicgen", dict(payload, contentPrompt="jazz"))
+    assert key != cache.key("generate", "bark", payload)
+
+
+def test_two_sessions_share_one_entry(tmp_path):
+    cache = _cache(tmp_path)
+    output = tmp_path / "out"
+    output.mkdir()
+    (output / "alice.wav").write_bytes(b"RIFF" + b"x" * 100)
+    payload = {"contentPrompt": "lofi", "duration": 10}
+
+    alice = cache.key("generate", "musicgen", dict(payload, sessionId="alice", outputPath="alice.wav"))
+    cache.store(alice, str(output), "alice.wav", {"success": True, "duration": 10, "outputPath": "alice.wav"})
+    bob = cache.key("generate", "musicgen", dict(payload, sessionId="bob", outputPath="bob.wav"))
+    result = cache.fetch(bob, str(output), "bob.wav")
+
+    assert result == {"success": True, "duration": 10, "outputPath": "bob.wav", "cached": True}
+    assert (output / "bob.wav").read_bytes() == (output / "alice.wav").read_bytes()
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"]) == (1, 1)
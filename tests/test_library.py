@@ -0,0 +1,81 @@
+import os
+import time
+
+from library import TrackLibrary
+
+HOUR = 3600
+
+
+def _touch(directory, name, age=0, size=10):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _library(tmp_path, **kwargs):
+    kwargs.setdefault("history_size", 50)
+    return TrackLibrary(str(tmp_path / ".library" / "library.db"), str(tmp_path), interval=0, orphan_grace=HOUR,
+                        **kwargs)
+
+
+def _files(tmp_path):
+    return sorted(p.name for p in tmp_path.iterdir() if p.is_file())
+
+
+def test_first_pass_imports_existing_outputs_instead_of_deleting_them(tmp_path):
+    _touch(tmp_path, "musicgen-1.wav", age=3 * HOUR, size=100)
+    _touch(tmp_path, "musicgen-1.mp3", age=3 * HOUR, size=20)
+    _touch(tmp_path, "bark-2.wav", age=2 * HOUR, size=50)
+    library = _library(tmp_path)
+
+    assert library.sweep() == 0
+    assert _files(tmp_path) == ["bark-2.wav", "musicgen-1.mp3", "musicgen-1.wav"]
+    tracks = library.history()["tracks"]
+    # Nieuwste eerst, met grootte en tijdstip uit stat
+    assert [(t["name"], t["model"], t["bytes"]) for t in tracks] == [
+        ("bark-2.wav", "unknown", 50), ("musicgen-1.wav", "unknown", 120),
+    ]
+    assert tracks[1]["files"] == ["musicgen-1.mp3", "musicgen-1.wav"]
+    assert tracks[1]["createdAt"] < tracks[0]["createdAt"]
+
+
+def test_imported_tracks_fall_under_history_size(tmp_path):
+    for i in range(3):
+        _touch(tmp_path, f"old-{i}.wav", age=(10 - i) * HOUR)
+    library = _library(tmp_path, history_size=2)
+    assert library.sweep() == 1
+    assert _files(tmp_path) == ["old-1.wav", "old-2.wav"]
+
+
+def test_only_names_issued_by_the_gateway_are_orphans(tmp_path):
+    library = _library(tmp_path)
+    library.sweep()
+    # Een job die gefaald is nadat de service al geschreven had
+    library.issue("musicgen-3.wav")
+    _touch(tmp_path, "musicgen-3.wav", age=2 * HOUR)
+    # Een extend die een service zelf geschreven heeft
+    _touch(tmp_path, "extended-4.wav", age=2 * HOUR)
+    # Uitgegeven, maar nog binnen de grace-periode
+    library.issue("musicgen-5.wav")
+    _touch(tmp_path, "musicgen-5.wav")
+
+    assert library.sweep() == 1
+    assert _files(tmp_path) == ["extended-4.wav", "musicgen-5.wav"]
+
+
+def test_later_formats_are_attached_to_their_track(tmp_path):
+    library = _library(tmp_path)
+    library.sweep()
+    library.issue("musicgen-6.wav")
+    _touch(tmp_path, "musicgen-6.wav", size=100)
+    library.record("generate", "musicgen", {"contentPrompt": "lofi", "duration": 10},
+                   {"outputPath": "musicgen-6.wav", "duration": 10})
+    _touch(tmp_path, "musicgen-6.mp3", age=2 * HOUR, size=20)
+
+    assert library.sweep() == 0
+    track, = library.history()["tracks"]
+    assert (track["model"], track["prompt"], track["params"]) == ("musicgen", "lofi", {"duration": 10})
+    assert (track["files"], track["bytes"]) == (["musicgen-6.mp3", "musicgen-6.wav"], 120)
@@ -0,0 +1,140 @@
+import pytest
+
+from memory_governor import MemoryGovernor, MemoryPressure
+from state import SharedState
+
+GB = 1024 ** 3
+GROUPS = {"musicgen": "musicgen", "musiclm": "musicgen"}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        if self.data is None:
+            raise RuntimeError("HTTP 404")
+
+    def json(self):
+        return self.data
+
+
+class FakeServices:
+    """/memory van de model services; elke evict geeft het geheugen van het model terug."""
+
+    def __init__(self, used, total=10 * GB, scope="device", footprints=None, loaded=()):
+        self.used = used
+        self.total = total
+        self.scope = scope
+        self.footprints = dict(footprints or {})
+        self.loaded = set(loaded)
+        self.requests = []
+
+    def request(self, method, model, path, **kwargs):
+        self.requests.append((method, model, path))
+        return FakeResponse({
+            "success": True, "loaded": model in self.loaded, "footprint": self.footprints.get(model),
+            "device": "cuda", "scope": self.scope, "used": self.used, "total": self.total,
+        })
+
+
+class FakeResidency:
+    def __init__(self, services, resident, sizes):
+        self.services = services
+        self.resident = list(resident)
+        self.sizes = sizes
+        self.evicted = []
+
+    def loaded_models(self):
+        return list(self.resident)
+
+    def evict_idle(self, exclude=None):
+        for model in self.resident:
+            if model != exclude:
+                self.resident.remove(model)
+                self.evicted.append(model)
+                self.services.used -= self.sizes[model]
+                return [model]
+        return []
+
+
+def _governor(services, resident=(), sizes=None, **kwargs):
+    governor = MemoryGovernor(services, threshold=80, interval=0, groups=GROUPS, **kwargs)
+    residency = FakeResidency(services, resident, sizes or {})
+    governor.attach(residency)
+    return governor, residency
+
+
+def test_load_that_fits_goes_through():
+    services = FakeServices(used=2 * GB)
+    governor, residency = _governor(services, footprints={"bark": 4096})
+    governor.before_load("bark")
+    assert residency.evicted == []
+
+
+def test_evicts_idle_models_until_the_load_fits():
+    services = FakeServices(used=7 * GB)
+    governor, residency = _governor(services, ["riffusion", "audioldm"], {"riffusion": 2 * GB, "audioldm": 2 * GB},
+                                    footprints={"bark": 3 * 1024})
+    governor.before_load("bark")
+    # 7 + 3 > 8 en 5 + 3 <= 8: één model is genoeg
+    assert residency.evicted == ["riffusion"]
+
+
+def test_refuses_when_nothing_is_left_to_evict():
+    services = FakeServices(used=7 * GB)
+    governor, residency = _governor(services, ["bark"], {"bark": 1 * GB}, footprints={"jukebox": 4 * 1024})
+    with pytest.raises(MemoryPressure) as refused:
+        governor.before_load("jukebox")
+    assert residency.evicted == ["bark"]
+    assert refused.value.details["footprint"] == 4 * GB
+    assert refused.value.to_dict()["retryAfter"] == 30
+
+
+def test_cgroup_budget_is_never_freed_by_evicting_others():
+    services = FakeServices(used=7 * GB, scope="cgroup")
+    governor, residency = _governor(services, ["riffusion"], {"riffusion": 2 * GB}, footprints={"bark": 3 * 1024})
+    with pytest.raises(MemoryPressure):
+        governor.before_load("bark")
+    assert residency.evicted == []
+
+
+def test_persona_is_sampled_itself_and_counts_as_loaded():
+    services = FakeServices(used=7 * GB, loaded={"musiclm"})
+    governor, residency = _governor(services, footprints={"musicgen": 4 * 1024})
+    governor.before_load("musiclm")
+    # /memory van de persona (de client routeert dat naar /personas/musiclm/memory)
+    assert services.requests == [("GET", "musiclm", "/memory")]
+    assert residency.evicted == []
+
+
+def test_measured_footprint_replaces_the_estimate_and_is_persisted(tmp_path):
+    state = SharedState(str(tmp_path / "state.json"))
+    services = FakeServices(used=1 * GB, footprints={"musiclm": 3 * GB})
+    governor, _ = _governor(services, footprints={"musicgen": 1024}, state=state)
+    assert governor.footprint("musicgen") == 1 * GB
+    governor.sample("musiclm")
+    assert governor.footprint("musicgen") == 3 * GB
+    assert state.get("footprints") == {"musicgen": 3 * GB}
+
+    # Een nieuwe gateway begint met de opgeslagen meting
+    restarted, _ = _governor(services, footprints={"musicgen": 1024}, state=state)
+    assert restarted.footprint("musicgen") == 3 * GB
+
+
+def test_unreachable_service_does_not_block_the_load():
+    class Down:
+        def request(self, *args, **kwargs):
+            raise ConnectionError("weg")
+
+    governor, _ = _governor(Down(), footprints={"bark": 100 * 1024})
+    governor.before_load("bark")
+    assert governor.sample("bark") is None
+
+
+def test_check_evicts_idle_models_while_over_threshold():
+    services = FakeServices(used=9 * GB)
+    governor, residency = _governor(services, ["riffusion", "bark"], {"riffusion": 1 * GB, "bark": 1 * GB})
+    assert governor.check() == ["riffusion"]
+    assert governor.status()["services"]["bark"]["used"] == 8 * GB
+    assert governor.check() == []
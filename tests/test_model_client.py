@@ -0,0 +1,64 @@
+import pytest
+import requests
+
+from model_client import ModelClient
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {"Retry-After": "0"}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Geeft de uitkomsten in volgorde terug; een exception wordt gegooid."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+def _client(monkeypatch, outcomes):
+    client = ModelClient({"bark": "http://bark:5000"}, retries=2, backoff=0, busy_wait_max=0)
+    session = FakeSession(outcomes)
+    monkeypatch.setattr(client, "_session", lambda model: session)
+    return client, session
+
+
+def test_read_timeout_is_not_retried(monkeypatch):
+    client, session = _client(monkeypatch, [requests.ReadTimeout("te traag"), 200])
+    with pytest.raises(requests.ReadTimeout):
+        client.post("bark", "/load", idempotent=True)
+    assert session.calls == 1
+
+
+@pytest.mark.parametrize("error", [requests.ConnectionError("weg"), requests.ConnectTimeout("geen verbinding")])
+def test_connect_errors_are_retried_for_idempotent_calls(monkeypatch, error):
+    client, session = _client(monkeypatch, [error, error, 200])
+    assert client.post("bark", "/load", idempotent=True).status_code == 200
+    assert session.calls == 3
+
+
+def test_connect_errors_are_not_retried_for_generations(monkeypatch):
+    client, session = _client(monkeypatch, [requests.ConnectionError("weg"), 200])
+    with pytest.raises(requests.ConnectionError):
+        client.post("bark", "/generate")
+    assert session.calls == 1
+
+
+def test_unavailable_is_retried_and_busy_is_retried_for_every_call(monkeypatch):
+    client, session = _client(monkeypatch, [503, 200])
+    assert client.post("bark", "/load", idempotent=True).status_code == 200
+    client, session = _client(monkeypatch, [429, 429, 200])
+    assert client.post("bark", "/generate").status_code == 200
+    assert session.calls == 3
@@ -0,0 +1,47 @@
+import importlib.util
+import os
+
+import pytest
+
+from personas import PERSONAS
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "musicgen", "app.py")
+
+
+@pytest.fixture
+def musicgen(monkeypatch):
+    """De musicgen-service met een nep-engine; de echte importeert torch."""
+    pytest.importorskip("flask_cors")
+    # backend/app.py staat ook op sys.path; laad deze onder een eigen naam
+    spec = importlib.util.spec_from_file_location("musicgen_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    calls = []
+
+    def generate_impl(persona, prompt, output_path, params):
+        calls.append((persona, prompt))
+        return 10.0
+
+    monkeypatch.setattr(module, "generate_impl", generate_impl)
+    monkeypatch.setattr(module, "persona_ready", lambda name: True)
+    return module.app.test_client(), calls
+
+
+@pytest.mark.parametrize("name", sorted(PERSONAS))
+def test_generate_reads_content_prompt(name):
+    prompt = PERSONAS[name].generate_prompt({"contentPrompt": "lofi beat", "hasVocals": True})
+    assert prompt.startswith("lofi beat")
+
+
+def test_raw_prompt_personas_fall_back_to_prompt():
+    assert PERSONAS["musiclm"].generate_prompt({"prompt": "lofi beat"}) == "lofi beat"
+    assert PERSONAS["musiclm"].generate_prompt({"contentPrompt": "lofi", "stylePrompt": "jazz"}) == "lofi"
+
+
+def test_persona_route_passes_content_prompt_to_the_engine(musicgen):
+    client, calls = musicgen
+    for path in ("/generate", "/personas/musiclm/generate"):
+        r = client.post(path, json={"contentPrompt": "lofi beat", "outputPath": "out.wav", "duration": 10})
+        assert r.status_code == 200
+        assert r.get_json()["outputPath"] == "out.wav"
+    assert calls == [("musicgen", "lofi beat"), ("musiclm", "lofi beat")]
@@ -0,0 +1,155 @@
+import threading
+
+import pytest
+
+from residency import STATE_READY, STATE_UNLOADED, ModelResidency
+
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeClient:
+    """Model services die elke /load en /unload slagen (tenzij in `fail`)."""
+
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+
+    def post(self, model, path, **kwargs):
+        with self.lock:
+            self.calls.append((model, path))
+        return FakeResponse(500 if (model, path) in self.fail else 200)
+
+    def request(self, method, model, path, **kwargs):
+        return FakeResponse(503)
+
+    def unloads(self):
+        return [model for model, path in self.calls if path == "/unload"]
+
+
+def _residency(client, models, **kwargs):
+    # Geen achtergrond-threads: de tests sturen alles zelf aan
+    return ModelResidency(client, models, idle_timeout=0, ready_interval=0, **kwargs)
+
+
+def test_evicts_least_recently_used_idle_model():
+    client = FakeClient()
+    residency = _residency(client, ["a", "b", "c"], max_loaded=2)
+    with residency.use("a"):
+        pass
+    with residency.use("b"):
+        pass
+    with residency.use("a"):
+        pass
+
+    with residency.use("c"):
+        pass
+    assert client.unloads() == ["b"]
+    assert sorted(residency.loaded_models()) == ["a", "c"]
+    assert residency.status()["b"]["state"] == STATE_UNLOADED
+
+
+def test_model_in_use_is_not_evicted():
+    client = FakeClient()
+    residency = _residency(client, ["a", "b", "c"], max_loaded=2)
+    residency.hold("a")
+    with residency.use("b"):
+        pass
+
+    with residency.use("c"):
+        pass
+    assert client.unloads() == ["b"]
+    residency.release("a")
+
+
+def test_group_counts_as_one_slot_and_is_evicted_whole():
+    client = FakeClient()
+    groups = {"musicgen": "musicgen", "musiclm": "musicgen", "mousai": "musicgen"}
+    residency = _residency(client, ["musicgen", "musiclm", "mousai", "bark", "riffusion"], max_loaded=2,
+                           groups=groups)
+    for model in ("musicgen", "musiclm", "mousai", "bark"):
+        with residency.use(model):
+            pass
+    assert client.unloads() == []
+
+    with residency.use("bark"):
+        pass
+    with residency.use("riffusion"):
+        pass
+    assert sorted(client.unloads()) == ["mousai", "musicgen", "musiclm"]
+    assert sorted(residency.loaded_models()) == ["bark", "riffusion"]
+
+
+def test_group_with_member_in_use_is_not_evicted():
+    client = FakeClient()
+    groups = {"musicgen": "musicgen", "musiclm": "musicgen"}
+    residency = _residency(client, ["musicgen", "musiclm", "bark", "riffusion"], max_loaded=2, groups=groups)
+    with residency.use("musicgen"):
+        pass
+    residency.hold("musiclm")
+    with residency.use("bark"):
+        pass
+
+    with residency.use("riffusion"):
+        pass
+    assert client.unloads() == ["bark"]
+    residency.release("musiclm")
+
+
+def test_evict_idle_skips_excluded_group():
+    client = FakeClient()
+    groups = {"musicgen": "musicgen", "musiclm": "musicgen"}
+    residency = _residency(client, ["musicgen", "musiclm", "bark"], max_loaded=3, groups=groups)
+    for model in ("musicgen", "bark", "musiclm"):
+        with residency.use(model):
+            pass
+
+    assert residency.evict_idle(exclude="bark") == ["musicgen", "musiclm"]
+    assert residency.evict_idle(exclude="bark") == []
+    assert residency.loaded_models() == ["bark"]
+
+
+def test_failed_load_is_reported_and_frees_the_slot():
+    client = FakeClient(fail={("a", "/load")})
+    residency = _residency(client, ["a", "b"], max_loaded=1)
+    with pytest.raises(RuntimeError):
+        with residency.use("a"):
+            pass
+    status = residency.status()["a"]
+    assert status["state"] == "failed" and not status["resident"] and status["inUse"] == 0
+
+    with residency.use("b"):
+        pass
+    assert residency.status()["b"]["state"] == STATE_READY
+    assert client.unloads() == []
+
+
+def test_governor_runs_before_every_load():
+    class Governor:
+        def __init__(self):
+            self.loads = []
+
+        def attach(self, residency):
+            self.residency = residency
+
+        def before_load(self, model):
+            self.loads.append(model)
+
+        def sample(self, model):
+            pass
+
+    governor = Governor()
+    residency = _residency(FakeClient(), ["a"], governor=governor)
+    assert governor.residency is residency
+    with residency.use("a"):
+        pass
+    with residency.use("a"):
+        pass
+    assert governor.loads == ["a"]